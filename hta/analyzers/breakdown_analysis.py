@@ -5,6 +5,7 @@
 from collections import defaultdict
 from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -12,12 +13,13 @@ from hta.common.trace_filter import GPUKernelFilter
 from hta.common.trace_symbol_table import decode_symbol_id_to_symbol_name
 
 from hta.configs.config import logger
-from hta.utils.utils import (
-    get_kernel_type,
-    IdleTimeType,
-    KernelType,
-    merge_kernel_intervals,
+from hta.utils.intervals import (
+    interval_coverage,
+    max_priority_overlaps,
+    overlap_by_label,
+    union_intervals,
 )
+from hta.utils.utils import IdleTimeType, KernelType, map_ranks
 from plotly.subplots import make_subplots
 
 # import statement used without the "if TYPE_CHECKING" guard will cause a circular
@@ -42,12 +44,11 @@ class BreakdownAnalysis:
         num_kernels: int = 10,
         include_memory_kernels: bool = False,
         image_renderer="notebook",
+        use_multiprocessing: Optional[bool] = None,
     ) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         GPU kernel breakdown implementation. See `get_gpu_kernel_breakdown` in `trace_analysis.py` for details.
         """
-        sym_table = t.symbol_table.get_sym_table()
-
         all_kernel_df = pd.DataFrame(
             {
                 "name": pd.Series(dtype="str"),
@@ -74,43 +75,33 @@ class BreakdownAnalysis:
         if include_memory_kernels:
             kernel_type_to_analysis.append(KernelType.MEMORY.name)
 
-        kernel_per_rank: Dict[str, Dict] = defaultdict(dict)
-        for rank, trace_df in t.traces.items():
-            gpu_kernels = trace_df[trace_df["stream"].ne(-1)].copy()
-            gpu_kernels["kernel_type"] = gpu_kernels[["name"]].apply(
-                lambda x: get_kernel_type(sym_table[x["name"]]), axis=1
-            )
-            gpu_kernels["name"] = gpu_kernels["name"].apply(lambda x: sym_table[x])
-
-            # Create kernel type dataframe
-            kernel_type_df = pd.concat(
-                [
-                    kernel_type_df,
-                    cls._get_gpu_kernel_type_time(gpu_kernels, kernel_type_to_analysis),
-                ],
-                ignore_index=True,
-            )
-
-            # Create all kernel info dataframe
-            for kernel_type in kernel_type_to_analysis:
-                gpu_kernel_time = gpu_kernels[gpu_kernels["kernel_type"] == kernel_type]
-
-                if kernel_type not in kernel_per_rank:
-                    kernel_per_rank[kernel_type] = {}
-
-                gpu_kernel_time = cls._aggr_gpu_kernel_time(
-                    gpu_kernel_time,
-                    duration_ratio=duration_ratio,
-                    num_kernels=num_kernels,
-                )
+        results = map_ranks(
+            t,
+            cls._get_gpu_kernel_breakdown_for_rank,
+            list(t.traces),
+            (kernel_type_to_analysis, duration_ratio, num_kernels),
+            use_multiprocessing,
+        )
 
+        kernel_per_rank: Dict[str, Dict] = defaultdict(dict)
+        for rank, (_, gpu_kernel_time_per_type) in zip(t.traces, results):
+            for kernel_type, gpu_kernel_time in gpu_kernel_time_per_type.items():
                 kernel_per_rank[kernel_type][rank] = gpu_kernel_time
 
-                gpu_kernel_time["kernel_type"] = kernel_type
-                gpu_kernel_time["rank"] = int(rank)
-                all_kernel_df = pd.concat(
-                    [all_kernel_df, gpu_kernel_time], ignore_index=True
-                )
+        # Create kernel type dataframe and all kernel info dataframe
+        kernel_type_df = pd.concat(
+            [kernel_type_df] + [kernel_type_time for kernel_type_time, _ in results],
+            ignore_index=True,
+        )
+        all_kernel_df = pd.concat(
+            [all_kernel_df]
+            + [
+                gpu_kernel_time
+                for _, gpu_kernel_time_per_type in results
+                for gpu_kernel_time in gpu_kernel_time_per_type.values()
+            ],
+            ignore_index=True,
+        )
 
         kernel_type_df = kernel_type_df.groupby(by=["kernel_type"])["sum"].agg(["sum"])
         kernel_type_df.reset_index(inplace=True)
@@ -212,6 +203,44 @@ class BreakdownAnalysis:
 
         return kernel_type_df, all_kernel_df
 
+    @classmethod
+    def _get_gpu_kernel_breakdown_for_rank(
+        cls,
+        t: "Trace",
+        rank: int,
+        kernel_type_to_analysis: List[str],
+        duration_ratio: float,
+        num_kernels: int,
+    ) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        """Computes the partial GPU kernel breakdown of one rank.
+
+        Returns: the time spent by kernel type and the kernel info dataframe of every
+            analyzed kernel type on this rank.
+        """
+        sym_table = t.symbol_table.get_sym_table()
+        gpu_kernels = t.get_derived_frame(rank, "gpu_kernels").copy()
+        gpu_kernels["name"] = gpu_kernels["name"].apply(lambda x: sym_table[x])
+
+        kernel_type_time = cls._get_gpu_kernel_type_time(
+            gpu_kernels, kernel_type_to_analysis
+        )
+
+        gpu_kernel_time_per_type: Dict[str, pd.DataFrame] = {}
+        for kernel_type in kernel_type_to_analysis:
+            gpu_kernel_time = gpu_kernels[gpu_kernels["kernel_type"] == kernel_type]
+
+            gpu_kernel_time = cls._aggr_gpu_kernel_time(
+                gpu_kernel_time,
+                duration_ratio=duration_ratio,
+                num_kernels=num_kernels,
+            )
+
+            gpu_kernel_time["kernel_type"] = kernel_type
+            gpu_kernel_time["rank"] = int(rank)
+            gpu_kernel_time_per_type[kernel_type] = gpu_kernel_time
+
+        return kernel_type_time, gpu_kernel_time_per_type
+
     @classmethod
     def _get_gpu_kernel_interval_dataframe(
         cls,
@@ -285,6 +314,10 @@ class BreakdownAnalysis:
         # Get the pid tid combinations to scan over
         pid_tids = gpu_user_anno_df[["pid", "tid"]].drop_duplicates().to_dict("records")
 
+        kernel_pid = gpu_kernels_df["pid"].to_numpy()
+        kernel_tid = gpu_kernels_df["tid"].to_numpy()
+        user_annotation = gpu_kernels_df["user_annotation"].to_numpy().copy()
+
         for p in pid_tids:
             pid, tid = p["pid"], p["tid"]
             gpu_user_anno_df_filt = gpu_user_anno_df.query(
@@ -294,17 +327,22 @@ class BreakdownAnalysis:
                 f"Pid,tid = {p}, Num gpu annotations = {len(gpu_user_anno_df_filt)}"
             )
 
-            # Loop over all GPU user annotation intervals and match them with GPU
-            # kernel intervals. This will be efficient if len(user annotations) << len(kernels)
-            for row in gpu_user_anno_df_filt.itertuples():
-                interval, anno_name = row.Index, row.name
-                overlaps = gpu_kernels_df.index.overlaps(interval)
-                gpu_kernels_df.loc[
-                    (gpu_kernels_df["pid"] == pid)
-                    & (gpu_kernels_df["tid"] == tid)
-                    & overlaps,
-                    "user_annotation",
-                ] = anno_name
+            # Sweep over the GPU user annotation intervals and match every GPU kernel
+            # interval with the overlapping annotation processed last in the
+            # reverse duration order, i.e. the lowest/leaf annotation in the stack.
+            kernels = np.flatnonzero((kernel_pid == pid) & (kernel_tid == tid))
+            anno_idx = max_priority_overlaps(
+                gpu_user_anno_df_filt["ts"].to_numpy(),
+                gpu_user_anno_df_filt["end"].to_numpy(),
+                np.arange(len(gpu_user_anno_df_filt)),
+                gpu_kernels_df["ts"].to_numpy()[kernels],
+                gpu_kernels_df["end"].to_numpy()[kernels],
+            )
+            found = anno_idx >= 0
+            anno_names = gpu_user_anno_df_filt["name"].to_numpy()
+            user_annotation[kernels[found]] = anno_names[anno_idx[found]]
+
+        gpu_kernels_df["user_annotation"] = user_annotation
 
     @classmethod
     def get_gpu_kernels_with_user_annotations(
@@ -321,6 +359,7 @@ class BreakdownAnalysis:
         trace_df = t.get_trace(rank)
         trace_df["end"] = trace_df["ts"] + trace_df["dur"]
         trace_df["user_annotation"] = -1
+        t.invalidate_derived_frames(rank)
 
         gpu_user_anno_df = cls._get_gpu_user_anno_interval_dataframe(trace_df, t)
         if gpu_user_anno_df is None:
@@ -352,6 +391,7 @@ class BreakdownAnalysis:
         num_kernels: int = 1000,
         allowlist_patterns: Optional[List[str]] = None,
         image_renderer: Optional[str] = None,
+        use_multiprocessing: Optional[bool] = None,
     ) -> Optional[pd.DataFrame]:
         """
         Summarizes the time spent by each GPU user annotation. Outputs the following graphs:
@@ -399,28 +439,23 @@ class BreakdownAnalysis:
         if allowlist_patterns is not None:
             allowlist_names = t.symbol_table.find_matched_symbols(allowlist_patterns)
 
-        kernel_per_rank: Dict[int, pd.DataFrame] = {}
-
-        for rank, trace_df in t.traces.items():
-            gpu_user_annotation_kernels = trace_df[trace_df["cat"].eq(idx)].copy()
-            t.symbol_table.add_symbols_to_trace_df(gpu_user_annotation_kernels, "name")
-            logger.info(
-                f"rank = {rank}, num {annotation}s = {len(gpu_user_annotation_kernels)}"
-            )
-
-            gpu_kernel_time = cls._aggr_gpu_kernel_time(
-                gpu_user_annotation_kernels,
-                duration_ratio=duration_ratio,
-                num_kernels=num_kernels,
-                allowlist_names=allowlist_names,
+        kernel_per_rank: Dict[int, pd.DataFrame] = dict(
+            zip(
+                t.traces,
+                map_ranks(
+                    t,
+                    cls._get_gpu_user_annotation_time_for_rank,
+                    list(t.traces),
+                    (annotation, idx, duration_ratio, num_kernels, allowlist_names),
+                    use_multiprocessing,
+                ),
             )
-            gpu_kernel_time["rank"] = int(rank)
-            kernel_per_rank[rank] = gpu_kernel_time
+        )
 
-            # Create all kernel info dataframe
-            all_kernel_df = pd.concat(
-                [all_kernel_df, gpu_kernel_time], ignore_index=True
-            )
+        # Create all kernel info dataframe
+        all_kernel_df = pd.concat(
+            [all_kernel_df] + list(kernel_per_rank.values()), ignore_index=True
+        )
 
         all_kernel_df.sort_values(by=["rank", "name"], ignore_index=True, inplace=True)
         all_kernel_df.rename(
@@ -491,72 +526,68 @@ class BreakdownAnalysis:
 
         return all_kernel_df
 
+    @classmethod
+    def _get_gpu_user_annotation_time_for_rank(
+        cls,
+        t: "Trace",
+        rank: int,
+        annotation: str,
+        annotation_cat: int,
+        duration_ratio: float,
+        num_kernels: int,
+        allowlist_names: Optional[List[str]],
+    ) -> pd.DataFrame:
+        """Computes the time spent by each user annotation on one rank."""
+        trace_df = t.traces[rank]
+        gpu_user_annotation_kernels = trace_df[
+            trace_df["cat"].eq(annotation_cat)
+        ].copy()
+        t.symbol_table.add_symbols_to_trace_df(gpu_user_annotation_kernels, "name")
+        logger.info(
+            f"rank = {rank}, num {annotation}s = {len(gpu_user_annotation_kernels)}"
+        )
+
+        gpu_kernel_time = cls._aggr_gpu_kernel_time(
+            gpu_user_annotation_kernels,
+            duration_ratio=duration_ratio,
+            num_kernels=num_kernels,
+            allowlist_names=allowlist_names,
+        )
+        gpu_kernel_time["rank"] = int(rank)
+        return gpu_kernel_time
+
     @classmethod
     def _get_gpu_kernel_type_time(
         cls, gpu_kernels: pd.DataFrame, kernel_type_to_analysis: List[str]
     ) -> pd.DataFrame:
+        # Label the kernels by the position of their type in kernel_type_to_analysis
+        # and compute the time covered by every combination of kernel types.
+        labels = (
+            gpu_kernels["kernel_type"]
+            .map({k_t: idx for idx, k_t in enumerate(kernel_type_to_analysis)})
+            .to_numpy()
+        )
+        analyzed = ~pd.isna(labels)
+        starts = gpu_kernels["ts"].to_numpy()[analyzed]
+        ends = starts + gpu_kernels["dur"].to_numpy()[analyzed]
+        masks, durations = overlap_by_label(starts, ends, labels[analyzed])
+
         overlap_kernel_type_df = pd.DataFrame(
             {
-                "status": pd.Series(dtype="str"),
-                "time": pd.Series(dtype="int"),
+                "kernel_type": [
+                    " overlapping ".join(
+                        k_t
+                        for idx, k_t in enumerate(kernel_type_to_analysis)
+                        if mask & (1 << idx)
+                    )
+                    for mask in masks.tolist()
+                ],
+                "sum": durations.astype(int),
             }
         )
-
-        kernel_t_mapping: Dict[str, int] = defaultdict(int)
-        for idx, kernel_type in enumerate(kernel_type_to_analysis):
-            value = 1 << idx
-            kernel_t_mapping[kernel_type] = value
-            kernel_t_df = merge_kernel_intervals(
-                gpu_kernels[gpu_kernels["kernel_type"].eq(kernel_type)].copy()
-            )
-
-            overlap_kernel_type_df = (
-                pd.concat(
-                    [
-                        overlap_kernel_type_df,
-                        kernel_t_df.melt(var_name="status", value_name="time").replace(
-                            {"ts": value, "end": -value}
-                        ),
-                    ]
-                )
-                .sort_values(by="time")
-                .reset_index(drop=True)
-            )
-
-        overlap_kernel_type_df["running"] = overlap_kernel_type_df["status"].cumsum()
-        overlap_kernel_type_df["next_time"] = overlap_kernel_type_df["time"].shift(-1)
-        unique_running = overlap_kernel_type_df["running"].unique()
-        running_mapping: Dict[int, str] = defaultdict(str)
-        for u_running in unique_running:
-            if u_running > 0:
-                for k_t, v_t in kernel_t_mapping.items():
-                    if u_running & v_t:
-                        if u_running not in running_mapping:
-                            running_mapping[u_running] = k_t
-                        else:
-                            # FIXME linter mismatch between fbcode and git T183519933
-                            # fmt: off
-                            running_mapping[u_running] = (
-                                f"{running_mapping[u_running]} overlapping {k_t}"
-                            )
-                            # fmt: on
-
-        overlap_kernel_type_df["kernel_type"] = ""
-        overlap_kernel_type_df = overlap_kernel_type_df[
-            overlap_kernel_type_df["running"] > 0
-        ]
-        for running in running_mapping:
-            overlap_kernel_type_df.loc[
-                overlap_kernel_type_df["running"].eq(running), "kernel_type"
-            ] = running_mapping[running]
-        overlap_kernel_type_df["dur"] = (
-            overlap_kernel_type_df["next_time"] - overlap_kernel_type_df["time"]
-        ).astype(int)
-
-        overlap_kernel_type_df = overlap_kernel_type_df.groupby(by=["kernel_type"])[
-            "dur"
-        ].agg(["sum"])
-        overlap_kernel_type_df.reset_index(inplace=True)
+        overlap_kernel_type_df.sort_values(
+            by="kernel_type", ignore_index=True, inplace=True
+        )
 
         return overlap_kernel_type_df
 
@@ -632,66 +663,79 @@ class BreakdownAnalysis:
             PS: we exclude the last profiler iteration while reading trace
             so total time is exclusive of that.
         """
-        merged_kernels = merge_kernel_intervals(kernels_df)
-        kernel_time = merged_kernels.iloc[-1]["end"] - merged_kernels.iloc[0]["ts"]
+        starts = kernels_df["ts"].to_numpy()
+        starts, ends = union_intervals(starts, starts + kernels_df["dur"].to_numpy())
+        kernel_time = ends[-1] - starts[0]
         # differences of end - ts are commutative
-        kernel_run_time = merged_kernels.end.sum() - merged_kernels.ts.sum()
+        kernel_run_time = ends.sum() - starts.sum()
         return kernel_time - kernel_run_time, kernel_time
 
     @classmethod
-    def get_temporal_breakdown(cls, t: "Trace", visualize: bool = True) -> pd.DataFrame:
+    def _get_temporal_breakdown_for_rank(
+        cls, t: "Trace", rank: int
+    ) -> Tuple[int, int, int, int, int, int]:
+        """returns idle_time (us), compute_time (us), comm_time (us), mem_time (us),
+        non_compute_time (us), kernel_time (us) for one rank"""
+        gpu_kernels = t.get_derived_frame(rank, "gpu_kernels")
+        idle_time, kernel_time = cls._get_idle_time_for_kernels(gpu_kernels)
+
+        # Isolate the kernels of each type and merge each one of them.
+        starts = gpu_kernels["ts"].to_numpy()
+        ends = starts + gpu_kernels["dur"].to_numpy()
+        kernel_type = gpu_kernels["kernel_type"].to_numpy()
+        compute_time, comm_time, mem_time = (
+            interval_coverage(starts[is_type], ends[is_type])
+            for is_type in (
+                kernel_type == KernelType.COMPUTATION.name,
+                kernel_type == KernelType.COMMUNICATION.name,
+                kernel_type == KernelType.MEMORY.name,
+            )
+        )
+        non_compute_time = kernel_time - compute_time - idle_time
+
+        assert idle_time <= kernel_time
+        assert compute_time <= kernel_time
+        assert non_compute_time >= 0
+        assert comm_time <= kernel_time
+        assert mem_time <= kernel_time
+
+        return (
+            idle_time,
+            compute_time,
+            comm_time,
+            mem_time,
+            non_compute_time,
+            kernel_time,
+        )
+
+    @classmethod
+    def get_temporal_breakdown(
+        cls,
+        t: "Trace",
+        visualize: bool = True,
+        use_multiprocessing: Optional[bool] = None,
+    ) -> pd.DataFrame:
         """
         Temporal breakdown implementation. See `get_temporal_breakdown` in `trace_analysis.py` for details.
         """
-        sym_table = t.symbol_table.get_sym_table()
-
-        def idle_time_per_rank(trace_df: pd.DataFrame) -> Tuple[int, int, int, int]:
-            """returns idle_time (us) , compute_time (us), non_compute_time (us), total_time (us)"""
-            gpu_kernels = trace_df[trace_df["stream"].ne(-1)].copy()
-            idle_time, kernel_time = cls._get_idle_time_for_kernels(gpu_kernels)
-
-            gpu_kernels["kernel_type"] = gpu_kernels[["name"]].apply(
-                lambda x: get_kernel_type(sym_table[x["name"]]), axis=1
-            )
-
-            # Isolate computation kernels and merge each one of them.
-            comp_kernels = merge_kernel_intervals(
-                gpu_kernels[
-                    gpu_kernels["kernel_type"].eq(KernelType.COMPUTATION.name)
-                ].copy()
-            )
-
-            comm_kernels = merge_kernel_intervals(
-                gpu_kernels[
-                    gpu_kernels["kernel_type"].eq(KernelType.COMMUNICATION.name)
-                ].copy()
-            )
-
-            mem_kernels = merge_kernel_intervals(
-                gpu_kernels[
-                    gpu_kernels["kernel_type"].eq(KernelType.MEMORY.name)
-                ].copy()
-            )
-                
-            compute_time = comp_kernels.end.sum() - comp_kernels.ts.sum()
-            comm_time = comm_kernels.end.sum() - comm_kernels.ts.sum()
-            mem_time = mem_kernels.end.sum() - mem_kernels.ts.sum()
-            non_compute_time = kernel_time - compute_time - idle_time
-
-            assert idle_time <= kernel_time
-            assert compute_time <= kernel_time
-            assert non_compute_time >= 0
-            assert comm_time <= kernel_time
-            assert mem_time <= kernel_time
-
-            return idle_time, compute_time, comm_time, mem_time, non_compute_time, kernel_time
-
         result: Dict[str, List[float]] = defaultdict(list)
-        for rank, trace_df in t.traces.items():
+        for rank, (
+            idle_time,
+            compute_time,
+            comm_time,
+            mem_time,
+            non_compute_time,
+            kernel_time,
+        ) in zip(
+            t.traces,
+            map_ranks(
+                t,
+                cls._get_temporal_breakdown_for_rank,
+                list(t.traces),
+                use_multiprocessing=use_multiprocessing,
+            ),
+        ):
             result["rank"].append(rank)
-            idle_time, compute_time, comm_time, mem_time, non_compute_time, kernel_time = idle_time_per_rank(
-                trace_df
-            )
             result["idle_time(us)"].append(idle_time)
             result["compute_time(us)"].append(compute_time)
             result["non_compute_time(us)"].append(non_compute_time)
@@ -714,10 +758,8 @@ class BreakdownAnalysis:
             result_df["comm_time(us)"] / result_df["kernel_time(us)"]
         )
         result_df["comm_time_pctg"] = round(100 * result_df["comm_time"], 2)
-        
-        result_df["mem_time"] = (
-            result_df["mem_time(us)"] / result_df["kernel_time(us)"]
-        )
+
+        result_df["mem_time"] = result_df["mem_time(us)"] / result_df["kernel_time(us)"]
         result_df["mem_time_pctg"] = round(100 * result_df["mem_time"], 2)
 
         if visualize:  # pragma: no cover
@@ -755,37 +797,117 @@ class BreakdownAnalysis:
         ]
 
     @classmethod
-    def _analyze_idle_time_for_stream(
+    def _get_idle_time_kernels(
+        cls, t: "Trace", rank: int, streams: Optional[List[int]] = None
+    ) -> pd.DataFrame:
+        """Get the stream, start, end and runtime start of the GPU kernels on a rank.
+
+        rank (int): the rank to consider.
+        streams (List[int]): only keep the kernels on these streams; all streams when empty.
+
+        returns a dataframe with the kernels in trace order and a `stream_order` column
+        numbering the streams in the order they are reported.
+        """
+        trace_df: pd.DataFrame = t.get_trace(rank)
+        gpu_kernels = t.get_derived_frame(rank, "gpu_kernels")
+
+        # Need to filter out events with `cuda_sync` category
+        kernel_cats = [
+            "kernel",
+            "Kernel",
+            "gpu_memset",
+            "Memset",
+            "gpu_memcpy",
+            "Memcpy",
+            "mtia_ccp_events",
+        ]
+        sym_id_map = t.symbol_table.get_sym_id_map()
+        kernel_cat_ids = [sym_id_map.get(cat, -1000) for cat in kernel_cats]
+
+        is_kernel = gpu_kernels["cat"].isin(kernel_cat_ids)
+        if streams:
+            is_kernel &= gpu_kernels["stream"].isin(streams)
+        kernels = gpu_kernels.loc[
+            is_kernel, ["stream", "ts", "dur", "index_correlation"]
+        ]
+
+        if streams:
+            stream_order = {}
+            for stream in streams:
+                stream_order.setdefault(stream, len(stream_order))
+            stream_codes = kernels["stream"].map(stream_order).to_numpy()
+        else:
+            stream_codes, _ = pd.factorize(kernels["stream"])
+
+        return pd.DataFrame(
+            {
+                "rank": rank,
+                "stream": kernels["stream"].to_numpy(),
+                "stream_order": stream_codes,
+                "ts": kernels["ts"].to_numpy(),
+                "end_ts": (kernels["ts"] + kernels["dur"]).to_numpy(),
+                # correlate with the runtime event whenever possible
+                "ts_runtime": trace_df["ts"]
+                .reindex(kernels["index_correlation"])
+                .to_numpy(),
+            }
+        )
+
+    @classmethod
+    def get_idle_time_breakdown_for_ranks(
         cls,
-        stream: int,
-        gpu_kernels: pd.DataFrame,
+        t: "Trace",
         consecutive_kernel_delay: int,
+        ranks: Optional[List[int]] = None,
+        streams: Optional[List[int]] = None,
+        visualize: bool = True,
+        visualize_pctg: bool = True,
         show_idle_interval_stats=False,
     ) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
-        """Analyze a specific CUDA stream for idle time breakdown on it.
+        """
+        Breakdown Idle time by host wait, kernel wait and other categories on every stream of
+        several ranks at once. The kernels of all the ranks are sorted once by (rank, stream, ts)
+        and the idle interval before each kernel is found with a grouped shift.
 
-        stream (int): CUDA stream to consider.
-        gpu_kernels: a dataframe of GPU kernels in a rank.
+        consecutive_kernel_delay (int): configures the threshold under which we consider gaps between
+           kernels to be due to realistic delays in launching back-back kernels on the GPU. Time is in ns.
+        ranks (List[int]): the ranks to analyze. Defaults to all ranks.
+        streams (List[int]): list of streams to provide analysis for.
+            Defaults to all streams.
+        visualize (bool): show one visualization chart per rank or not (default = True).
+        visualize_pctg (bool): show relative percentage across streams (default = True).
+        show_idle_interval_stats (bool): prints statistics of the idle intervals like the min, max
+           and median of idle intervals between kernels on a CUDA stream, also broken down by
+           the idleness category (default = False).
 
         returns
-        1) dataframe with idle time breakdown.
-        1) optional dataframe showing idle interval statistics.
+        1) dataframe with the idle time breakdown of each stream on each rank.
+        2) optional dataframe showing idle interval statistics.
         """
-        logger.info(f"Processing stream {stream}")
-        idle_interval_stats: Optional[pd.DataFrame] = None
-
-        gpu_kernels_s = (
-            gpu_kernels[gpu_kernels.stream == stream].copy().sort_values(by="ts")
-        )
-
-        gpu_kernels_s["end_ts"] = gpu_kernels_s.ts + gpu_kernels_s.dur
-        gpu_kernels_s["prev_end_ts"] = gpu_kernels_s.end_ts.shift(1)
-        gpu_kernels_s["idle_interval"] = (
-            gpu_kernels_s["ts"] - gpu_kernels_s["prev_end_ts"]
+        if ranks is None or len(ranks) == 0:
+            ranks = t.get_ranks()
+        logger.info(f"Analyzing idle time on {len(ranks)} ranks")
+
+        gpu_kernels = pd.concat(
+            [cls._get_idle_time_kernels(t, rank, streams) for rank in ranks],
+            keys=range(len(ranks)),
+            names=["rank_order"],
+        ).reset_index(level="rank_order")
+        gpu_kernels = gpu_kernels.take(
+            np.lexsort(
+                (
+                    gpu_kernels["ts"].to_numpy(),
+                    gpu_kernels["stream_order"].to_numpy(),
+                    gpu_kernels["rank_order"].to_numpy(),
+                )
+            )
         )
+        group_keys = ["rank_order", "stream_order"]
 
-        # Default idle time category
-        gpu_kernels_s["idle_category"] = IdleTimeType.OTHER.value
+        gpu_kernels["prev_end_ts"] = gpu_kernels.groupby(group_keys, sort=False)[
+            "end_ts"
+        ].shift(1)
+        gpu_kernels["idle_interval"] = gpu_kernels["ts"] - gpu_kernels["prev_end_ts"]
 
         """
         Host wait:
@@ -793,39 +915,88 @@ class BreakdownAnalysis:
             this means the Host/CPU was not enqueuing kernels fast enough.
         CPU  Runtime 0             Runtime 1
         GPU     |--------Kernel 0      |-----------Kernel 1
-        """
-        is_host_wait = gpu_kernels_s["ts_runtime"] > gpu_kernels_s["prev_end_ts"]
-        gpu_kernels_s.loc[is_host_wait, "idle_category"] = IdleTimeType.HOST_WAIT.value
 
-        """
         Kernel wait:
             If the gap between kernels is below a threshold the idle time is
             likely due to the overhead for launching kernels.
         """
+        is_host_wait = gpu_kernels["ts_runtime"] > gpu_kernels["prev_end_ts"]
         is_kernel_kernel_delay = ~is_host_wait & (
-            gpu_kernels_s["idle_interval"] < consecutive_kernel_delay
+            gpu_kernels["idle_interval"] < consecutive_kernel_delay
         )
-        # FIXME linter mismatch between fbcode and git T183519933
-        # fmt: off
-        gpu_kernels_s.loc[is_kernel_kernel_delay, "idle_category"] = (
-            IdleTimeType.KERNEL_WAIT.value
+        gpu_kernels["idle_category"] = np.select(
+            [is_host_wait, is_kernel_kernel_delay],
+            [IdleTimeType.HOST_WAIT.value, IdleTimeType.KERNEL_WAIT.value],
+            IdleTimeType.OTHER.value,
         )
-        # fmt: on
 
-        gpu_kernels_groupby = gpu_kernels_s.groupby("idle_category")
+        gpu_kernels_groupby = gpu_kernels.groupby(
+            group_keys + ["rank", "stream", "idle_category"]
+        ).idle_interval
+        idle_category_name_map = {
+            member.value: name.lower()
+            for name, member in IdleTimeType.__members__.items()
+        }
+
+        result_df = gpu_kernels_groupby.sum().rename("idle_time").reset_index()
+        result_df["idle_time_ratio"] = result_df["idle_time"] / result_df.groupby(
+            group_keys
+        ).idle_time.transform("sum")
+        result_df["idle_category"] = result_df["idle_category"].map(
+            idle_category_name_map
+        )
+        result_df = result_df[
+            ["rank", "stream", "idle_category", "idle_time", "idle_time_ratio"]
+        ].round(2)
+
+        interval_stats_df: Optional[pd.DataFrame] = None
         if show_idle_interval_stats:
-            logger.info(
-                f"Computing descriptive statistics for idle time intervals on stream {stream}:"
+            logger.info("Computing descriptive statistics for idle time intervals")
+            # Same columns as describe() but with grouped aggregations instead of
+            # describing each group separately.
+            interval_stats_df = (
+                pd.DataFrame(
+                    {
+                        "count": gpu_kernels_groupby.count().astype(float),
+                        "mean": gpu_kernels_groupby.mean(),
+                        "std": gpu_kernels_groupby.std(),
+                        "min": gpu_kernels_groupby.min(),
+                        "25%": gpu_kernels_groupby.quantile(0.25),
+                        "50%": gpu_kernels_groupby.quantile(0.5),
+                        "75%": gpu_kernels_groupby.quantile(0.75),
+                        "max": gpu_kernels_groupby.max(),
+                    }
+                )
+                .round(2)
+                .reset_index(group_keys, drop=True)
+                .reset_index(["rank", "stream"])
+                .rename(mapper=idle_category_name_map, axis=0)
             )
-            idle_interval_stats = gpu_kernels_groupby.idle_interval.describe()
-            idle_interval_stats.insert(0, "stream", stream)
 
-        result = pd.DataFrame(gpu_kernels_groupby.idle_interval.sum())
-        total_idle_time = result.idle_interval.sum()
-        result["stream"] = stream
-        result["idle_time_ratio"] = result["idle_interval"] / total_idle_time
-        result.rename(columns={"idle_interval": "idle_time"}, inplace=True)
-        return result, idle_interval_stats
+        if visualize:  # pragma: no cover
+            for rank, rank_df in result_df.groupby("rank", sort=False):
+                ycol = "idle_time_ratio" if visualize_pctg else "idle_time"
+                fig = px.bar(
+                    rank_df.astype({"stream": str}),
+                    x="stream",
+                    y=ycol,
+                    color="idle_category",
+                    hover_data=["idle_time", "idle_time_ratio"],
+                    title=f"Idle time breakdown on rank {rank} per CUDA stream",
+                )
+                if visualize_pctg:
+                    fig.update_layout(
+                        yaxis_tickformat=".2%",
+                        yaxis_title="Percentage",
+                        legend_title="Idle Time Breakdown",
+                    )
+                else:
+                    fig.update_layout(
+                        yaxis_title="Idle time (us)", legend_title="Idle Time Breakdown"
+                    )
+                fig.show()
+
+        return result_df, interval_stats_df
 
     @classmethod
     def get_idle_time_breakdown(
@@ -852,96 +1023,12 @@ class BreakdownAnalysis:
            and median of idle intervals between kernels on a CUDA stream, also broken down by
            the idleness category (default = False).
         """
-        trace_df: pd.DataFrame = t.get_trace(rank)
-
-        # Need to filter out events with `cuda_sync` category
-        kernel_cats = [
-            "kernel",
-            "Kernel",
-            "gpu_memset",
-            "Memset",
-            "gpu_memcpy",
-            "Memcpy",
-            "mtia_ccp_events",
-        ]
-        sym_id_map = t.symbol_table.get_sym_id_map()
-        kernel_cat_ids = [sym_id_map.get(cat, -1000) for cat in kernel_cats]
-
-        gpu_kernels_pre = (
-            trace_df[trace_df["stream"].ne(-1) & trace_df["cat"].isin(kernel_cat_ids)]
-            .copy()
-            .set_index("index_correlation")
-        )
-
-        # correlate with the runtime event whenever possible
-        gpu_kernels = gpu_kernels_pre.join(
-            trace_df[["ts", "index"]], on="index_correlation", rsuffix="_runtime"
+        return cls.get_idle_time_breakdown_for_ranks(
+            t,
+            consecutive_kernel_delay,
+            [rank],
+            streams,
+            visualize,
+            visualize_pctg,
+            show_idle_interval_stats,
         )
-
-        if streams is None or len(streams) == 0:
-            streams = list(gpu_kernels.stream.unique())
-
-        result_list: List[pd.DataFrame] = []
-        interval_stats_list: List[pd.DataFrame] = []
-
-        for stream in streams:
-            breakdown_df, idle_interval_df = cls._analyze_idle_time_for_stream(
-                stream,
-                gpu_kernels,
-                consecutive_kernel_delay,
-                show_idle_interval_stats,
-            )
-            result_list.append(breakdown_df)
-            if idle_interval_df is not None:
-                interval_stats_list.append(idle_interval_df)
-
-        result_df = pd.concat(result_list)
-
-        idle_category_name_map = {
-            member.value: name.lower()
-            for name, member in IdleTimeType.__members__.items()
-        }
-        result_df.rename(mapper=idle_category_name_map, axis=0, inplace=True)
-        result_df.reset_index(inplace=True)
-
-        if visualize:  # pragma: no cover
-            result_df["stream"] = result_df.stream.astype(str)
-            ycol = "idle_time_ratio" if visualize_pctg else "idle_time"
-            fig = px.bar(
-                result_df,
-                x="stream",
-                y=ycol,
-                color="idle_category",
-                hover_data=["idle_time", "idle_time_ratio"],
-                title=f"Idle time breakdown on rank {rank} per CUDA stream",
-            )
-            if visualize_pctg:
-                fig.update_layout(
-                    yaxis_tickformat=".2%",
-                    yaxis_title="Percentage",
-                    legend_title="Idle Time Breakdown",
-                )
-            else:
-                fig.update_layout(
-                    yaxis_title="Idle time (us)", legend_title="Idle Time Breakdown"
-                )
-            fig.show()
-
-        result_df["rank"] = rank
-        interval_stats_df = (
-            pd.concat(interval_stats_list).round(2)
-            if show_idle_interval_stats
-            else None
-        )
-        if interval_stats_df is not None:
-            # add rank column to the starting
-            interval_stats_df.insert(0, "rank", rank)
-            interval_stats_df.rename(
-                mapper=idle_category_name_map, axis=0, inplace=True
-            )
-
-        result_df = result_df[
-            ["rank", "stream", "idle_category", "idle_time", "idle_time_ratio"]
-        ].round(2)
-
-        return result_df, interval_stats_df
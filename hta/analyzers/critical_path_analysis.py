@@ -2,38 +2,53 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import json
 import logging
 import os
-import sys
+import re
+import shutil
 import time
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
+from collections.abc import Mapping, Sequence
 
-from copy import deepcopy
-from dataclasses import dataclass
+from copy import copy
+from dataclasses import dataclass, replace
 from enum import Enum
 from functools import cached_property, lru_cache, wraps
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from tempfile import TemporaryDirectory
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import hta.configs.env_options as hta_options
 
 import networkx as nx
+import numpy as np
 import pandas as pd
 from hta.analyzers.trace_counters import TraceCounters
 
-# Revert to old call stack as we have an issue with new one
-# https://github.com/facebookresearch/HolisticTraceAnalysis/issues/113
-# from hta.common.trace_call_graph import CallGraph, CallStackGraph, DeviceType
-from hta.common.call_stack import CallGraph, CallStackGraph, DeviceType
-
 from hta.common.trace import Trace
-from hta.common.trace_symbol_table import decode_symbol_id_to_symbol_name
+from hta.common.trace_call_graph import CallGraph
 from hta.configs.config import logger
-from hta.utils.utils import is_comm_kernel
+from hta.utils.utils import is_comm_kernel, map_ranks, shorten_name
 
 
 PROFILE_TIMES = {}
 
+# Version of the CPGraph.save_binary() file format
+CP_GRAPH_BINARY_VERSION = 1
+
 
 # Enable per function timing
 def timeit(func):
@@ -102,6 +117,443 @@ class CPEdge:
     type: CPEdgeType = CPEdgeType.OPERATOR_KERNEL
 
 
+@dataclass(frozen=True)
+class CPEdgeScaling:
+    """Scaling of edge weights for a what-if analysis of the critical path.
+
+    An edge is selected if it matches all the criteria that are set, without
+    criteria every edge is selected.
+
+    Attributes:
+        scale (float): factor to multiply the weight of the selected edges by,
+            e.g. 0.5 for a twice as fast kernel or 0 to remove a delay.
+        edge_type (CPEdgeType): select only edges of this type.
+        event_name_pattern (str): select only edges attributed to an event whose
+            name matches this regular expression.
+    """
+
+    scale: float
+    edge_type: Optional[CPEdgeType] = None
+    event_name_pattern: Optional[str] = None
+
+
+class CPNodeArrays(Sequence):
+    """Columnar storage of the nodes in the critical path di-graph.
+
+    The index of a node in the arrays is its node id. CPNode objects are only
+    created when a node is accessed, modifying them does not change the graph.
+
+    Attributes:
+        ev_idx (np.ndarray): index of the event of each node in the trace dataframe.
+        ts (np.ndarray): timestamp of each node.
+        is_start (np.ndarray): whether each node is the start or end of its event.
+        is_blocking (np.ndarray): whether the event of each node is a blocking call.
+    """
+
+    def __init__(self) -> None:
+        self._ev_idx: np.ndarray = np.empty(0, dtype=np.int64)
+        self._ts: np.ndarray = np.empty(0, dtype=np.int64)
+        self._is_start: np.ndarray = np.empty(0, dtype=bool)
+        self._is_blocking: np.ndarray = np.empty(0, dtype=bool)
+        # nodes appended since the last flush
+        self._pending: List[CPNode] = []
+
+    @classmethod
+    def from_arrays(
+        cls,
+        ev_idx: np.ndarray,
+        ts: np.ndarray,
+        is_start: np.ndarray,
+        is_blocking: np.ndarray,
+    ) -> "CPNodeArrays":
+        """Create the nodes from arrays, the node ids are the array positions."""
+        node_arrays = cls()
+        node_arrays._ev_idx, node_arrays._ts = ev_idx, ts
+        node_arrays._is_start, node_arrays._is_blocking = is_start, is_blocking
+        return node_arrays
+
+    @classmethod
+    def from_nodes(cls, nodes: Iterable[CPNode]) -> "CPNodeArrays":
+        """Create the nodes from CPNode objects ordered by node id."""
+        node_arrays = cls()
+        node_arrays._pending = list(nodes)
+        return node_arrays
+
+    def __len__(self) -> int:
+        return self._ev_idx.size + len(self._pending)
+
+    def __getitem__(self, i: int) -> CPNode:
+        """Create the CPNode object for the node with id i."""
+        self._flush()
+        idx = range(len(self))[i]
+        return CPNode(
+            idx=idx,
+            ev_idx=self._ev_idx[idx].item(),
+            ts=self._ts[idx].item(),
+            is_start=self._is_start[idx].item(),
+            is_blocking=self._is_blocking[idx].item(),
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CPNodeArrays):
+            return len(self) == len(other) and all(
+                np.array_equal(a, b)
+                for a, b in zip(
+                    (self.ev_idx, self.ts, self.is_start, self.is_blocking),
+                    (other.ev_idx, other.ts, other.is_start, other.is_blocking),
+                )
+            )
+        if isinstance(other, Sequence):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def append(self, node: CPNode) -> int:
+        """Add a node and return its node id."""
+        self._pending.append(node)
+        return len(self) - 1
+
+    @property
+    def ev_idx(self) -> np.ndarray:
+        self._flush()
+        return self._ev_idx
+
+    @property
+    def ts(self) -> np.ndarray:
+        self._flush()
+        return self._ts
+
+    @property
+    def is_start(self) -> np.ndarray:
+        self._flush()
+        return self._is_start
+
+    @property
+    def is_blocking(self) -> np.ndarray:
+        self._flush()
+        return self._is_blocking
+
+    def _flush(self) -> None:
+        """Move the pending nodes into the arrays."""
+        if len(self._pending) == 0:
+            return
+        nodes, self._pending = self._pending, []
+        self._ev_idx = np.append(self._ev_idx, [n.ev_idx for n in nodes])
+        self._ts = np.append(self._ts, [n.ts for n in nodes])
+        self._is_start = np.append(self._is_start, [n.is_start for n in nodes])
+        self._is_blocking = np.append(self._is_blocking, [n.is_blocking for n in nodes])
+
+
+class CPEdgeArrays:
+    """Columnar storage of the edges in the critical path di-graph.
+
+    Edges are appended to compact typed buffers while the graph is constructed
+    and exposed as numpy arrays afterwards. Like networkx, adding an edge
+    between the same pair of nodes again replaces the data of the earlier edge
+    but keeps its position.
+
+    Attributes:
+        src (np.ndarray): source node id of each edge.
+        dst (np.ndarray): destination node id of each edge.
+        weight (np.ndarray): weight of each edge as set on the CPEdge object.
+        path_weight (np.ndarray): weight of each edge used for the longest path,
+            this differs from weight only for ignored negative weights.
+        type_code (np.ndarray): position of the edge type in EDGE_TYPES.
+        attributed_event (np.ndarray): index of the event in the trace dataframe
+            that each edge is attributed to, -1 if the edge is not attributed.
+    """
+
+    EDGE_TYPES: List[CPEdgeType] = list(CPEdgeType)
+    _TYPE_CODES: Dict[CPEdgeType, int] = {t: i for i, t in enumerate(EDGE_TYPES)}
+
+    def __init__(self) -> None:
+        self._src: np.ndarray = np.empty(0, dtype=np.int64)
+        self._dst: np.ndarray = np.empty(0, dtype=np.int64)
+        self._weight: np.ndarray = np.empty(0, dtype=np.float64)
+        self._type_code: np.ndarray = np.empty(0, dtype=np.int8)
+        self._path_weight: np.ndarray = np.empty(0, dtype=np.float64)
+        self._attributed_event: np.ndarray = np.empty(0, dtype=np.int64)
+        # trace timestamps are floats for sub microsecond resolution traces
+        self._float_weights: bool = False
+        # edges appended since the last flush
+        self._pending: List[array] = self._new_buffers()
+        # (src, dst) keys of the edges in sorted order and their positions
+        self._sorted_keys: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        # in-edges and out-edges in CSR format keyed by the number of nodes and edges
+        self._adjacency: Dict[str, Tuple[Tuple[int, int], np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def get_type_code(cls, type: CPEdgeType) -> int:
+        """Returns the code used for the edge type in the type_code array."""
+        return cls._TYPE_CODES[type]
+
+    @classmethod
+    def from_arrays(
+        cls,
+        src: np.ndarray,
+        dst: np.ndarray,
+        weight: np.ndarray,
+        path_weight: np.ndarray,
+        type_code: np.ndarray,
+        float_weights: bool,
+        attributed_event: Optional[np.ndarray] = None,
+    ) -> "CPEdgeArrays":
+        """Create the edges from arrays without duplicate (src, dst) pairs,
+        e.g. the arrays of another CPEdgeArrays object."""
+        edge_arrays = cls()
+        edge_arrays._src, edge_arrays._dst = src, dst
+        edge_arrays._weight, edge_arrays._path_weight = weight, path_weight
+        edge_arrays._type_code = type_code
+        edge_arrays._attributed_event = (
+            np.full(src.size, -1, dtype=np.int64)
+            if attributed_event is None
+            else attributed_event
+        )
+        edge_arrays._float_weights = float_weights
+        return edge_arrays
+
+    @staticmethod
+    def _new_buffers() -> List[array]:
+        return [array("q"), array("q"), array("d"), array("b"), array("q")]
+
+    def __len__(self) -> int:
+        self._flush()
+        return self._src.size
+
+    def append(self, edge: CPEdge, attributed_event: int = -1) -> None:
+        """Add an edge, optionally attributed to an event."""
+        src, dst, weight, type_code, attributed = self._pending
+        src.append(edge.begin)
+        dst.append(edge.end)
+        weight.append(edge.weight)
+        self._float_weights |= isinstance(edge.weight, float)
+        type_code.append(self.get_type_code(edge.type))
+        attributed.append(attributed_event)
+
+    def extend(
+        self,
+        src: np.ndarray,
+        dst: np.ndarray,
+        weight: np.ndarray,
+        type_code: np.ndarray,
+        attributed_event: Optional[np.ndarray] = None,
+    ) -> None:
+        """Add edges given as arrays, in array order."""
+        if attributed_event is None:
+            attributed_event = np.full(len(src), -1, dtype=np.int64)
+        for buf, values in zip(
+            self._pending, (src, dst, weight, type_code, attributed_event)
+        ):
+            buf.frombytes(np.ascontiguousarray(values, dtype=buf.typecode).tobytes())
+        self._float_weights |= np.asarray(weight).dtype.kind == "f"
+
+    @property
+    def src(self) -> np.ndarray:
+        self._flush()
+        return self._src
+
+    @property
+    def dst(self) -> np.ndarray:
+        self._flush()
+        return self._dst
+
+    @property
+    def weight(self) -> np.ndarray:
+        self._flush()
+        return self._weight
+
+    @property
+    def path_weight(self) -> np.ndarray:
+        self._flush()
+        return self._path_weight
+
+    @property
+    def type_code(self) -> np.ndarray:
+        self._flush()
+        return self._type_code
+
+    @property
+    def attributed_event(self) -> np.ndarray:
+        self._flush()
+        return self._attributed_event
+
+    @staticmethod
+    def _key(src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+        return (src.astype(np.int64) << 32) | dst.astype(np.int64)
+
+    def find(self, begin: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """Get the positions of the edges (begin[i], end[i]).
+        Args:
+            begin, end (np.ndarray): source and destination node ids.
+        Returns:
+            np.ndarray: positions of the edges, -1 for missing edges.
+        """
+        self._flush()
+        query = self._key(np.asarray(begin), np.asarray(end))
+        if self._src.size == 0:
+            return np.full(query.shape, -1, dtype=np.int64)
+        if self._sorted_keys is None:
+            keys = self._key(self._src, self._dst)
+            order = np.argsort(keys)
+            self._sorted_keys = (keys[order], order)
+        keys, order = self._sorted_keys
+        pos = np.minimum(np.searchsorted(keys, query), keys.size - 1)
+        return np.where(keys[pos] == query, order[pos], -1)
+
+    def get_in_edges(self, num_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the positions of the edges grouped by destination node in insertion
+        order, and for each node the offset of its group (CSR format).
+        The arrays are cached until edges or nodes are added.
+        Args:
+            num_nodes (int): number of nodes in the graph.
+        """
+        return self._get_adjacency("dst", num_nodes)
+
+    def get_out_edges(self, num_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the positions of the edges grouped by source node in insertion
+        order, and for each node the offset of its group (CSR format).
+        The arrays are cached until edges or nodes are added.
+        Args:
+            num_nodes (int): number of nodes in the graph.
+        """
+        return self._get_adjacency("src", num_nodes)
+
+    def _get_adjacency(
+        self, column: str, num_nodes: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # Replaced edges keep their position and nodes, so the lengths are enough
+        key = (num_nodes, len(self))
+        cached = self._adjacency.get(column)
+        if cached is None or cached[0] != key:
+            nodes = getattr(self, column)
+            edges = np.argsort(nodes, kind="stable")
+            offsets = np.searchsorted(nodes[edges], np.arange(num_nodes + 1))
+            cached = self._adjacency[column] = (key, edges, offsets)
+        return cached[1], cached[2]
+
+    def get_edge(self, i: int) -> CPEdge:
+        """Create the CPEdge object for the edge at position i."""
+        self._flush()
+        weight = float(self._weight[i])
+        return CPEdge(
+            begin=int(self._src[i]),
+            end=int(self._dst[i]),
+            weight=weight if self._float_weights else int(weight),
+            type=self.EDGE_TYPES[self._type_code[i]],
+        )
+
+    def set_path_weight(self, i: Union[int, np.ndarray], weight: float) -> None:
+        """Override the weight of the edge(s) at position i for the longest path."""
+        self._flush()
+        self._path_weight[i] = weight
+
+    def set_attributed_event(
+        self, i: Union[int, np.ndarray], ev_idx: Union[int, np.ndarray]
+    ) -> None:
+        """Attribute the edge(s) at position i to the event(s) ev_idx."""
+        self._flush()
+        self._attributed_event[i] = ev_idx
+
+    def _flush(self) -> None:
+        """Move the pending edges into the arrays and merge replaced edges."""
+        if len(self._pending[0]) == 0:
+            return
+        src, dst, weight, type_code, attributed = (
+            np.concatenate([arr, np.frombuffer(buf, dtype=arr.dtype)])
+            for arr, buf in zip(
+                (
+                    self._src,
+                    self._dst,
+                    self._weight,
+                    self._type_code,
+                    self._attributed_event,
+                ),
+                self._pending,
+            )
+        )
+        path_weight = np.concatenate(
+            [self._path_weight, weight[self._path_weight.size :]]
+        )
+        self._pending = self._new_buffers()
+        self._sorted_keys = None
+
+        # For repeated (src, dst) pairs the last edge wins at the first position,
+        # and the edge keeps the last event it was attributed to.
+        keys = self._key(src, dst)
+        order = np.argsort(keys, kind="stable")
+        is_first = np.ones(src.size, dtype=bool)
+        is_first[1:] = keys[order][1:] != keys[order][:-1]
+        if not is_first.all():
+            first = order[is_first]
+            last = order[np.append(np.flatnonzero(is_first)[1:] - 1, src.size - 1)]
+            for arr in (weight, type_code, path_weight):
+                arr[first] = arr[last]
+            group = np.cumsum(is_first) - 1
+            is_attributed = attributed[order] >= 0
+            last_attributed = np.full(first.size, -1, dtype=np.int64)
+            np.maximum.at(
+                last_attributed, group[is_attributed], np.flatnonzero(is_attributed)
+            )
+            has_attribution = last_attributed >= 0
+            attributed[first[has_attribution]] = attributed[
+                order[last_attributed[has_attribution]]
+            ]
+            keep = np.sort(first)
+            src, dst, weight, type_code, path_weight, attributed = (
+                arr[keep]
+                for arr in (src, dst, weight, type_code, path_weight, attributed)
+            )
+        self._src, self._dst, self._weight = src, dst, weight
+        self._type_code, self._path_weight = type_code, path_weight
+        self._attributed_event = attributed
+
+
+class CPEdgeEventMap(Mapping):
+    """Read only map from an edge (u, v) -> the event id it is attributed to,
+    backed by the attributed_event array of CPEdgeArrays."""
+
+    def __init__(self, edge_arrays: CPEdgeArrays) -> None:
+        self._edge_arrays = edge_arrays
+
+    def __getitem__(self, uv: Tuple[int, int]) -> int:
+        i = int(self._edge_arrays.find(*uv))
+        if i < 0 or self._edge_arrays.attributed_event[i] < 0:
+            raise KeyError(uv)
+        return int(self._edge_arrays.attributed_event[i])
+
+    def __iter__(self) -> Generator[Tuple[int, int], None, None]:
+        is_attributed = self._edge_arrays.attributed_event >= 0
+        yield from zip(
+            self._edge_arrays.src[is_attributed].tolist(),
+            self._edge_arrays.dst[is_attributed].tolist(),
+        )
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._edge_arrays.attributed_event >= 0))
+
+
+@dataclass(frozen=True)
+class CPFullTraceData:
+    """Data derived from the full trace of a rank that does not depend on
+    the region of interest. It can be shared by all CPGraph objects
+    constructed for the same rank.
+
+    Attributes:
+        queue_length (pd.DataFrame): queue length time series of the rank.
+        cuda_record_calls (Optional[pd.DataFrame]): cudaEventRecord calls with
+            their previous kernel launch, see CPGraph._get_cuda_event_record_df().
+        cuda_stream_wait_events (Optional[pd.DataFrame]): cudaStreamWaitEvent calls
+            with their next kernel launch, see CPGraph._get_cuda_stream_wait_event_df().
+        call_stack (Optional[pd.DataFrame]): depth, dfs_enter and dfs_exit of the CPU
+            events on the call stacks of the rank, see CPGraph._get_call_stack_df().
+            When None each CPGraph builds the call stacks of its region of interest.
+    """
+
+    queue_length: pd.DataFrame
+    cuda_record_calls: Optional[pd.DataFrame]
+    cuda_stream_wait_events: Optional[pd.DataFrame]
+    call_stack: Optional[pd.DataFrame] = None
+
+
 @dataclass(frozen=True)
 class _CPGraphData:
     """Contains data members of CPGraph that we can save and
@@ -118,6 +570,10 @@ class _CPGraphData:
     edge_to_event_map: Dict[Tuple[int, int], int]
 
 
+# Smallest frontier of CPGraph._get_downstream_nodes() expanded with numpy
+_MIN_VECTORIZED_FRONTIER: int = 64
+
+
 class CPGraph(nx.DiGraph):
     """Critical path analysis graph representation for trace from one rank.
     This object constructs a graph that can be analyzed using networkx library.
@@ -129,10 +585,15 @@ class CPGraph(nx.DiGraph):
     Attributes:
         trace_df (pd.DataFrame): dataframe of trace events used to construct this graph.
         symbol_table (TraceSymbolTable): a symbol table used to encode the symbols in the trace.
-        node_list (List[int]): list of critical path node objects, index in this list is always the node id..
+        node_list (CPNodeArrays): columnar list of critical path nodes, index in this list is always the node id.
         critical_path_nodes (List[int]): list of node ids on the critical path.
         critical_path_events_set (Set[int]): set of event ids corresponding to the critical path nodes.
         critical_path_edges_set (Set[CPEdge]): set of edge objects that are on the critical path.
+        edge_arrays (CPEdgeArrays): columnar copy of the edges in the graph.
+        edge_to_event_map (CPEdgeEventMap): map from edge (u, v) -> attributed event id.
+        use_networkx (bool): if False, the nodes and edges are only kept in node_list
+            and edge_arrays, and the critical path is computed without networkx,
+            see build_networkx_graph().
     """
 
     BLOCKING_SYNC_CALLS = [
@@ -153,7 +614,13 @@ class CPGraph(nx.DiGraph):
         return hta_options.critical_path_add_zero_weight_launch_edges()
 
     def __init__(
-        self, t: Optional["Trace"], t_full: "Trace", rank: int, G=None
+        self,
+        t: Optional["Trace"],
+        t_full: "Trace",
+        rank: int,
+        G=None,
+        use_networkx: bool = True,
+        full_trace_data: Optional[CPFullTraceData] = None,
     ) -> None:
         """Initialize a critical path graph object. This can be done in two
         ways
@@ -167,13 +634,34 @@ class CPGraph(nx.DiGraph):
             t_full (Trace): Full Trace object.
             rank (int): Rank to perform analysis on.
             G (networkx.DiGraph): An optional DiGraph object.
+            use_networkx (bool): Add the nodes and edges to the networkx graph and use
+                networkx to compute the critical path. When False the graph is kept
+                in numpy arrays and the critical path is computed by a dynamic
+                program over a topological order. Default is True.
+            full_trace_data (CPFullTraceData): Optional data derived from the full trace
+                of the rank, computed when it is not provided.
         """
         self.rank: int = rank
+        self.use_networkx: bool = use_networkx or G is not None
+        self.node_list: CPNodeArrays = CPNodeArrays()
+        self.edge_arrays: CPEdgeArrays = CPEdgeArrays()
         self.t = t
         self.t_full = t_full
         self.full_trace_df: pd.DataFrame = self.t_full.get_trace(rank)
         self.sym_table = t_full.symbol_table.get_sym_table()
         self.symbol_table = t_full.symbol_table
+        self._full_trace_data: Optional[CPFullTraceData] = full_trace_data
+
+        # caches of shortened symbol names and communication kernel flags
+        self._short_names: Dict[int, str] = {}
+        self._comm_kernel_flags: Dict[str, bool] = {}
+
+        # longest path distances and predecessors of the nodes, see what_if()
+        self._base_distances: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        # topological order of the nodes keyed by the number of nodes and edges
+        self._topological_order: Optional[
+            Tuple[Tuple[int, int], Optional[np.ndarray]]
+        ] = None
 
         # init networkx DiGraph
         super(CPGraph, self).__init__(G)
@@ -187,70 +675,152 @@ class CPGraph(nx.DiGraph):
         self.critical_path_events_set: Set[int] = set()
         self.critical_path_edges_set: Set[CPEdge] = set()
 
-        self.node_list: List[CPNode] = []
-
         # map from event id in trace dataframe -> CPGraph node_id
         self.event_to_start_node_map: Dict[int, int] = {}
         self.event_to_end_node_map: Dict[int, int] = {}
 
-        # map from edge (u, v) -> event id in trace dataframe
-        # this is the attributed event for an edge
-        self.edge_to_event_map: Dict[Tuple[int, int], int] = {}
-
         self._construct_graph()
 
+    @property
+    def edge_to_event_map(self) -> CPEdgeEventMap:
+        """Map from edge (u, v) -> event id in trace dataframe,
+        this is the attributed event for an edge."""
+        return CPEdgeEventMap(self.edge_arrays)
+
+    @edge_to_event_map.setter
+    def edge_to_event_map(self, edge_to_event_map: Dict[Tuple[int, int], int]) -> None:
+        """Attribute the edges in the map to their events, the other edges
+        are not attributed."""
+        uv = np.array(list(edge_to_event_map.keys()), dtype=np.int64).reshape(-1, 2)
+        ev_ids = np.fromiter(
+            edge_to_event_map.values(), dtype=np.int64, count=len(edge_to_event_map)
+        )
+        pos = self.edge_arrays.find(uv[:, 0], uv[:, 1])
+        self.edge_arrays.set_attributed_event(np.arange(len(self.edge_arrays)), -1)
+        self.edge_arrays.set_attributed_event(pos[pos >= 0], ev_ids[pos >= 0])
+
     def _add_node(self, node: CPNode) -> int:
         """Adds a node to the graph.
         Args: node (CPNode): node object
         Returns int as node index."""
-        self.node_list.append(node)
-        idx = node.idx = len(self.node_list) - 1
-        self.add_node(idx)  # Call to networkx.DiGraph
+        idx = node.idx = self.node_list.append(node)
+        if self.use_networkx:
+            self.add_node(idx)  # Call to networkx.DiGraph
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug(f"Adding critical path node = {node}")
         return idx
 
-    def _add_edge(self, edge: CPEdge) -> None:
+    def _add_edge(self, edge: CPEdge, attributed_event: int = -1) -> None:
         """Adds a edge to the graph.
-        Args: node (CPEdge): edge object"""
+        Args: node (CPEdge): edge object, attributed_event (int): the event
+            the edge is attributed to, -1 if the edge is not attributed."""
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug(f"Adding critical path edge: {edge}")
-        self.add_edge(edge.begin, edge.end, weight=edge.weight, object=edge)
+        self.edge_arrays.append(edge, attributed_event)
+        if self.use_networkx:
+            self.add_edge(edge.begin, edge.end, weight=edge.weight, object=edge)
+
+    def _add_edges(
+        self,
+        src: np.ndarray,
+        dst: np.ndarray,
+        weight: np.ndarray,
+        type_code: np.ndarray,
+        attributed_event: Optional[np.ndarray] = None,
+    ) -> None:
+        """Adds edges to the graph in bulk, in array order.
+        Args: src, dst (np.ndarray): node indices, weight (np.ndarray): edge weights,
+            type_code (np.ndarray): edge type codes, see CPEdgeArrays.EDGE_TYPES,
+            attributed_event (np.ndarray): attributed event of each edge or -1."""
+        self.edge_arrays.extend(src, dst, weight, type_code, attributed_event)
+        if self.use_networkx:
+            edges = (
+                CPEdge(begin=u, end=v, weight=w, type=CPEdgeArrays.EDGE_TYPES[c])
+                for u, v, w, c in zip(
+                    src.tolist(), dst.tolist(), weight.tolist(), type_code.tolist()
+                )
+            )
+            self.add_edges_from(
+                (e.begin, e.end, {"weight": e.weight, "object": e}) for e in edges
+            )
+
+    def get_edge(self, u: int, v: int) -> CPEdge:
+        """Lookup the edge object between two nodes
+        Args:
+            u, v (int): source and destination node ids.
+        Returns:
+            CPEdge: edge between the nodes, raises KeyError if there is no such edge.
+        """
+        if self.use_networkx:
+            return self.edges[u, v]["object"]
+        i = int(self.edge_arrays.find(u, v))
+        if i < 0:
+            raise KeyError(f"No edge between nodes {u} -> {v}")
+        return self.edge_arrays.get_edge(i)
+
+    def get_all_edges(self) -> Generator[CPEdge, None, None]:
+        """Iterate over all the edge objects in the graph"""
+        if self.use_networkx:
+            for u, v in self.edges:
+                yield self.edges[u, v]["object"]
+        else:
+            for i in range(len(self.edge_arrays)):
+                yield self.edge_arrays.get_edge(i)
+
+    def _set_path_weights(self, positions: np.ndarray, weight: int) -> None:
+        """Override the weight used to find the critical path of the edges
+        at the given positions in edge_arrays"""
+        self.edge_arrays.set_path_weight(positions, weight)
+        if self.use_networkx:
+            for u, v in zip(
+                self.edge_arrays.src[positions].tolist(),
+                self.edge_arrays.dst[positions].tolist(),
+            ):
+                self.edges[u, v]["weight"] = weight
+
+    def get_edge_attributed_events(self) -> np.ndarray:
+        """Returns an array with the event attributed to each edge in edge_arrays,
+        the value is -1 if the edge is not attributed to an event."""
+        return self.edge_arrays.attributed_event.copy()
 
     def _add_edge_helper(
         self,
-        src: CPNode,
-        dest: CPNode,
+        src: int,
+        dest: int,
         type: CPEdgeType = CPEdgeType.OPERATOR_KERNEL,
         zero_weight: bool = False,
+        src_parent: Optional[int] = None,
     ) -> CPEdge:
         """Adds a edge between two nodes
-        Args: src, dest (CPNode): node objects for source and dest."""
+        Args: src, dest (int): node ids for source and dest,
+            src_parent (int): parent event of the src node, when provided the
+            edge is attributed to an event, see _get_edge_attribution()."""
         if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(
-                f"Adding an edge between nodes {src.idx} -> {dest.idx}"
-                f" type = {type}"
-            )
-        assert src.idx != dest.idx, f"Src node {src} == Dest node {dest}"
+            logger.debug(f"Adding an edge between nodes {src} -> {dest} type = {type}")
+        assert src != dest, f"Src node {src} == Dest node {dest}"
         weight = (
             0
             if (
                 type in [CPEdgeType.DEPENDENCY, CPEdgeType.SYNC_DEPENDENCY]
                 or zero_weight
             )
-            else (dest.ts - src.ts)
+            else (self.node_list.ts[dest] - self.node_list.ts[src]).item()
         )
 
-        e = CPEdge(begin=src.idx, end=dest.idx, weight=weight, type=type)
-        self._add_edge(e)
+        e = CPEdge(begin=src, end=dest, weight=weight, type=type)
+        attributed_event = (
+            -1 if src_parent is None else self._get_edge_attribution(e, src_parent)
+        )
+        self._add_edge(e, attributed_event)
         return e
 
-    def _attribute_edge(self, e: CPEdge, src_parent: int) -> None:
+    def _get_edge_attribution(self, e: CPEdge, src_parent: int) -> int:
         """Attribute an edge to nearest matching event idx.
-        This function updates the edge_to_event_map.
         Args:
             e (CPEdge): Edge to attribute
             src_parent (int): Parent event of the src node.
+        Returns:
+            int: the attributed event id, -1 if the edge is not attributed.
 
         The src_parent is required when we consider nested operators,
         see the explanation below for more details.
@@ -258,7 +828,7 @@ class CPGraph(nx.DiGraph):
         # Edge attribution is only applicable for edges representing
         # operator or kernel spans or delay spans
         if e.type not in {CPEdgeType.OPERATOR_KERNEL, CPEdgeType.KERNEL_KERNEL_DELAY}:
-            return
+            return -1
 
         """ For nested events consider the following cases
         where the src and dest can each be either start or end nodes.
@@ -286,34 +856,34 @@ class CPGraph(nx.DiGraph):
         The edge between Op B and Op C should be attributed to the parent
         operator A. Hence the exception here.
         """
-        src, dest = self.node_list[e.begin], self.node_list[e.end]
+        ev_idx, is_start = self.node_list.ev_idx, self.node_list.is_start
 
-        ev_idx = 0
         if e.type == CPEdgeType.KERNEL_KERNEL_DELAY:
             # arbitrary but assigning the delay to previous kernel
-            ev_idx = src.ev_idx
-        elif src.is_start:
-            ev_idx = src.ev_idx  # Case 1 & 2
-        elif not dest.is_start:
-            ev_idx = dest.ev_idx  # Case 3
+            attributed_event = ev_idx[e.begin]
+        elif is_start[e.begin]:
+            attributed_event = ev_idx[e.begin]  # Case 1 & 2
+        elif not is_start[e.end]:
+            attributed_event = ev_idx[e.end]  # Case 3
         else:
-            ev_idx = src_parent  # Case 4
-        self.edge_to_event_map[(src.idx, dest.idx)] = int(ev_idx)
+            attributed_event = src_parent  # Case 4
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug(
-                f"Attributing edge between nodes {src.idx} -> {dest.idx}"
-                f" to event id = {ev_idx}, event_name = {self._get_node_name(ev_idx)}"
+                f"Attributing edge between nodes {e.begin} -> {e.end}"
+                f" to event id = {attributed_event}, "
+                f"event_name = {self._get_node_name(attributed_event)}"
             )
+        return int(attributed_event)
 
     @cached_property
     def _event_to_attributed_edges_map(self) -> Dict[int, List[CPEdge]]:
         """Caches a map from an event ID -> list of CPEdge objects
         attributed to an event"""
         d: Dict[int, List[CPEdge]] = defaultdict(list)
-        for uv, ev_idx in self.edge_to_event_map.items():
-            u, v = uv
-            e = self.edges[u, v]["object"]
-            d[ev_idx].append(e)
+        attributed = self.edge_arrays.attributed_event
+        for i in np.flatnonzero(attributed >= 0).tolist():
+            e = self.edge_arrays.get_edge(i)
+            d[int(attributed[i])].append(e)
         return d
 
     def _get_node_name(self, ev_id: int) -> str:
@@ -339,6 +909,22 @@ class CPGraph(nx.DiGraph):
             self.node_list[end_node] if end_node >= 0 else None,
         )
 
+    def _get_node_indices_for_events(
+        self, ev_ids: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized lookup of the start and end node indices for events
+        Args:
+            ev_ids (np.ndarray): indices of the events in trace dataframe.
+        Returns:
+            Tuple[np.ndarray, np.ndarray]
+                Start and end node indices for the events, -1 if an event has no nodes.
+        """
+        start_nodes, end_nodes = (
+            pd.Series(m, dtype=np.int64).reindex(ev_ids, fill_value=-1).to_numpy()
+            for m in (self.event_to_start_node_map, self.event_to_end_node_map)
+        )
+        return start_nodes, end_nodes
+
     def get_events_for_edge(self, edge: CPEdge) -> Tuple[int, int]:
         """Lookup corresponding event nodes for an edge
         Args:
@@ -347,10 +933,8 @@ class CPGraph(nx.DiGraph):
             Tuple[int, int]
                 Pair of event ids representing src and dest of the edge.
         """
-        start_node, end_node = edge.begin, edge.end
-        return int(self.node_list[start_node].ev_idx), int(
-            self.node_list[end_node].ev_idx
-        )
+        ev_idx = self.node_list.ev_idx
+        return int(ev_idx[edge.begin]), int(ev_idx[edge.end])
 
     def get_event_attribution_for_edge(self, edge: CPEdge) -> Optional[int]:
         """Helper to look up event attributed to an edge
@@ -421,17 +1005,12 @@ class CPGraph(nx.DiGraph):
         )
 
         # Create nodes
-        _df = nodes_df
-        self.node_list = [
-            CPNode(*args)
-            for args in zip(
-                _df["idx"],
-                _df["ev_idx"],
-                _df["ts"],
-                _df["is_start"],
-                _df["is_blocking_call"],
-            )
-        ]
+        self.node_list = CPNodeArrays.from_arrays(
+            ev_idx=nodes_df["ev_idx"].to_numpy(dtype=np.int64),
+            ts=nodes_df["ts"].to_numpy(),
+            is_start=nodes_df["is_start"].to_numpy(dtype=bool),
+            is_blocking=nodes_df["is_blocking_call"].to_numpy(dtype=bool),
+        )
 
         _df = nodes_df[nodes_df.is_start]
         self.event_to_start_node_map = dict(zip(_df["ev_idx"], _df["idx"]))
@@ -441,22 +1020,30 @@ class CPGraph(nx.DiGraph):
 
     @timeit
     def _construct_graph_from_call_stacks(self) -> None:
-        cg = CallGraph(self.t, ranks=[self.rank])
+        call_stack = self.get_full_trace_data().call_stack
+        if call_stack is None:
+            call_stack = self._get_call_stack_df(self.t)
 
-        cpu_call_stacks = (
-            csg for csg in cg.call_stacks if csg.device_type == DeviceType.CPU
+        # Only threads without GPU events have a call stack
+        is_cpu_thread = (
+            self.trace_df.groupby(["pid", "tid"])["stream"].transform("max").lt(0)
         )
+        cpu_df = self.trace_df.loc[is_cpu_thread, ["index", "pid", "tid", "ts"]].join(
+            call_stack
+        )
+        cpu_df[call_stack.columns] = cpu_df[call_stack.columns].fillna(-1)
 
-        for csg in cpu_call_stacks:
-            self._construct_graph_from_call_stack(csg)
+        for _, thread_df in cpu_df.groupby(["pid", "tid"]):
+            self._construct_graph_from_call_stack(thread_df)
 
     def _construct_graph_from_call_stack(
-        self, csg: CallStackGraph, link_operators: bool = True
+        self, thread_df: pd.DataFrame, link_operators: bool = True
     ) -> None:
         """Perform a depth first traversal of the Call Stack for CPU threads
         and generated CP node events.
 
-            @args: csg (CallStackGraph): HTA CallStackGraph object for one CPU thread.
+            @args: thread_df (pd.DataFrame): events of one CPU thread with the
+                columns of CPFullTraceData.call_stack.
             @args link_operators (bool): If set add an automatic dependency edge
                 between consecutive operators on a single thread.
 
@@ -469,24 +1056,26 @@ class CPGraph(nx.DiGraph):
         """
 
         # Track the stack of last seen events
-        last_node: Optional[CPNode] = None
-        last_highlevel_op: Optional[CPNode] = None
+        last_node: Optional[int] = None
+        last_highlevel_op: Optional[int] = None
         op_depth = 0
         last_ev_parent: Optional[int] = None
+        is_blocking = self.node_list.is_blocking
 
-        def enter_func(ev_id, csnode):
+        def enter_func(ev_id: int, parent: int, depth: int) -> None:
             nonlocal last_node
             nonlocal last_highlevel_op
             nonlocal op_depth
             nonlocal last_ev_parent
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(
-                    "=" * csnode.depth
+                    "=" * depth
                     + f"Entering node {self._get_node_name(ev_id)}, id = {ev_id}"
                 )
 
-            start_node, end_node = self.get_nodes_for_event(ev_id)
-            if start_node is None or end_node is None:
+            start_node = self.event_to_start_node_map.get(ev_id, -1)
+            end_node = self.event_to_end_node_map.get(ev_id, -1)
+            if start_node < 0 or end_node < 0:
                 return
 
             if link_operators and op_depth == 0 and last_highlevel_op is not None:
@@ -497,55 +1086,95 @@ class CPGraph(nx.DiGraph):
             op_depth += 1
 
             if last_node is not None:
-                e = self._add_edge_helper(last_node, start_node)
-                self._attribute_edge(e, last_ev_parent)
+                self._add_edge_helper(last_node, start_node, src_parent=last_ev_parent)
             last_node = start_node
-            last_ev_parent = csnode.parent
+            last_ev_parent = parent
 
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(
-                    "=" * csnode.depth + f"Op depth = {op_depth} last_node={last_node}"
+                    "=" * depth + f"Op depth = {op_depth} last_node={last_node}"
                 )
 
-        def exit_func(ev_id, csnode):
+        def exit_func(ev_id: int, parent: int, depth: int) -> None:
             nonlocal last_node
             nonlocal last_highlevel_op
             nonlocal op_depth
             nonlocal last_ev_parent
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(
-                    "=" * csnode.depth
+                    "=" * depth
                     + f"Exiting node {self._get_node_name(ev_id)}, id = {ev_id}"
                 )
 
-            start_node, end_node = self.get_nodes_for_event(ev_id)
-            if start_node is None or end_node is None:
+            start_node = self.event_to_start_node_map.get(ev_id, -1)
+            end_node = self.event_to_end_node_map.get(ev_id, -1)
+            if start_node < 0 or end_node < 0:
                 return
 
             op_depth -= 1
 
             if last_node is not None:
-                zero_weight = start_node.is_blocking
+                zero_weight = bool(is_blocking[start_node])
                 if zero_weight and logger.isEnabledFor(logging.DEBUG):
                     logger.debug(
                         "Zeroing weight for synchronization runtime call "
                         f"id = {ev_id}"
                     )
-                e = self._add_edge_helper(last_node, end_node, zero_weight=zero_weight)
-                self._attribute_edge(e, last_ev_parent)
+                self._add_edge_helper(
+                    last_node,
+                    end_node,
+                    zero_weight=zero_weight,
+                    src_parent=last_ev_parent,
+                )
 
             if op_depth == 0:
                 last_node = None
                 last_highlevel_op = end_node
             else:
                 last_node = end_node
-                last_ev_parent = csnode.parent
+                last_ev_parent = parent
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(
-                    "=" * csnode.depth + f"Op depth = {op_depth} last_node={last_node}"
+                    "=" * depth + f"Op depth = {op_depth} last_node={last_node}"
                 )
 
-        csg.dfs_traverse(enter_func, exit_func)
+        _dfs_traverse_call_stack(thread_df, enter_func, exit_func)
+
+    def get_full_trace_data(self) -> CPFullTraceData:
+        """Returns the data derived from the full trace of the rank,
+        computing it on the first call if it was not passed to the constructor."""
+        if self._full_trace_data is None:
+            # Note getting queue length on the clipped dataframe was showing errors,
+            # it is worthwhile to consider the entire trace instead, hence use t_full
+            self._full_trace_data = CPFullTraceData(
+                queue_length=TraceCounters._get_queue_length_time_series_for_rank(
+                    self.t_full, self.rank
+                ),
+                cuda_record_calls=self._get_cuda_event_record_df(),
+                cuda_stream_wait_events=self._get_cuda_stream_wait_event_df(),
+            )
+        return self._full_trace_data
+
+    def _get_call_stack_df(self, t: "Trace") -> pd.DataFrame:
+        """Builds the call stacks of the CPU threads of the rank in t. When t is
+        the full trace, the call stacks can be shared by all regions of interest
+        that only slice them, see _dfs_traverse_call_stack().
+
+        Args:
+            t (Trace): the full trace or the clipped trace of the rank.
+
+        Returns:
+            pd.DataFrame: depth, dfs_enter and dfs_exit of the CPU events with a
+                positive duration, the events kept by the clipped dataframe.
+        """
+        trace_df = t.get_trace(self.rank)
+        cpu_df = trace_df.loc[trace_df["stream"].eq(-1) & trace_df["dur"].gt(0)].copy()
+        CallGraph(
+            _get_trace_view(t, self.rank, cpu_df),
+            ranks=[self.rank],
+            cache_stack_columns=False,
+        )
+        return cpu_df[["depth", "dfs_enter", "dfs_exit"]].astype(np.int64)
 
     def _get_cuda_runtime_calls_df(self, retain_index: bool = True) -> pd.DataFrame:
         """Returns a dataframe of CUDA launch runtime calls and associated CUDA stream
@@ -627,17 +1256,7 @@ class CPGraph(nx.DiGraph):
 
         # CUDA launch runtime calls
         runtime_calls = self._get_cuda_runtime_calls_df(retain_index=False)[
-            [
-                "pid",
-                "tid",
-                "ts",
-                "index",
-                "name",
-                "correlation",
-                "launch_id",
-                "stream_kernel",
-                "gpu_kernel",
-            ]
+            ["ts", "index", "correlation", "stream_kernel", "gpu_kernel"]
         ].rename(columns={"stream_kernel": "stream", "gpu_kernel": "gpu"})
 
         # CUDA Event Record Event calls
@@ -665,61 +1284,27 @@ class CPGraph(nx.DiGraph):
             .rename(columns={"event_stream": "stream"})
         )
 
-        def find_previous_launch(gpu, stream):
-            """Correlates the closes CUDA kernel launch to a CUDA Record Event"""
-            comb = (
-                pd.concat([runtime_calls, cuda_record_calls])
-                .sort_values(by="ts", axis=0)
-                .query(f"gpu == {gpu} and stream == {stream}")
-                .copy()
-            )
-            comb.launch_id.fillna(-1, inplace=True)
-            # previous_launch_id is max of launch ids seen uptill now
-            comb.loc[:, "previous_launch_id"] = comb.launch_id.cummax(skipna=False)
-
-            comb_launches = comb.loc[comb.name != cudaEventRecord_id].copy()
-            comb_cuda_records = comb.loc[comb.name == cudaEventRecord_id].copy()
-            comb_cuda_records.drop(axis=1, columns="launch_id", inplace=True)
-
-            # Now join the previous_launch_id to actual kernel launch events.
-            return pd.merge(
-                comb_cuda_records,
-                comb_launches[["launch_id", "index", "correlation"]],
-                left_on="previous_launch_id",
-                right_on="launch_id",
-                how="left",
-                suffixes=("", "_launch_event"),
-                # multiple CUDA records can have same previous launch ID, but not vice versa
-                validate="many_to_one",
-            )
-
-        gpu_streams = (
-            cuda_record_calls[["gpu", "stream"]]
-            .groupby(["gpu", "stream"])
-            .groups.keys()
-        )
-
-        cuda_record_dfs = [
-            find_previous_launch(gpu, stream) for (gpu, stream) in gpu_streams
-        ]
-        if len(cuda_record_dfs) == 0:
+        if cuda_record_calls.empty:
             return None
 
-        cuda_record_calls = pd.concat(cuda_record_dfs, axis=0).sort_values(
-            by="ts", axis=0
+        # The previous launch of a CUDA Event Record is the last kernel launch
+        # on the same gpu and stream that started before the record.
+        launches = runtime_calls.rename(
+            columns={
+                "index": "index_previous_launch",
+                "correlation": "correlation_launch_event",
+            }
         )
-
-        # Cleanup temporary columns
-        # PS: you can comment the below if you need to debug any issue
-        cuda_record_calls.drop(
-            axis=1,
-            columns=["launch_id", "previous_launch_id"],
-            inplace=True,
+        cuda_record_calls = pd.merge_asof(
+            cuda_record_calls.astype(launches.dtypes[["ts", "gpu", "stream"]]),
+            launches,
+            on="ts",
+            by=["gpu", "stream"],
+            direction="backward",
         )
-        cuda_record_calls.rename(
-            columns={"index_launch_event": "index_previous_launch"}, inplace=True
+        cuda_record_calls["index_previous_launch"] = (
+            cuda_record_calls["index_previous_launch"].fillna(-1).astype(int)
         )
-        cuda_record_calls.index_previous_launch.fillna(-1, inplace=True)
 
         return cuda_record_calls
 
@@ -741,9 +1326,9 @@ class CPGraph(nx.DiGraph):
             return None
 
         # CUDA launch runtime calls
-        runtime_calls = self._get_cuda_runtime_calls_df()
-        runtime_calls.drop(axis=1, columns=["stream"], inplace=True)
-        runtime_calls.rename(columns={"stream_kernel": "stream"}, inplace=True)
+        runtime_calls = self._get_cuda_runtime_calls_df(retain_index=False)[
+            ["ts", "pid", "tid", "stream_kernel", "index"]
+        ].rename(columns={"stream_kernel": "stream"})
 
         gpu_kernels = self.full_trace_df.query("stream != -1 and index_correlation > 0")
 
@@ -776,117 +1361,27 @@ class CPGraph(nx.DiGraph):
             .set_index("index")
         )
 
-        def find_next_launch(pid, tid, stream):
-            """Correlates the closes CUDA kernel launch to a CUDA Stream Wait Event"""
-            # Combine CUDA runtime launch calls and cuda stream wait event calls
-            # on the same pid, tid, stream
-            comb = (
-                pd.concat([runtime_calls, cuda_stream_wait_events])
-                .sort_values(by="ts", axis=0)
-                .query(f"pid == {pid} and tid == {tid} and stream == {stream}")
-                .copy()
-            )
-            comb.launch_id.fillna(sys.maxsize, inplace=True)
-
-            # Next launch ID is the next lowest launch ID in the sorted dataframe
-            comb["next_launch_id"] = comb["launch_id"].iloc[::-1].cummin()
-            comb.reset_index(inplace=True)
-
-            comb_launches = comb.loc[comb.name != cudaStreamWaitEvent_id].copy()
-            comb_stream_wait_events = comb.loc[
-                comb.name == cudaStreamWaitEvent_id
-            ].copy()
-            comb_stream_wait_events.drop(axis=1, columns="launch_id", inplace=True)
-
-            # Now join the next_launch_id to actual kernel launch events.
-            return pd.merge(
-                comb_stream_wait_events,
-                comb_launches[["launch_id", "index", "correlation"]],
-                left_on="next_launch_id",
-                right_on="launch_id",
-                how="left",
-                suffixes=("", "_launch_event"),
-            )
-
-        pid_tid_streams = (
-            cuda_stream_wait_events[["pid", "tid", "stream"]]
-            .drop_duplicates()
-            .to_dict("records")
-        )
-
-        cuda_stream_wait_events = pd.concat(
-            [
-                find_next_launch(r["pid"], r["tid"], r["stream"])
-                for r in pid_tid_streams
-            ],
-            axis=0,
-        ).sort_values(by="ts", axis=0)
+        if cuda_stream_wait_events.empty:
+            return None
 
-        # Cleanup temporary columns
-        cuda_stream_wait_events.drop(
-            axis=1,
-            columns=["launch_id", "next_launch_id", "correlation_launch_event"],
-            inplace=True,
+        # The next launch of a cudaStreamWaitEvent is the first kernel launch
+        # on the same CPU thread and stream that started after the wait.
+        launches = runtime_calls.rename(columns={"index": "index_next_launch"})
+        cuda_stream_wait_events = pd.merge_asof(
+            cuda_stream_wait_events.reset_index().astype(
+                launches.dtypes[["ts", "pid", "tid", "stream"]]
+            ),
+            launches,
+            on="ts",
+            by=["pid", "tid", "stream"],
+            direction="forward",
         )
-        cuda_stream_wait_events.rename(
-            columns={"index_launch_event": "index_next_launch"}, inplace=True
+        cuda_stream_wait_events["index_next_launch"] = (
+            cuda_stream_wait_events["index_next_launch"].fillna(-1).astype(int)
         )
-        cuda_stream_wait_events.index_next_launch.fillna(-1, inplace=True)
 
         return cuda_stream_wait_events.set_index("index")
 
-    def _check_event_sync_helper(self, row) -> bool:
-        eid = row.index
-        if not hasattr(row, "wait_on_cuda_event_record_corr_id"):
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(
-                    "CUDA Stream Wait event does not have correlation id of "
-                    f"cudaEventRecord, name = {self._get_node_name(eid)}, "
-                    f"correlation = {row.correlation}"
-                )
-            return False
-
-        if (not hasattr(row, "index_previous_launch")) or (
-            row.index_previous_launch == -1
-        ):
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(
-                    "CUDA Stream Wait event was not matched to a cudaRecordEvent"
-                    f", name = {self._get_node_name(eid)}, correlation = "
-                    f"{row.correlation}"
-                )
-            return False
-        return True
-
-    def _add_gpu_cpu_sync_edge(self, gpu_node: CPNode, runtime_eid: int) -> None:
-        """Add an edge between gpu_node and the runtime event on CPU"""
-        _, end_node = self.get_nodes_for_event(runtime_eid)
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(
-                f"Adding a GPU->CPU sync edge between nodes {gpu_node} -> {end_node}"
-            )
-        self._add_edge_helper(gpu_node, end_node, type=CPEdgeType.SYNC_DEPENDENCY)
-
-    def _add_kernel_launch_delay_edge(
-        self, runtime_index: int, kernel_start_node: CPNode, zero_weight: bool = False
-    ) -> bool:
-        """Add a kernel launch delay edge from CUDA runtime launch event to a GPU kernel.
-        @args runtime_index(int): event index of the runtime
-        @args kernel_start_node(CPNode): start node of the GPU kernel
-
-        Return (boool) false if runtime event could not be looked up
-        """
-        runtime_start, _ = self.get_nodes_for_event(runtime_index)
-        if runtime_start is None:
-            return False
-        self._add_edge_helper(
-            runtime_start,
-            kernel_start_node,
-            type=CPEdgeType.KERNEL_LAUNCH_DELAY,
-            zero_weight=zero_weight,
-        )
-        return True
-
     @timeit
     def _construct_graph_from_kernels(self) -> None:
         """Create nodes and edges for GPU kernels"""
@@ -897,9 +1392,8 @@ class CPGraph(nx.DiGraph):
         event_sync = sym_id_map.get("Event Sync", -1)
         stream_wait_event = sym_id_map.get("Stream Wait Event", -1)
 
-        # Note getting queue length on the clipped dataframe was showing errors,
-        # it is worthwhile to consider the entire trace instead, hence use t_full
-        q = TraceCounters._get_queue_length_time_series_for_rank(self.t_full, self.rank)
+        full_trace_data = self.get_full_trace_data()
+        q = full_trace_data.queue_length
 
         gpu_kernels = (
             self.trace_df.query(
@@ -913,8 +1407,8 @@ class CPGraph(nx.DiGraph):
         # For "Wait on CUDA Event" syncs we look up all cudaRecord calls
         # and find the previous GPU kernel/memcpy launch, this is recorded
         # in the index_previous_launch column
-        cuda_record_calls = self._get_cuda_event_record_df()
-        cuda_stream_wait_events = self._get_cuda_stream_wait_event_df()
+        cuda_record_calls = full_trace_data.cuda_record_calls
+        cuda_stream_wait_events = full_trace_data.cuda_stream_wait_events
 
         if (
             "wait_on_cuda_event_record_corr_id" in self.trace_df
@@ -948,243 +1442,631 @@ class CPGraph(nx.DiGraph):
         ]["end_ts"]
         gpu_kernels.sort_values(by="sort_by", axis=0, inplace=True)
 
-        # Last node on a stream
-        last_node: Dict[int, CPNode] = {}
-
-        # Scheduled a GPU-GPU sync on a stream
-        #  map from dest kernel event ID -> event ID of kernel to sync on
-        kernel_sync: Dict[int, int] = {}
-
-        def handle_cuda_sync(row):
-            nonlocal last_node
-            nonlocal kernel_sync
-            eid = row.index
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(
-                    f"CUDA Sync event name = {self._get_node_name(eid)} corrid = {row.correlation}"
+        # ---------------------------------------
+        # Compute the edges for all the kernels/sync events at once. Every edge
+        # is keyed by the position of its kernel/sync event in the sorted order
+        # above and its order among the edges of that event, the edges are
+        # added to the graph in this order.
+        # ---------------------------------------
+        edges: List[Tuple[np.ndarray, ...]] = []
+
+        def emit_edges(
+            positions: np.ndarray,
+            sub_order: Union[int, np.ndarray],
+            src: np.ndarray,
+            dst: np.ndarray,
+            type: CPEdgeType,
+            attributed_events: Optional[np.ndarray] = None,
+            zero_weight: bool = False,
+        ) -> None:
+            n = len(positions)
+            if n == 0:
+                return
+            edges.append(
+                (
+                    positions,
+                    np.broadcast_to(sub_order, n),
+                    src,
+                    dst,
+                    np.full(n, CPEdgeArrays.get_type_code(type), dtype=np.int8),
+                    np.full(
+                        n,
+                        zero_weight
+                        or type in [CPEdgeType.DEPENDENCY, CPEdgeType.SYNC_DEPENDENCY],
+                    ),
+                    (
+                        np.full(n, -1, dtype=np.int64)
+                        if attributed_events is None
+                        else attributed_events
+                    ),
                 )
+            )
 
-            name = row.name
+        eid = gpu_kernels["index"].to_numpy()
+        stream = gpu_kernels["stream"].to_numpy()
+        name = gpu_kernels["name"].to_numpy()
+        runtime_index = gpu_kernels["index_correlation"].to_numpy()
+        is_sync = gpu_kernels["cat"].to_numpy() == sync_cat
 
-            # Handle event synchronizations
-            if name == stream_wait_event or name == event_sync:
-                if not self._check_event_sync_helper(row):
-                    return
+        start_node, end_node = self._get_node_indices_for_events(eid)
+        runtime_start, runtime_end = self._get_node_indices_for_events(runtime_index)
+        node_ts = self.node_list.ts
 
-                # Note: use the full trace to find the src kernel
-                src_kernel_index = self.full_trace_df.index_correlation[
-                    row.index_previous_launch
-                ]
+        kernels = np.flatnonzero(~is_sync)
+        kernel_streams = stream[kernels]
 
-                if name == stream_wait_event:
-                    # Stream Wait event is indicating a dependency between
-                    # the next GPU kernel on this stream and another GPU kernel
+        # Handle event synchronizations
+        # The src kernel is found using the full trace.
+        kernel_sync_end = np.full(len(kernels), -1, dtype=np.int64)
+        if (
+            "wait_on_cuda_event_record_corr_id" in gpu_kernels
+            and "index_previous_launch" in gpu_kernels
+        ):
+            index_previous_launch = gpu_kernels["index_previous_launch"].to_numpy()
+            event_syncs = is_sync & (index_previous_launch != -1)
 
-                    # Get the corresponding GPU event for this cudaStreamWaitEvent()
-                    dest_kernel_launch_index = cuda_stream_wait_events.loc[
-                        row.index_correlation
-                    ]["index_next_launch"]
+            # Event Sync adds a GPU->CPU edge from the src kernel to the runtime call
+            syncs = np.flatnonzero(event_syncs & (name == event_sync))
+            src_kernel_index = self.full_trace_df["index_correlation"].loc[
+                index_previous_launch[syncs]
+            ]
+            _, gpu_end_node = self._get_node_indices_for_events(src_kernel_index)
+            # boundary case if previous was out of window
+            found = gpu_end_node >= 0
+            emit_edges(
+                syncs[found],
+                0,
+                gpu_end_node[found],
+                runtime_end[syncs[found]],
+                CPEdgeType.SYNC_DEPENDENCY,
+            )
 
-                    if dest_kernel_launch_index < 0:
-                        # TODO make a warning?
-                        return
+            # Stream Wait event is indicating a dependency between
+            # the next GPU kernel on its stream and another GPU kernel
+            waits = np.flatnonzero(event_syncs & (name == stream_wait_event))
+            if len(waits) > 0:
+                src_kernel_index = self.full_trace_df["index_correlation"].loc[
+                    index_previous_launch[waits]
+                ]
+                # Get the corresponding GPU event for this cudaStreamWaitEvent()
+                dest_kernel_launch_index = (
+                    cuda_stream_wait_events["index_next_launch"]
+                    .loc[runtime_index[waits]]
+                    .to_numpy()
+                )
+                found = dest_kernel_launch_index >= 0
+                # Use the next launch to find dest_kernel, a kernel syncs on the src
+                # kernel of the last stream wait event scheduled before it.
+                scheduled_syncs = pd.DataFrame(
+                    {
+                        "index": self.full_trace_df["index_correlation"]
+                        .loc[dest_kernel_launch_index[found]]
+                        .to_numpy(),
+                        "sync_position": waits[found],
+                        "src_kernel_index": src_kernel_index.to_numpy()[found],
+                    }
+                )
+                kernel_syncs = (
+                    pd.DataFrame(
+                        {
+                            "index": eid[kernels],
+                            "position": kernels,
+                            "kernel": np.arange(len(kernels)),
+                        }
+                    )
+                    .merge(scheduled_syncs, on="index")
+                    .query("sync_position < position")
+                    .sort_values(by=["kernel", "sync_position"])
+                    .drop_duplicates(subset="kernel", keep="last")
+                )
+                _, sync_end_node = self._get_node_indices_for_events(
+                    kernel_syncs["src_kernel_index"].to_numpy()
+                )
+                kernel_sync_end[kernel_syncs["kernel"].to_numpy()] = sync_end_node
 
-                    # Use the next launch to find dest_kernel
-                    dest_kernel_index = self.full_trace_df.index_correlation[
-                        dest_kernel_launch_index
+        stream_syncs = np.flatnonzero(
+            is_sync & ~np.isin(name, [stream_wait_event, event_sync])
+        )
+        assert np.isin(name[stream_syncs], [stream_sync, context_sync]).all()
+
+        # For Context Sync add a sync edge on the last kernel on all streams,
+        # in the order the streams were first seen, while for Stream Sync only
+        # add a sync edge on the specific stream.
+        context_syncs = stream_syncs[name[stream_syncs] == context_sync]
+        stream_syncs = stream_syncs[name[stream_syncs] == stream_sync]
+        streams = pd.unique(kernel_streams)
+        last_node_queries = pd.DataFrame(
+            {
+                "position": np.concatenate(
+                    [stream_syncs, np.repeat(context_syncs, len(streams))]
+                ),
+                "stream": np.concatenate(
+                    [stream[stream_syncs], np.tile(streams, len(context_syncs))]
+                ),
+                "sub_order": np.concatenate(
+                    [
+                        np.zeros(len(stream_syncs), dtype=np.int64),
+                        np.tile(np.arange(len(streams)), len(context_syncs)),
                     ]
+                ),
+            }
+        ).sort_values(by="position", kind="stable")
+        last_nodes = pd.merge_asof(
+            last_node_queries,
+            pd.DataFrame(
+                {
+                    "position": kernels,
+                    "stream": kernel_streams,
+                    "gpu_node": end_node[kernels],
+                }
+            ),
+            on="position",
+            by="stream",
+            allow_exact_matches=False,
+        ).dropna(subset=["gpu_node"])
+        positions = last_nodes["position"].to_numpy()
+        emit_edges(
+            positions,
+            last_nodes["sub_order"].to_numpy(),
+            last_nodes["gpu_node"].to_numpy(dtype=np.int64),
+            runtime_end[positions],
+            CPEdgeType.SYNC_DEPENDENCY,
+        )
 
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(
-                            f"Scheduling a Stream Sync on stream {row.stream} "
-                            f" dest kernel index {dest_kernel_index}, corr id = "
-                            f"{self.full_trace_df.correlation.loc[dest_kernel_index]}\n "
-                            f"on src kernel with index = {src_kernel_index}, corr id = "
-                            f"{self.full_trace_df.correlation.loc[src_kernel_index]}"
-                        )
-                    kernel_sync[dest_kernel_index] = src_kernel_index
-                else:
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(
-                            "Adding cudaEventSynchronize GPU->CPU edge between GPU kernel"
-                            f" with index = {src_kernel_index}, corr id = "
-                            f"{self.full_trace_df.correlation.loc[src_kernel_index]}"
-                            f" to CPU event index {row.index_correlation}, corr id ="
-                            f"{self.full_trace_df.correlation.loc[row.index_correlation]}"
-                        )
-                    _, gpu_end_node = self.get_nodes_for_event(src_kernel_index)
-                    if (
-                        gpu_end_node is not None
-                    ):  # boundary case if previous was out of window
-                        self._add_gpu_cpu_sync_edge(gpu_end_node, row.index_correlation)
-                return
-
-            assert name == stream_sync or name == context_sync
-
-            # For Context Sync add a sync edge on the last event on all streams,
-            # while for Stream Sync only add a sync edge on the specific stream.
-            gpu_nodes_to_sync = (
-                last_node.values()
-                if name == context_sync
-                else [last_node.get(row.stream)]
-            )
-            for gpu_node in gpu_nodes_to_sync:
-                if gpu_node is not None:
-                    self._add_gpu_cpu_sync_edge(gpu_node, row.index_correlation)
+        # Kernel edges and GPU->GPU sync dependency edges
+        kernel_start, kernel_end = start_node[kernels], end_node[kernels]
+        emit_edges(
+            kernels,
+            0,
+            kernel_start,
+            kernel_end,
+            CPEdgeType.OPERATOR_KERNEL,
+            attributed_events=eid[kernels],
+        )
+        has_sync = kernel_sync_end >= 0
+        emit_edges(
+            kernels[has_sync],
+            1,
+            kernel_sync_end[has_sync],
+            kernel_start[has_sync],
+            CPEdgeType.SYNC_DEPENDENCY,
+        )
 
-        # ---------------------------------------
-        # Loop through all the kernels/sync events
-        # ---------------------------------------
+        # Last kernel on the stream of a kernel
+        previous_kernel = (
+            pd.Series(np.arange(len(kernels)))
+            .groupby(kernel_streams, sort=False)
+            .shift()
+            .fillna(-1)
+            .to_numpy(dtype=np.int64)
+        )
+        has_previous = previous_kernel >= 0
+        last_node = np.where(has_previous, kernel_end[previous_kernel], -1)
+
+        runtime_ts = self.full_trace_df["ts"].loc[runtime_index[kernels]].to_numpy()
+        last_node_ts = node_ts[last_node]
+        kernel_sync_end_ts = node_ts[kernel_sync_end]
+
+        # Kernel Launch vs Kernel-Kernel delays
+        launch_delay = (
+            # There were no outstanding kernels on this stream during the launch
+            (gpu_kernels["queue_length_runtime"].to_numpy()[kernels] == 1)
+            & (gpu_kernels["queue_length"].to_numpy()[kernels] == 0)
+            # and the kernel was launched after previous kernel finished
+            & (~has_previous | (last_node_ts < runtime_ts))
+            # and the kernel sync dependency if any finished earlier
+            & (~has_sync | (kernel_sync_end_ts < runtime_ts))
+        )
+        kernel_runtime_start = runtime_start[kernels]
+        assert (kernel_runtime_start[launch_delay] >= 0).all(), (
+            "Could not find runtime index = "
+            f"{runtime_index[kernels][launch_delay & (kernel_runtime_start < 0)]}"
+        )
+        emit_edges(
+            kernels[launch_delay],
+            2,
+            kernel_runtime_start[launch_delay],
+            kernel_start[launch_delay],
+            CPEdgeType.KERNEL_LAUNCH_DELAY,
+        )
 
-        for row in gpu_kernels.itertuples(index=False):
-            # row = row_.astype(int, errors="ignore")
+        # If neither launch nor CUDA event sync occurs it is a kernel-kernel delay,
+        # provided the kernel sync dependency if any finished earlier than last node
+        kernel_delay = (
+            ~launch_delay
+            & has_previous
+            & (~has_sync | (kernel_sync_end_ts < last_node_ts))
+        )
+        emit_edges(
+            kernels[kernel_delay],
+            2,
+            last_node[kernel_delay],
+            kernel_start[kernel_delay],
+            CPEdgeType.KERNEL_KERNEL_DELAY,
+            attributed_events=eid[kernels[previous_kernel[kernel_delay]]],
+        )
 
-            if row.cat == sync_cat:
-                handle_cuda_sync(row)
-                continue
+        for i in kernels[~(has_sync | launch_delay | kernel_delay)]:
+            # Neither of Sync, kernel-kernel or kernel launch edges were added
+            logger.warning(
+                "No edge was added - queue length is "
+                f"{gpu_kernels['queue_length_runtime'].iat[i]}!= 1 but no "
+                f"last kernel on stream {stream[i]}, current kernel: "
+                f"name = {self._get_node_name(eid[i])}, "
+                f"correlation = {gpu_kernels['correlation'].iat[i]}"
+            )
 
-            eid, stream = row.index, row.stream
-            queue_length, queue_length_runtime = (
-                row.queue_length,
-                row.queue_length_runtime,
+        # When we modify the CPGraph for  performance simulations, we do not want
+        # GPU kernels to start  before their CPU launch counterparts.
+        # To prevest this we always add a 0 weight edge for runtime launch -> kernel
+        # the launch delay is not in critical path.
+        if self._add_zero_weight_launch_edges():
+            # Try adding this if runtime is found
+            zero_weight_launch = ~launch_delay & (kernel_runtime_start >= 0)
+            emit_edges(
+                kernels[zero_weight_launch],
+                3,
+                kernel_runtime_start[zero_weight_launch],
+                kernel_start[zero_weight_launch],
+                CPEdgeType.KERNEL_LAUNCH_DELAY,
+                zero_weight=True,
             )
-            runtime_index = row.index_correlation
 
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(
-                    f"Adding GPU kernel node for eid = {eid}, stream = {stream}, "
-                    f"name = {self._get_node_name(eid)}, correlation = {row.correlation}"
-                )
+        if len(edges) == 0:
+            return
+        positions, sub_order, src, dst, type_code, zero_weight, attributed_events = (
+            np.concatenate(arrays) for arrays in zip(*edges)
+        )
+        order = np.lexsort((sub_order, positions))
+        src, dst, type_code = src[order], dst[order], type_code[order]
+        zero_weight, attributed_events = zero_weight[order], attributed_events[order]
+        assert (src >= 0).all() and (dst >= 0).all() and (src != dst).all()
+        weight = np.where(zero_weight, 0, node_ts[dst] - node_ts[src])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Adding {len(src)} GPU kernel and sync edges")
+        self._add_edges(src, dst, weight, type_code, attributed_events)
 
-            start_node, end_node = self.get_nodes_for_event(eid)
-            e = self._add_edge_helper(start_node, end_node)
-            self._attribute_edge(e, -1)
+    def _show_digraph(self) -> None:
+        """Prints the networkx digraph"""
+        n = 0
+        for n in self.nodes:
+            node = self.node_list[n]
+            logger.info(f"node id = {n}, node = {node}")
+            logger.info("  neighbors = ", ",".join((str(n) for n in self.neighbors(n))))
 
-            kernel_sync_index = kernel_sync.get(eid)
-            kernel_sync_end: Optional[CPNode] = None
+    def _get_topological_order(self) -> Optional[np.ndarray]:
+        """Returns the node ids in a topological order, None if the graph has cycles.
+        The order is cached until nodes or edges are added."""
+        key = (len(self.node_list), len(self.edge_arrays))
+        if self._topological_order is None or self._topological_order[0] != key:
+            self._topological_order = (key, self._compute_topological_order())
+        return self._topological_order[1]
+
+    def _compute_topological_order(self) -> Optional[np.ndarray]:
+        num_nodes = len(self.node_list)
+        src, dst = self.edge_arrays.src, self.edge_arrays.dst
+        # Nodes are created in time order, hence most edges go forward.
+        if np.all(src < dst):
+            return np.arange(num_nodes)
+
+        out_edges, offsets = self.edge_arrays.get_out_edges(num_nodes)
+        offsets = offsets.tolist()
+        successors = dst[out_edges].tolist()
+        in_degree = np.bincount(dst, minlength=num_nodes).tolist()
+
+        queue = deque(i for i in range(num_nodes) if in_degree[i] == 0)
+        order: List[int] = []
+        while queue:
+            u = queue.popleft()
+            order.append(u)
+            for v in successors[offsets[u] : offsets[u + 1]]:
+                in_degree[v] -= 1
+                if in_degree[v] == 0:
+                    queue.append(v)
+        if len(order) < num_nodes:
+            return None
+        return np.array(order, dtype=np.int64)
+
+    def _longest_path(self) -> Optional[List[int]]:
+        """Finds the longest path in the graph using a dynamic program
+        over a topological order of the nodes. As in networkx.dag_longest_path()
+        a node prefers its earliest added in-edge among those with the largest
+        distance. When several nodes have the largest distance the path ends at
+        the first of them in the topological order of _get_topological_order(),
+        which may differ from the topological order used by networkx.
+        Returns:
+            List[int]: node ids on the longest path, None if the graph has cycles.
+        """
+        order = self._get_topological_order()
+        if order is None:
+            return None
+        dist, pred = self._longest_path_distances(self.edge_arrays.path_weight)
+        self._base_distances = (dist, pred)
+        return self._get_path_to_farthest_node(order, dist, pred)
 
-            edge_added = False
-            launch_delay_added = False
+    def _longest_path_distances(
+        self,
+        weights: np.ndarray,
+        nodes: Optional[np.ndarray] = None,
+        dist: Optional[np.ndarray] = None,
+        pred: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Computes the longest distance to each node and its predecessor on the path.
+
+        The distance of a node with a single in-edge is max(dist[u] + weight, 0) for
+        the source u of the edge. Chains of such nodes are resolved by pointer jumping,
+        composing the distances of a node as max(dist[anchor] + a, b) where anchor is
+        the first node up the chain with zero or multiple in-edges. The nodes with
+        multiple in-edges are then computed in one pass in topological order, taking
+        the first in-edge with the largest distance. The graph must not have cycles.
 
-            # Check if we need to sync between two kernels
-            if kernel_sync_index is not None:
-                _, kernel_sync_end = self.get_nodes_for_event(kernel_sync_index)
-                if kernel_sync_end is None:
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(
-                            f"Could not find source kernel sync index = {kernel_sync_index}, current kernel "
-                            f" eid = {eid}, stream = {stream}, "
-                            f"name = {self._get_node_name(eid)}, correlation = {row.correlation}"
-                        )
-                    kernel_sync_index = None
-                else:
-                    # note that the sync dependency has 0 weight
-                    self._add_edge_helper(
-                        kernel_sync_end, start_node, type=CPEdgeType.SYNC_DEPENDENCY
-                    )
-                    if logger.isEnabledFor(logging.DEBUG):
-                        logger.debug(
-                            "Adding a GPU->GPU sync edge between nodes "
-                            f"{kernel_sync_end} -> {start_node}"
-                        )
-                    edge_added = True
-                # reset the kernel-kernel sync
-                kernel_sync[eid] = None
+        Args:
+            weights (np.ndarray): weight of each edge in edge_arrays.
+            nodes (np.ndarray): the nodes to update, it must include the nodes
+                reachable from them. Defaults to all nodes.
+            dist, pred (np.ndarray): distances and predecessors of the other nodes,
+                defaults to all nodes being sources.
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: the updated distances and predecessors.
+        """
+        num_nodes = len(self.node_list)
+        dist = np.zeros(num_nodes, dtype=np.float64) if dist is None else dist
+        pred = np.arange(num_nodes) if pred is None else pred
+        update = np.zeros(num_nodes, dtype=bool)
+        update[np.arange(num_nodes) if nodes is None else nodes] = True
+        nodes = np.flatnonzero(update)
+        dist[nodes], pred[nodes] = 0, nodes
+
+        in_edges, offsets = self.edge_arrays.get_in_edges(num_nodes)
+        src = self.edge_arrays.src
+        in_degree = np.diff(offsets)
+
+        # Nodes with a single in-edge: resolve the chains by pointer jumping
+        is_chain = update & (in_degree == 1)
+        chain = np.flatnonzero(is_chain)
+        chain_edge = in_edges[offsets[chain]]
+        anchor = np.arange(num_nodes)
+        anchor[chain] = src[chain_edge]
+        a = np.zeros(num_nodes, dtype=np.float64)
+        a[chain] = weights[chain_edge]
+        b = np.zeros(num_nodes, dtype=np.float64)
+        jumping = chain[is_chain[anchor[chain]]]
+        while jumping.size > 0:
+            u = anchor[jumping]
+            a_u, b_u, anchor_u = a[u], b[u], anchor[u]
+            b[jumping] = np.maximum(b_u + a[jumping], b[jumping])
+            a[jumping] += a_u
+            anchor[jumping] = anchor_u
+            jumping = jumping[is_chain[anchor_u]]
+
+        # Nodes with multiple in-edges: one pass in topological order, the anchors
+        # of their in-edges are sources, not updated or merged before them
+        merges = np.flatnonzero(update & (in_degree > 1))
+        if merges.size > 0:
+            order = self._get_topological_order()
+            assert order is not None
+            position = np.empty(num_nodes, dtype=np.int64)
+            position[order] = np.arange(num_nodes)
+            merges = merges[np.argsort(position[merges], kind="stable")]
+
+            # Lists are much faster than numpy arrays for scalar access
+            dist_list, pred_list = dist.tolist(), pred.tolist()
+            chain_list, anchor_list = is_chain.tolist(), anchor.tolist()
+            a_list, b_list = a.tolist(), b.tolist()
+            offsets_list = offsets.tolist()
+            edge_src, edge_weight = src[in_edges].tolist(), weights[in_edges].tolist()
+            for v in merges.tolist():
+                best, best_u = -np.inf, v
+                for i in range(offsets_list[v], offsets_list[v + 1]):
+                    u = edge_src[i]
+                    if chain_list[u]:
+                        dist_u = max(dist_list[anchor_list[u]] + a_list[u], b_list[u])
+                    else:
+                        dist_u = dist_list[u]
+                    candidate = dist_u + edge_weight[i]
+                    if candidate > best:
+                        best, best_u = candidate, u
+                if best >= 0:
+                    dist_list[v], pred_list[v] = best, best_u
+            dist[merges] = np.array(dist_list)[merges]
+            pred[merges] = np.array(pred_list)[merges]
+
+        dist[chain] = np.maximum(dist[anchor[chain]] + a[chain], b[chain])
+        u = src[chain_edge]
+        pred[chain] = np.where(dist[u] + weights[chain_edge] >= 0, u, chain)
+        return dist, pred
 
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(
-                    f"queue_length_runtime = {queue_length_runtime}"
-                    f" queue_length = {queue_length}"
-                    f" last_node = {last_node}"
-                    f" last_node.ts = {last_node[stream].ts if last_node.get(stream) is not None else -1}"
-                    f" runtime.ts = {self.full_trace_df.ts.loc[runtime_index]}"
-                )
+    @staticmethod
+    def _get_path_to_farthest_node(
+        order: np.ndarray, dist: np.ndarray, pred: np.ndarray
+    ) -> List[int]:
+        """Returns the path ending at the first node in topological order
+        with the largest distance."""
+        v = int(order[np.argmax(dist[order])])
+        path = [v]
+        while pred[v] != v:
+            v = int(pred[v])
+            path.append(v)
+        path.reverse()
+        return path
+
+    def _get_downstream_nodes(self, nodes: np.ndarray) -> np.ndarray:
+        """Returns the given nodes and all nodes reachable from them, found by
+        a breadth first search over the out-edges in CSR format. Wide frontiers
+        are expanded with numpy, once the frontier is narrow the search continues
+        node by node as the graph is mostly made of long chains."""
+        out_edges, offsets = self.edge_arrays.get_out_edges(len(self.node_list))
+        successors = self.edge_arrays.dst[out_edges]
+        out_degree = np.diff(offsets)
+
+        visited = np.zeros(len(self.node_list), dtype=bool)
+        frontier = np.unique(nodes)
+        visited[frontier] = True
+        while frontier.size >= _MIN_VECTORIZED_FRONTIER:
+            counts = out_degree[frontier]
+            edges = np.repeat(
+                offsets[frontier] - np.cumsum(counts) + counts, counts
+            ) + np.arange(counts.sum())
+            reached = successors[edges]
+            frontier = np.unique(reached[~visited[reached]])
+            visited[frontier] = True
+
+        if frontier.size > 0:
+            offsets_list, successors_list = offsets.tolist(), successors.tolist()
+            visited_list = visited.tolist()
+            queue = deque(frontier.tolist())
+            while queue:
+                u = queue.popleft()
+                for v in successors_list[offsets_list[u] : offsets_list[u + 1]]:
+                    if not visited_list[v]:
+                        visited_list[v] = True
+                        queue.append(v)
+            visited = np.array(visited_list, dtype=bool)
+        return np.flatnonzero(visited)
+
+    def _get_scaled_edges_mask(self, scaling: CPEdgeScaling) -> np.ndarray:
+        """Returns a boolean mask of the edges in edge_arrays selected by the scaling."""
+        mask = np.ones(len(self.edge_arrays), dtype=bool)
+        if scaling.edge_type is not None:
+            mask &= self.edge_arrays.type_code == CPEdgeArrays.get_type_code(
+                scaling.edge_type
+            )
+        if scaling.event_name_pattern is not None:
+            attributed = self.get_edge_attributed_events()
+            has_event = attributed >= 0
+            codes, names = pd.factorize(
+                self.trace_df["name"].loc[attributed[has_event]]
+            )
+            # The name column holds symbol ids, or the names of a decoded trace
+            if names.dtype.kind in "iu":
+                sym_table = self.symbol_table.get_sym_table()
+                names = [
+                    sym_table[i] if 0 <= i < len(sym_table) else ""
+                    for i in names.tolist()
+                ]
+            pattern = re.compile(scaling.event_name_pattern)
+            # Missing names have code -1 and select the trailing False
+            is_match = np.array(
+                [pattern.search(str(name)) is not None for name in names] + [False],
+                dtype=bool,
+            )
+            matches = np.zeros(len(mask), dtype=bool)
+            matches[has_event] = is_match[codes]
+            mask &= matches
+        return mask
+
+    def what_if(
+        self, scalings: List[CPEdgeScaling]
+    ) -> Tuple[float, Optional[pd.DataFrame]]:
+        """Estimates the critical path when the weights of some edges are scaled,
+        for example to model a faster kernel or removing kernel launch delays.
+        The graph is not modified, only the longest path distances of nodes
+        downstream of the scaled edges are recomputed.
 
-            # Kernel Launch vs Kernel-Kernel delays
-            if (
-                # There were no outstanding kernels on this stream during the launch
-                queue_length_runtime == 1
-                and queue_length == 0
-                # and the kernel was launched after previous kernel finished
-                and (
-                    last_node.get(stream) is None
-                    or last_node[stream].ts < self.full_trace_df.ts.loc[runtime_index]
-                )
-                # and the kernel sync dependency if any finished earlier
-                and (
-                    kernel_sync_index is None
-                    or kernel_sync_end.ts < self.full_trace_df.ts.loc[runtime_index]
-                )
-            ):
-                success = self._add_kernel_launch_delay_edge(runtime_index, start_node)
-                assert success, (
-                    f"Could not find runtime index = {runtime_index}, current kernel "
-                    f"stream = {stream}, "
-                    f"name = {self._get_node_name(eid)}, correlation = {row.correlation}"
-                )
-                edge_added = True
-                launch_delay_added = True
-            elif (
-                last_node.get(stream) is not None
-                # and the kernel sync dependency if any finished earlier than last node
-                and (
-                    kernel_sync_index is None
-                    or kernel_sync_end.ts < last_node[stream].ts
-                )
-            ):
-                # If neither launch nor CUDA event sync occurs it is a kernel-kernel
-                # delay
-                e = self._add_edge_helper(
-                    last_node[stream], start_node, type=CPEdgeType.KERNEL_KERNEL_DELAY
-                )
-                self._attribute_edge(e, -1)
-                edge_added = True
-
-            if not edge_added:
-                # Neither of Sync, kernel-kernel or kernel launch edges were added
-                logger.warning(
-                    f"No edge was added - queue length is {queue_length_runtime}!= 1 but no "
-                    f"last kernel on stream {stream}, current kernel: "
-                    f"name = {self._get_node_name(eid)}, correlation = {row.correlation}"
-                )
+        Args:
+            scalings (List[CPEdgeScaling]): the scalings to apply together. An edge
+                matched by multiple scalings is scaled by the product of their scales.
 
-            # When we modify the CPGraph for  performance simulations, we do not want
-            # GPU kernels to start  before their CPU launch counterparts.
-            # To prevest this we always add a 0 weight edge for runtime launch -> kernel
-            # the launch delay is not in critical path.
-            if self._add_zero_weight_launch_edges() and not launch_delay_added:
-                # Try adding this if runtime is found
-                self._add_kernel_launch_delay_edge(
-                    runtime_index, start_node, zero_weight=True
-                )
+        Returns:
+            Tuple[float, Optional[pd.DataFrame]]
+                The length of the new critical path and its breakdown with the
+                scaled durations, see get_critical_path_breakdown().
 
-            last_node[stream] = end_node
+        Raises:
+            ValueError when the graph has cycles.
+        """
+        order = self._get_topological_order()
+        if order is None:
+            raise ValueError("Graph has cycles, cannot compute the critical path")
+        if self._base_distances is None:
+            self._base_distances = self._longest_path_distances(
+                self.edge_arrays.path_weight
+            )
+        base_dist, base_pred = self._base_distances
+
+        base_weights = self.edge_arrays.path_weight
+        weights = base_weights.astype(np.float64)
+        for scaling in scalings:
+            weights[self._get_scaled_edges_mask(scaling)] *= scaling.scale
+
+        # Only the nodes downstream of the changed edges need to be updated
+        changed = np.flatnonzero(weights != base_weights)
+        affected = self._get_downstream_nodes(self.edge_arrays.dst[changed])
+        dist, pred = self._longest_path_distances(
+            weights, affected, base_dist.copy(), base_pred.copy()
+        )
 
-    def _show_digraph(self) -> None:
-        """Prints the networkx digraph"""
-        n = 0
-        for n in self.nodes:
-            node = self.node_list[n]
-            logger.info(f"node id = {n}, node = {node}")
-            logger.info("  neighbors = ", ",".join((str(n) for n in self.neighbors(n))))
+        path = self._get_path_to_farthest_node(order, dist, pred)
+        positions = self.edge_arrays.find(path[:-1], path[1:])
+        type_codes = self.edge_arrays.type_code[positions]
+        edges = [
+            CPEdge(
+                begin=u,
+                end=v,
+                weight=weights[i].item(),
+                type=CPEdgeArrays.EDGE_TYPES[type_code],
+            )
+            for u, v, i, type_code in zip(
+                path[:-1], path[1:], positions.tolist(), type_codes.tolist()
+            )
+        ]
+        return float(weights[positions].sum()), self._get_breakdown(edges)
+
+    def build_networkx_graph(self) -> None:
+        """Adds the nodes and edges in the arrays to the networkx graph of a graph
+        built or restored with use_networkx=False, after which networkx is used as
+        with use_networkx=True."""
+        if self.use_networkx:
+            return
+        # Add the edges in their original order to keep the networkx tie breaking
+        path_weights = self.edge_arrays.path_weight
+        if not self.edge_arrays._float_weights:
+            path_weights = path_weights.astype(np.int64)
+        self.add_nodes_from(range(len(self.node_list)))
+        self.add_edges_from(
+            (edge.begin, edge.end, {"weight": weight, "object": edge})
+            for edge, weight in zip(
+                map(self.edge_arrays.get_edge, range(len(self.edge_arrays))),
+                path_weights.tolist(),
+            )
+        )
+        self.use_networkx = True
+
+    def _to_networkx(self) -> nx.DiGraph:
+        """Returns a networkx DiGraph with the nodes and edges of this graph"""
+        G = nx.DiGraph()
+        G.add_nodes_from(range(len(self.node_list)))
+        path_weight = self.edge_arrays.path_weight
+        for i in range(len(self.edge_arrays)):
+            e = self.edge_arrays.get_edge(i)
+            G.add_edge(e.begin, e.end, weight=path_weight[i].item(), object=e)
+        return G
 
     def critical_path(self) -> bool:
         """Calculates the critical path across nodes"""
         t0 = time.perf_counter()
+        self._base_distances = None
         if not self._validate_graph():
             raise ValueError(
                 "Graph is not valid, see prints above for help on debugging"
             )
-        try:
-            self.critical_path_nodes = nx.dag_longest_path(self, weight="weight")
-        except nx.NetworkXUnfeasible as err:
-            logger.error(f"Critical path algorithm failed due to {err}")
-            return False
+        if self.use_networkx:
+            try:
+                self.critical_path_nodes = nx.dag_longest_path(self, weight="weight")
+            except nx.NetworkXUnfeasible as err:
+                logger.error(f"Critical path algorithm failed due to {err}")
+                return False
+        else:
+            longest_path = self._longest_path()
+            if longest_path is None:
+                logger.error("Critical path algorithm failed as graph has cycles")
+                return False
+            self.critical_path_nodes = longest_path
         assert len(self.critical_path_nodes) >= 2
 
-        self.critical_path_events_set = {
-            self.node_list[nid].ev_idx for nid in self.critical_path_nodes
-        }
+        self.critical_path_events_set = set(
+            self.node_list.ev_idx[self.critical_path_nodes].tolist()
+        )
 
         # Reset critical_path_edges_set across invocations
         self.critical_path_edges_set = set()
@@ -1196,7 +2078,7 @@ class CPGraph(nx.DiGraph):
         while 1:
             try:
                 v = next(niter)
-                e = self.edges[u, v]["object"]
+                e = self.get_edge(u, v)
                 self.critical_path_edges_set.add(e)
                 u = v
             except StopIteration:
@@ -1208,52 +2090,68 @@ class CPGraph(nx.DiGraph):
         return True
 
     def _validate_graph(self) -> bool:
-        """Validate the graph can be trusted for analysis"""
-        # check for negative values and invalid sync edges
-        negative_weights: bool = False
-        sync_on_same_stream: bool = False
+        """Validate the graph can be trusted for analysis.
+        The checks run on the edge arrays in both modes, with networkx the edges
+        must be added through the CPGraph methods that keep the arrays in sync,
+        such as _add_edge(). The cycle check reuses the cached topological order, it is linear
+        in the number of edges and immediate when all edges go forward.
+        With the fast validation option the check for sync edges between kernels
+        on the same stream is skipped, such edges are then not reported."""
+        edge_arrays = self.edge_arrays
+        src, dst = edge_arrays.src, edge_arrays.dst
+        fast_validation = hta_options.critical_path_fast_validation()
 
         # print heler
-        def show_src_dest(src: CPNode, dest: CPNode) -> None:
-            logger.error(
-                f" Source node idx {src.ev_idx}, "
-                f" node name = {self._get_node_name(src.ev_idx)}"
-            )
-            logger.error(
-                f" Dest node idx {dest.ev_idx}, "
-                f" node name = {self._get_node_name(dest.ev_idx)}"
-            )
-
-        for u, v in self.edges:
-            e = self.edges[u, v]["object"]
+        def show_src_dest(e: CPEdge) -> None:
+            for kind, node in [("Source", e.begin), ("Dest", e.end)]:
+                ev_idx = int(self.node_list.ev_idx[node])
+                logger.error(
+                    f" {kind} node idx {ev_idx}, "
+                    f" node name = {self._get_node_name(ev_idx)}"
+                )
 
-            if (
-                e.weight <= -1
-                and not hta_options.critical_path_strict_negative_weight_check()
-            ):
-                # Nanosecond precision is causing some of the parent events
-                # to end before child in stack. This is a separate issue that
-                # needs fixing in the trace itself.
-                # Please see https://github.com/pytorch/pytorch/pull/122425"
-                logger.warning(f"Ignoring negative weight of -1 for {e}")
-                self.edges[u, v]["weight"] = 0
-            elif e.weight < -1:
-                src, dest = self.node_list[u], self.node_list[v]
+        # check for negative values
+        negative_weights: bool = False
+        if not hta_options.critical_path_strict_negative_weight_check():
+            # Nanosecond precision is causing some of the parent events
+            # to end before child in stack. This is a separate issue that
+            # needs fixing in the trace itself.
+            # Please see https://github.com/pytorch/pytorch/pull/122425"
+            ignored = np.flatnonzero(edge_arrays.weight <= -1)
+            if ignored.size > 0:
+                logger.warning(f"Ignoring negative weights of {ignored.size} edges")
+                if logger.isEnabledFor(logging.DEBUG):
+                    for i in ignored.tolist():
+                        logger.debug(
+                            f"Ignoring negative weight for {edge_arrays.get_edge(i)}"
+                        )
+                self._set_path_weights(ignored, 0)
+        else:
+            for i in np.flatnonzero(edge_arrays.weight < -1).tolist():
+                e = edge_arrays.get_edge(i)
                 logger.error(f"Found an edge with negative weight {e}")
-                show_src_dest(src, dest)
+                show_src_dest(e)
                 negative_weights = True
 
-            if e.type == CPEdgeType.SYNC_DEPENDENCY:
-                src, dest = self.node_list[u], self.node_list[v]
-                stream_src = self.trace_df.stream.loc[src.ev_idx]
-                stream_dest = self.trace_df.stream.loc[dest.ev_idx]
-
-                if stream_src != -1 and stream_src == stream_dest:
-                    logger.error(
-                        f"Seeing a CUDA sync between kernels on same stream {e}"
-                    )
-                    show_src_dest(src, dest)
-                    sync_on_same_stream = True
+        # check for sync edges between kernels on the same stream
+        sync_on_same_stream: bool = False
+        sync_edges = np.flatnonzero(
+            edge_arrays.type_code
+            == CPEdgeArrays.get_type_code(CPEdgeType.SYNC_DEPENDENCY)
+        )
+        if not fast_validation and sync_edges.size > 0:
+            # Look up the streams by event id, the trace may be clipped
+            stream = np.append(self.trace_df["stream"].to_numpy(), -1)
+            stream_src, stream_dest = (
+                stream[self.trace_df.index.get_indexer(self.node_list.ev_idx[nodes])]
+                for nodes in (src[sync_edges], dst[sync_edges])
+            )
+            same_stream = (stream_src != -1) & (stream_src == stream_dest)
+            for i in sync_edges[same_stream].tolist():
+                e = edge_arrays.get_edge(i)
+                logger.error(f"Seeing a CUDA sync between kernels on same stream {e}")
+                show_src_dest(e)
+                sync_on_same_stream = True
 
         if negative_weights:
             logger.error(
@@ -1267,8 +2165,8 @@ class CPGraph(nx.DiGraph):
             )
             return False
 
-        # check for cycles
-        has_cycles = not nx.is_directed_acyclic_graph(self)
+        # check for cycles, the topological order is reused to find the critical path
+        has_cycles = self._get_topological_order() is None
         if has_cycles:
             logger.error("This graph has cycles, you can debug this by running -")
             logger.error(" import networkx as nx")
@@ -1299,36 +2197,117 @@ class CPGraph(nx.DiGraph):
         """
         if len(self.critical_path_nodes) == 0:
             return None
+        return self._get_breakdown(list(self.critical_path_edges_set))
 
-        trace_df = self.trace_df
-        decode_symbol_id_to_symbol_name(
-            trace_df, self.symbol_table, use_shorten_name=True
-        )
+    def _get_breakdown(self, edges: List[CPEdge]) -> Optional[pd.DataFrame]:
+        """Returns the breakdown of a path given by its edges,
+        see get_critical_path_breakdown()."""
+        if len(edges) == 0:
+            return None
 
-        # Construct simple dataframe from edges on critical path
-        def make_edge_record(e):
-            return {
-                "event_idx": self.get_event_attribution_for_edge(e),
-                "duration": e.weight,
-                "type": str(e.type.value),
+        positions = self.edge_arrays.find(
+            np.array([e.begin for e in edges], dtype=np.int64),
+            np.array([e.end for e in edges], dtype=np.int64),
+        )
+        event_idx = self.edge_arrays.attributed_event[positions]
+        edge_df = pd.DataFrame(
+            {
+                "event_idx": (
+                    event_idx
+                    if (event_idx >= 0).all()
+                    else np.where(event_idx >= 0, event_idx, np.nan)
+                ),
+                "duration": [e.weight for e in edges],
+                "type": [str(e.type.value) for e in edges],
             }
-
-        edge_df = pd.DataFrame.from_records(
-            make_edge_record(e) for e in self.critical_path_edges_set
+        )
+        type_codes = np.array(
+            [CPEdgeArrays.get_type_code(e.type) for e in edges], dtype=np.int8
         )
 
+        # Only look up the events on the critical path in the trace dataframe
+        trace_df = self.trace_df
+        columns = ["cat", "pid", "tid", "stream", "index"]
+        events_df = trace_df.loc[
+            trace_df["index"].isin(edge_df["event_idx"]),
+            columns + (["name"] if trace_df["name"].dtype.kind == "i" else ["s_name"]),
+        ]
+        if "s_name" not in events_df:
+            events_df.insert(
+                0, "s_name", [self._get_short_name(i) for i in events_df["name"]]
+            )
         edge_events_df = pd.merge(
             edge_df,
-            trace_df[["s_name", "cat", "pid", "tid", "stream", "index"]],
+            events_df[["s_name"] + columns],
             left_on="event_idx",
             right_on="index",
             how="left",
         )
 
         # Add column to classify boundedness
-        edge_events_df["bound_by"] = edge_events_df.apply(bound_by, axis=1)
+        edge_events_df["bound_by"] = self._get_bound_by(edge_events_df, type_codes)
         return edge_events_df
 
+    def _get_short_name(self, name_id: int) -> str:
+        """Returns the shortened name of a symbol, cached per symbol id."""
+        if name_id not in self._short_names:
+            self._short_names[name_id] = (
+                shorten_name(self.sym_table[name_id]) if name_id >= 0 else ""
+            )
+        return self._short_names[name_id]
+
+    def _is_comm_kernel(self, s_name: str) -> bool:
+        """Returns if the shortened name is a communication kernel, cached per name."""
+        if s_name not in self._comm_kernel_flags:
+            self._comm_kernel_flags[s_name] = is_comm_kernel(s_name)
+        return self._comm_kernel_flags[s_name]
+
+    def _get_bound_by(
+        self, edge_events_df: pd.DataFrame, type_codes: np.ndarray
+    ) -> np.ndarray:
+        """Classifies the bounding resource for the edges in the critical path
+        breakdown, this is the vectorized version of bound_by()."""
+        is_kernel_kernel_delay = type_codes == CPEdgeArrays.get_type_code(
+            CPEdgeType.KERNEL_KERNEL_DELAY
+        )
+        is_launch_delay = type_codes == CPEdgeArrays.get_type_code(
+            CPEdgeType.KERNEL_LAUNCH_DELAY
+        )
+        is_dependency = np.isin(
+            type_codes,
+            [
+                CPEdgeArrays.get_type_code(CPEdgeType.DEPENDENCY),
+                CPEdgeArrays.get_type_code(CPEdgeType.SYNC_DEPENDENCY),
+            ],
+        )
+        is_event = ~(is_kernel_kernel_delay | is_launch_delay | is_dependency)
+
+        s_names = edge_events_df["s_name"]
+        assert not s_names[is_event].isna().any(), (
+            "name of edge is na : rows = "
+            f"{edge_events_df[is_event & s_names.isna().to_numpy()]}"
+        )
+        is_comm = np.zeros(len(edge_events_df), dtype=bool)
+        is_comm[is_event] = [self._is_comm_kernel(s) for s in s_names[is_event]]
+
+        return np.select(
+            [
+                is_kernel_kernel_delay,
+                is_launch_delay,
+                is_dependency,
+                edge_events_df["stream"].to_numpy() < 0,
+                is_comm,
+            ],
+            [
+                "gpu_kernel_kernel_overhead",
+                "gpu_kernel_launch_overhead",
+                "",
+                "cpu_bound",
+                "gpu_communication_bound",
+            ],
+            default="gpu_compute_bound",
+        ).astype(object)
+
     def summary(self) -> pd.core.series.Series:
         """Displays a summary or breakdown of the critical path into one of the following
         - cpu_bound
@@ -1343,7 +2322,7 @@ class CPGraph(nx.DiGraph):
         """
         edf = self.get_critical_path_breakdown()
         summary = edf.groupby("bound_by").duration.sum() / edf.duration.sum() * 100
-        print("Critical Path broken down by boundedness = (in % of duration)")
+        logger.info("Critical Path broken down by boundedness = (in % of duration)")
         return summary
 
     def show_critical_path(self) -> None:
@@ -1380,13 +2359,13 @@ class CPGraph(nx.DiGraph):
 
         # Data members that can be saved as pickle
         pickle_obj = _CPGraphData(
-            node_list=self.node_list,
+            node_list=list(self.node_list),
             critical_path_nodes=self.critical_path_nodes,
             critical_path_events_set=self.critical_path_events_set,
             critical_path_edges_set=self.critical_path_edges_set,
             event_to_start_node_map=self.event_to_start_node_map,
             event_to_end_node_map=self.event_to_end_node_map,
-            edge_to_event_map=self.edge_to_event_map,
+            edge_to_event_map=dict(self.edge_to_event_map),
         )
 
         if not os.path.exists(out_dir):
@@ -1397,7 +2376,7 @@ class CPGraph(nx.DiGraph):
 
         graph_pkl_path = os.path.join(out_dir, "cp_graph.pkl")
         # first convert the data in node link format
-        d = nx.node_link_data(self)
+        d = nx.node_link_data(self if self.use_networkx else self._to_networkx())
         # we cannot use json as CPEdge needs to be serialized and de-serialized
         with open(graph_pkl_path, "wb") as f:
             pickle.dump(d, f)
@@ -1416,58 +2395,370 @@ class CPGraph(nx.DiGraph):
 
         return zip_filename
 
+    def save_binary(self, path: str) -> str:
+        """Saves the critical path graph object to a directory of binary
+        files that can be restored using restore_cpgraph().
+        Note that this save_binary() operation can only be done after
+        the graph has been constructed!
+
+        Unlike save() the nodes, edges, maps and the columns of the
+        clipped trace are stored as typed arrays in one numpy .npy file
+        each along with a metadata.json file, no pickle is used and the
+        arrays are memory mapped on restore.
+
+        Object columns of the trace are stored as integers when possible,
+        else as codes into their unique values with the type of each value
+        and a mask of the valid values, see _encode_object_column().
+
+        Args:
+            path (str): path of the directory to write.
+        Returns:
+            str: path of the saved directory.
+        Raises:
+            ValueError: if a column of the trace holds values that cannot be stored.
+        """
+        arrays: Dict[str, np.ndarray] = {}
+
+        node_list = self.node_list
+        arrays["node_ev_idx"] = node_list.ev_idx
+        arrays["node_ts"] = node_list.ts
+        arrays["node_is_start"] = node_list.is_start
+        arrays["node_is_blocking"] = node_list.is_blocking
+
+        edge_arrays = self.edge_arrays
+        arrays["edge_src"] = edge_arrays.src
+        arrays["edge_dst"] = edge_arrays.dst
+        arrays["edge_weight"] = edge_arrays.weight
+        arrays["edge_path_weight"] = edge_arrays.path_weight
+        arrays["edge_type_code"] = edge_arrays.type_code
+
+        arrays["critical_path_nodes"] = np.array(
+            self.critical_path_nodes, dtype=np.int64
+        )
+        arrays["critical_path_events"] = np.array(
+            sorted(self.critical_path_events_set), dtype=np.int64
+        )
+        cp_edges = list(self.critical_path_edges_set)
+        arrays["critical_path_edges"] = edge_arrays.find(
+            np.array([e.begin for e in cp_edges], dtype=np.int64),
+            np.array([e.end for e in cp_edges], dtype=np.int64),
+        )
+        for name, event_map in (
+            ("event_to_start_node", self.event_to_start_node_map),
+            ("event_to_end_node", self.event_to_end_node_map),
+        ):
+            arrays[f"{name}_event"] = np.fromiter(event_map.keys(), dtype=np.int64)
+            arrays[f"{name}_node"] = np.fromiter(event_map.values(), dtype=np.int64)
+        is_attributed = edge_arrays.attributed_event >= 0
+        arrays["edge_to_event_src"] = edge_arrays.src[is_attributed]
+        arrays["edge_to_event_dst"] = edge_arrays.dst[is_attributed]
+        arrays["edge_to_event_event"] = edge_arrays.attributed_event[is_attributed]
+
+        trace_columns: List[Dict[str, Any]] = []
+        arrays["trace_index"] = self.trace_df.index.to_numpy()
+        for i, (name, col) in enumerate(self.trace_df.items()):
+            column: Dict[str, Any] = {"name": name}
+            if not isinstance(col.dtype, np.dtype):
+                # Extension dtypes are restored with astype()
+                column["dtype"] = str(col.dtype)
+                col = col.astype(object)
+            if not col.dtype.hasobject:
+                column["kind"] = "numeric"
+                arrays[f"trace_column_{i}"] = col.to_numpy()
+            elif pd.api.types.infer_dtype(col, skipna=False) == "integer":
+                column["kind"] = "object_int"
+                arrays[f"trace_column_{i}"] = col.to_numpy(dtype=np.int64)
+            else:
+                column["kind"] = "object"
+                codes, values, types, valid, missing = _encode_object_column(name, col)
+                column["missing"] = missing
+                arrays[f"trace_column_{i}"] = codes
+                arrays[f"trace_column_{i}_values"] = values
+                arrays[f"trace_column_{i}_types"] = types
+                arrays[f"trace_column_{i}_valid"] = valid
+            trace_columns.append(column)
+
+        metadata = {
+            "format": "CPGraph",
+            "version": CP_GRAPH_BINARY_VERSION,
+            "float_weights": bool(edge_arrays._float_weights),
+            "trace_index_name": self.trace_df.index.name,
+            "trace_columns": trace_columns,
+        }
+
+        # Write to a temporary directory first so that readers never see a partially written graph.
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(tmp_path)
+            for name, values in arrays.items():
+                np.save(
+                    os.path.join(tmp_path, f"{name}.npy"), values, allow_pickle=False
+                )
+            with open(os.path.join(tmp_path, "metadata.json"), "w") as f:
+                json.dump(metadata, f)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                shutil.rmtree(tmp_path)
+        logger.info(f"Saved critical path graph to {path}")
+        return path
+
 
 def restore_cpgraph(zip_filename: str, t_full: "Trace", rank: int) -> CPGraph:
     """Restores the critical path graph object from a zip file.
     The graph will already be constructed in this case. You can
     however run critical_path() again and modify the graph etc.
 
-    Returns:
-        trace_zip_file (str): path to the zip file containing the object.
+    Args:
+        zip_filename (str): path to the zip file written by CPGraph.save()
+            or the directory written by CPGraph.save_binary().
     Returns:
         CPGraph object restored from the file.
     """
     import pickle
     from zipfile import ZipFile
 
-    with ZipFile(zip_filename, "r") as zipf:
+    if os.path.isdir(zip_filename):
+        return _restore_cpgraph_binary(zip_filename, t_full, rank)
+
+    with ZipFile(zip_filename, "r") as zipf, TemporaryDirectory() as tmp_dir:
         # namelist ex tmp/my_saved_cp_graph/trace_data.csv/trace_data.csv
         out_dir = "/".join(zipf.namelist()[0].split("/")[:-1])
-        zipf.extractall(path="/tmp/")  # data will be extracted to /tmp/
-    out_dir = os.path.join("/tmp", out_dir)
-    logger.warning(f"Extracted zip archive to {out_dir}")
+        zipf.extractall(path=tmp_dir)
+        out_dir = os.path.join(tmp_dir, out_dir)
+        logger.info(f"Extracted zip archive to {out_dir}")
 
-    graph_pkl_path = os.path.join(out_dir, "cp_graph.pkl")
-    logger.warning(f"Restoring graph from {graph_pkl_path}")
-    with open(graph_pkl_path, "rb") as f:
-        pickled_graph = pickle.load(f)
-    G = nx.node_link_graph(pickled_graph)
+        graph_pkl_path = os.path.join(out_dir, "cp_graph.pkl")
+        logger.warning(f"Restoring graph from {graph_pkl_path}")
+        with open(graph_pkl_path, "rb") as f:
+            pickled_graph = pickle.load(f)
+        G = nx.node_link_graph(pickled_graph)
 
-    # Use restored Graph to initialize CPGraph
-    restored_instance = CPGraph(None, t_full, rank, G)
+        # Use restored Graph to initialize CPGraph
+        restored_instance = CPGraph(None, t_full, rank, G)
 
-    logger.warning(f"Loading cp_graph from {out_dir}")
-    trace_csv_path = os.path.join(out_dir, "trace_data.csv")
+        logger.warning(f"Loading cp_graph from {out_dir}")
+        trace_csv_path = os.path.join(out_dir, "trace_data.csv")
 
-    # there is a default _index_ column we can use
-    restored_instance.trace_df = pd.read_csv(trace_csv_path).set_index("_index_")
+        # there is a default _index_ column we can use
+        restored_instance.trace_df = pd.read_csv(trace_csv_path).set_index("_index_")
 
-    data_pkl_path = os.path.join(out_dir, "cp_data.pkl")
-    with open(data_pkl_path, "rb") as f:
-        pickled_obj = pickle.load(f)
+        data_pkl_path = os.path.join(out_dir, "cp_data.pkl")
+        with open(data_pkl_path, "rb") as f:
+            pickled_obj = pickle.load(f)
 
-    restored_instance.node_list = pickled_obj.node_list
+    restored_instance.node_list = CPNodeArrays.from_nodes(pickled_obj.node_list)
     restored_instance.critical_path_nodes = pickled_obj.critical_path_nodes
     restored_instance.critical_path_events_set = pickled_obj.critical_path_events_set
     restored_instance.critical_path_edges_set = pickled_obj.critical_path_edges_set
     restored_instance.event_to_start_node_map = pickled_obj.event_to_start_node_map
     restored_instance.event_to_end_node_map = pickled_obj.event_to_end_node_map
+
+    for _, _, data in G.edges(data=True):
+        restored_instance.edge_arrays.append(data["object"])
+    for i, (_, _, weight) in enumerate(G.edges(data="weight")):
+        restored_instance.edge_arrays.set_path_weight(i, weight)
     restored_instance.edge_to_event_map = pickled_obj.edge_to_event_map
 
     return restored_instance
 
 
-# TODO optimize using itertuple
+# Parsers of the types of the values in object columns, see _encode_object_column()
+_OBJECT_VALUE_TYPES: Dict[str, Callable[[str], Any]] = {
+    "bool": lambda value: value == "True",
+    "int": int,
+    "float": float,
+    "str": str,
+}
+
+# Missing values of object columns, see _encode_object_column()
+_OBJECT_MISSING_VALUES: Dict[str, Any] = {"None": None, "nan": np.nan, "NA": pd.NA}
+
+
+def _get_object_value_type(value: Any) -> str:
+    """Returns the name of the type of a value in an object column, as in
+    _OBJECT_VALUE_TYPES, or of the missing value as in _OBJECT_MISSING_VALUES."""
+    if value is None:
+        return "None"
+    if value is pd.NA:
+        return "NA"
+    if isinstance(value, (bool, np.bool_)):
+        return "bool"
+    if isinstance(value, (int, np.integer)):
+        return "int"
+    if isinstance(value, (float, np.floating)):
+        return "nan" if np.isnan(value) else "float"
+    if isinstance(value, str):
+        return "str"
+    raise TypeError(f"unsupported value {value!r} of type {type(value).__name__}")
+
+
+def _encode_object_column(
+    name: str, col: pd.Series
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Optional[str]]:
+    """Encodes an object column of the trace for CPGraph.save_binary().
+
+    Values of different types are never merged, e.g. 1 and "1" or 1 and True.
+
+    Args:
+        name (str): name of the column.
+        col (pd.Series): the column.
+    Returns:
+        A tuple of the code of each value, the unique values converted to
+        strings, the type of each unique value, the mask of valid values and
+        the kind of the missing values if any, see _OBJECT_MISSING_VALUES.
+    Raises:
+        ValueError: if the column holds values of other types, or more than
+            one kind of missing values.
+    """
+    values = col.to_numpy(dtype=object)
+    try:
+        types = np.array([_get_object_value_type(v) for v in values.tolist()])
+    except TypeError as err:
+        raise ValueError(f"Cannot save trace column {name}: {err}") from err
+
+    valid = ~np.isin(types, list(_OBJECT_MISSING_VALUES))
+    missing_kinds = np.unique(types[~valid]).tolist()
+    if len(missing_kinds) > 1:
+        raise ValueError(
+            f"Cannot save trace column {name} with missing values {missing_kinds}"
+        )
+
+    codes = np.full(values.size, -1, dtype=np.int32)
+    unique_values: List[str] = []
+    unique_types: List[str] = []
+    for value_type in np.unique(types[valid]).tolist():
+        is_type = types == value_type
+        type_codes, uniques = pd.factorize(values[is_type])
+        codes[is_type] = type_codes + len(unique_values)
+        unique_values.extend(str(v) for v in uniques)
+        unique_types.extend([value_type] * len(uniques))
+    return (
+        codes,
+        np.array(unique_values, dtype=str),
+        np.array(unique_types, dtype=str),
+        valid,
+        missing_kinds[0] if missing_kinds else None,
+    )
+
+
+def _decode_object_column(
+    codes: np.ndarray,
+    values: np.ndarray,
+    types: np.ndarray,
+    valid: np.ndarray,
+    missing: Optional[str],
+) -> np.ndarray:
+    """Decodes an object column encoded by _encode_object_column()."""
+    uniques = np.empty(values.size + 1, dtype=object)
+    uniques[:-1] = [
+        _OBJECT_VALUE_TYPES[t](v) for v, t in zip(values.tolist(), types.tolist())
+    ]
+    uniques[-1] = None if missing is None else _OBJECT_MISSING_VALUES[missing]
+    # Missing values have code -1 and take the last entry
+    return uniques[np.where(valid, codes, -1)]
+
+
+def _restore_cpgraph_binary(path: str, t_full: "Trace", rank: int) -> CPGraph:
+    """Restores the critical path graph object from a directory written by
+    CPGraph.save_binary(), see restore_cpgraph().
+
+    The arrays are memory mapped copy-on-write, so the restored graph can still
+    be modified in memory. The graph keeps its edges in arrays as with
+    use_networkx=False, see CPGraph.build_networkx_graph() to use networkx."""
+    with open(os.path.join(path, "metadata.json")) as f:
+        metadata = json.load(f)
+    if (
+        metadata.get("format") != "CPGraph"
+        or metadata.get("version") != CP_GRAPH_BINARY_VERSION
+    ):
+        raise ValueError(
+            f"Unsupported critical path graph file {path}: format = "
+            f"{metadata.get('format')}, version = {metadata.get('version')}"
+        )
+
+    def load(name: str) -> np.ndarray:
+        return np.load(
+            os.path.join(path, f"{name}.npy"), mmap_mode="c", allow_pickle=False
+        )
+
+    arrays: Dict[str, np.ndarray] = {
+        os.path.splitext(name)[0]: load(os.path.splitext(name)[0])
+        for name in os.listdir(path)
+        if name.endswith(".npy")
+    }
+
+    restored_instance = CPGraph(None, t_full, rank, use_networkx=False)
+
+    columns: Dict[str, Any] = {}
+    for i, col in enumerate(metadata["trace_columns"]):
+        values = np.asarray(arrays[f"trace_column_{i}"])
+        if col["kind"] == "object_int":
+            values = values.astype(object)
+        elif col["kind"] == "object":
+            values = _decode_object_column(
+                values,
+                arrays[f"trace_column_{i}_values"],
+                arrays[f"trace_column_{i}_types"],
+                arrays[f"trace_column_{i}_valid"],
+                col["missing"],
+            )
+        if "dtype" in col:
+            values = pd.Series(values, copy=False).astype(col["dtype"]).array
+        columns[col["name"]] = values
+    trace_df = pd.DataFrame(
+        columns,
+        index=pd.Index(
+            np.asarray(arrays["trace_index"]), name=metadata["trace_index_name"]
+        ),
+        copy=False,
+    )
+    restored_instance.trace_df = trace_df
+
+    restored_instance.node_list = CPNodeArrays.from_arrays(
+        ev_idx=arrays["node_ev_idx"],
+        ts=arrays["node_ts"],
+        is_start=arrays["node_is_start"],
+        is_blocking=arrays["node_is_blocking"],
+    )
+    edge_arrays = CPEdgeArrays.from_arrays(
+        src=arrays["edge_src"],
+        dst=arrays["edge_dst"],
+        weight=arrays["edge_weight"],
+        path_weight=arrays["edge_path_weight"],
+        type_code=arrays["edge_type_code"],
+        float_weights=metadata["float_weights"],
+    )
+    restored_instance.edge_arrays = edge_arrays
+
+    restored_instance.critical_path_nodes = arrays["critical_path_nodes"].tolist()
+    restored_instance.critical_path_events_set = set(
+        arrays["critical_path_events"].tolist()
+    )
+    restored_instance.critical_path_edges_set = {
+        edge_arrays.get_edge(i) for i in arrays["critical_path_edges"].tolist()
+    }
+    restored_instance.event_to_start_node_map = dict(
+        zip(
+            arrays["event_to_start_node_event"].tolist(),
+            arrays["event_to_start_node_node"].tolist(),
+        )
+    )
+    restored_instance.event_to_end_node_map = dict(
+        zip(
+            arrays["event_to_end_node_event"].tolist(),
+            arrays["event_to_end_node_node"].tolist(),
+        )
+    )
+    edge_arrays.set_attributed_event(
+        edge_arrays.find(arrays["edge_to_event_src"], arrays["edge_to_event_dst"]),
+        arrays["edge_to_event_event"],
+    )
+    return restored_instance
+
+
 def bound_by(row: Dict[str, Any]) -> str:
     """Function to classify the bounding resource for an edge on the critical path"""
     if row["type"] == "critical_path_kernel_kernel_delay":
@@ -1486,6 +2777,120 @@ def bound_by(row: Dict[str, Any]) -> str:
     return "gpu_compute_bound"
 
 
+def _dfs_traverse_call_stack(
+    thread_df: pd.DataFrame,
+    enter_func: Callable[[int, int, int], None],
+    exit_func: Callable[[int, int, int], None],
+) -> None:
+    """Depth first traversal of the call stack of one thread restricted to the
+    events in thread_df. The parent of an event is its nearest ancestor in
+    thread_df, as if the call stack was built from thread_df only.
+
+    Args:
+        thread_df (pd.DataFrame): events of one thread with the index, ts, depth,
+            dfs_enter and dfs_exit columns, see CPFullTraceData.call_stack.
+            Events with a negative dfs_enter are not nested.
+        enter_func (Callable): called with the event index, the parent event
+            index (-1 at the top level) and the depth when entering an event.
+        exit_func (Callable): called with the same arguments when exiting an event.
+    """
+    # An ancestor starts before its descendants or at the same time with a smaller
+    # depth. The sibling order of the Euler tour is not used as the CallGraph
+    # attaches the backward thread to the main thread.
+    df = thread_df.sort_values(["ts", "depth"], kind="stable")
+
+    # Stack of (event index, parent, dfs_enter, dfs_exit) of the entered events
+    stack: List[Tuple[int, int, int, int]] = []
+    for ev_id, enter, exit_ in zip(
+        df["index"].tolist(), df["dfs_enter"].tolist(), df["dfs_exit"].tolist()
+    ):
+        while stack and not (enter >= 0 and stack[-1][2] <= enter <= stack[-1][3]):
+            top, parent, _, _ = stack.pop()
+            exit_func(top, parent, len(stack))
+        parent = stack[-1][0] if stack else -1
+        enter_func(ev_id, parent, len(stack))
+        stack.append((ev_id, parent, enter, exit_))
+    while stack:
+        top, parent, _, _ = stack.pop()
+        exit_func(top, parent, len(stack))
+
+
+def _get_trace_view(t: "Trace", rank: int, trace_df: pd.DataFrame) -> "Trace":
+    """Returns a shallow copy of the Trace object that only holds trace_df as
+    the trace of the given rank. The symbol table, meta data and other members
+    are shared with the original object and no dataframe is copied."""
+    t_view = copy(t)
+    t_view.traces = {rank: trace_df}
+    return t_view
+
+
+def _get_full_trace_data_for_rank(t: "Trace", rank: int) -> CPFullTraceData:
+    """Returns the data derived from the full trace of the rank including its
+    call stacks, see CPFullTraceData."""
+    cp_graph = CPGraph(None, t, rank)
+    return replace(
+        cp_graph.get_full_trace_data(), call_stack=cp_graph._get_call_stack_df(t)
+    )
+
+
+def _summarize_critical_path_instance(
+    t: "Trace",
+    rank_instance: Tuple[int, Union[Optional[int], Tuple[int, int]]],
+    annotation: str,
+    use_networkx: bool,
+    full_trace_data: Dict[int, CPFullTraceData],
+) -> Dict[str, Any]:
+    """Run the critical path analysis of one annotation instance.
+
+    Args:
+        t (Trace): Input trace data structure.
+        rank_instance: a pair of the rank and the instance id.
+        annotation (str): the annotation, see CriticalPathAnalysis.critical_path_analysis().
+        use_networkx (bool): see CriticalPathAnalysis.critical_path_analysis().
+        full_trace_data (Dict[int, CPFullTraceData]): the data derived from
+            the full trace per rank.
+
+    Returns:
+        A record with the rank, instance_id, success, the critical path duration
+        and the % of the duration per boundedness type.
+    """
+    rank, instance_id = rank_instance
+    record: Dict[str, Any] = {
+        "rank": rank,
+        "instance_id": instance_id,
+        "success": False,
+    }
+
+    clipped_df = CriticalPathAnalysis._get_clipped_trace_df(
+        t, rank, annotation, instance_id
+    )
+    if clipped_df is None:
+        return record
+    cp_graph = CPGraph(
+        _get_trace_view(t, rank, clipped_df),
+        t,
+        rank,
+        use_networkx=use_networkx,
+        full_trace_data=full_trace_data.get(rank),
+    )
+    try:
+        success = cp_graph.critical_path()
+    except ValueError as err:
+        logger.error(f"Critical path analysis of {rank=} {instance_id=} failed: {err}")
+        return record
+    if not success:
+        return record
+
+    edf = cp_graph.get_critical_path_breakdown()
+    duration = edf.duration.sum()
+    record["success"] = True
+    record["duration"] = duration
+    # Dependency edges have zero weight and are not classified
+    summary = edf[edf.bound_by != ""].groupby("bound_by").duration.sum()
+    record.update((summary / duration * 100).to_dict())
+    return record
+
+
 class CriticalPathAnalysis:
     def __init__(self):
         # dict of critical path nodes, node id -> CPNode
@@ -1498,6 +2903,7 @@ class CriticalPathAnalysis:
         rank: int,
         annotation: str,
         instance_id: Union[Optional[int], Tuple[int, int]],
+        use_networkx: bool = True,
     ) -> Tuple[CPGraph, bool]:
         r"""
         Perform critical path analysis for trace events within a rank.
@@ -1518,6 +2924,8 @@ class CriticalPathAnalysis:
                         Defaults to the first instance.
                 (Tuple(int, int)) - considers a range of annotation instances start to end,
                         inclusive of both start and end instance.
+            use_networkx (bool): if False, the graph is kept in numpy arrays and the
+                critical path is computed without networkx. Default is True.
 
         Returns: Tuple[CPGraph, bool] a pair of CPGraph object and a success or
             fail boolean value. True indicates that the critical path analysis
@@ -1531,7 +2939,6 @@ class CriticalPathAnalysis:
         """
         global PROFILE_TIMES
         t0 = time.perf_counter()
-        trace_df: pd.DataFrame = t.get_trace(rank)
         sym_index = t.symbol_table.get_sym_id_map()
 
         if "cuda_sync" not in sym_index:
@@ -1544,6 +2951,115 @@ class CriticalPathAnalysis:
                 "events https://github.com/pytorch/pytorch/pull/105187"
             )
 
+        clipped_df = cls._get_clipped_trace_df(t, rank, annotation, instance_id)
+        if clipped_df is None:
+            return None
+
+        # CallGraph only accepts a Trace object, so wrap the clipped dataframe
+        # in a view sharing everything else with the full trace.
+        t_clipped = _get_trace_view(t, rank, clipped_df)
+        t1 = time.perf_counter()
+        logger.info(f"Preprocessing took {t1 - t0:.2f} seconds")
+
+        cp_graph = CPGraph(t_clipped, t, rank, use_networkx=use_networkx)
+        t2 = time.perf_counter()
+        logger.info(f"CPGraph construction took {t2 - t1:.2f} seconds")
+
+        for func, total_time in PROFILE_TIMES.items():
+            logger.info(f"  Function {func} Took {total_time:.4f} seconds")
+
+        return cp_graph, cp_graph.critical_path()
+
+    @classmethod
+    def batch_critical_path_analysis(
+        cls,
+        t: "Trace",
+        annotation: str,
+        rank_instances: Optional[List[Tuple[int, Optional[int]]]] = None,
+        use_networkx: bool = True,
+        use_multiprocessing: Optional[bool] = None,
+    ) -> pd.DataFrame:
+        r"""
+        Perform critical path analysis for many instances of an annotation,
+        for example every iteration on all ranks with annotation='ProfilerStep'.
+        The data derived from the full trace of a rank (queue length, CUDA event
+        record and stream wait tables, call stacks) is computed once per rank and
+        shared by all its instances, the instances are analyzed in a process pool.
+
+        Args:
+            t (Trace): Input trace data structure.
+            annotation (str): a trace annotation to limit the analysis to,
+                see critical_path_analysis().
+            rank_instances (List[Tuple[int, Optional[int]]]): the (rank, instance_id) pairs
+                to analyze. Defaults to all instances of the annotation on all ranks.
+            use_networkx (bool): see critical_path_analysis(). Default is True.
+            use_multiprocessing (bool): analyze the ranks and the instances in parallel,
+                see hta.utils.utils.map_ranks(). Default is None.
+
+        Returns: pd.DataFrame
+            A summary dataframe with one row per (rank, instance_id) pair, a success
+            column, the duration of the critical path and one column per boundedness
+            type with the % of the duration on the critical path, see CPGraph.summary().
+        """
+        t0 = time.perf_counter()
+        sym_index = t.symbol_table.get_sym_id_map()
+        if rank_instances is None and annotation == "":
+            rank_instances = [(rank, None) for rank in t.get_ranks()]
+        elif rank_instances is None:
+            annotation_ids = [
+                val for key, val in sym_index.items() if annotation in key
+            ]
+            rank_instances = [
+                (rank, instance_id)
+                for rank in t.get_ranks()
+                for instance_id in range(
+                    t.get_trace(rank).name.isin(annotation_ids).sum()
+                )
+            ]
+        ranks = sorted({rank for rank, _ in rank_instances})
+
+        # Compute the data derived from the full trace once per rank
+        full_trace_data = dict(
+            zip(
+                ranks,
+                map_ranks(
+                    t,
+                    _get_full_trace_data_for_rank,
+                    ranks,
+                    use_multiprocessing=use_multiprocessing,
+                ),
+            )
+        )
+        t1 = time.perf_counter()
+        logger.info(f"Preprocessing {len(ranks)} rank(s) took {t1 - t0:.2f} seconds")
+
+        records = map_ranks(
+            t,
+            _summarize_critical_path_instance,
+            rank_instances,
+            (annotation, use_networkx, full_trace_data),
+            use_multiprocessing,
+        )
+        t2 = time.perf_counter()
+        logger.info(
+            f"Critical path analysis of {len(rank_instances)} instance(s) took {t2 - t1:.2f} seconds"
+        )
+
+        return pd.DataFrame.from_records(records)
+
+    @staticmethod
+    def _get_clipped_trace_df(
+        t: "Trace",
+        rank: int,
+        annotation: str,
+        instance_id: Union[Optional[int], Tuple[int, int]],
+    ) -> Optional[pd.DataFrame]:
+        """Returns a copy of the events of the rank in the time range of the
+        annotation instance(s), see critical_path_analysis() for the arguments.
+        Returns None if the annotation or instance_id is not valid."""
+        trace_df: pd.DataFrame = t.get_trace(rank)
+        sym_index = t.symbol_table.get_sym_id_map()
+
         annotation_id = sym_index.get(annotation, None)
         annotation_ids = [val for key, val in sym_index.items() if annotation in key]
 
@@ -1559,7 +3075,7 @@ class CriticalPathAnalysis:
             instance_start, instance_end = instance_id, instance_id
         else:
             logger.error("Unexpected input type instance_id")
-            return
+            return None
 
         logger.info(
             f"Looking up events under [{instance_start}, {instance_end}) "
@@ -1602,22 +3118,7 @@ class CriticalPathAnalysis:
         clipped_df = trace_df.loc[a.index.union(b.index)].copy()
 
         logger.info(f"Clipped dataframe has {len(clipped_df)} events")
-
-        # XXX This is a bit hacky but CallGraph does not really support a way
-        # to specify a dataframe, just supports passing Trace object
-        t_copy = deepcopy(t)
-        t_copy.traces[rank] = clipped_df
-        t1 = time.perf_counter()
-        logger.info(f"Preprocessing took {t1 - t0:.2f} seconds")
-
-        cp_graph = CPGraph(t_copy, t, rank)
-        t2 = time.perf_counter()
-        logger.info(f"CPGraph construction took {t2 - t1:.2f} seconds")
-
-        for func, total_time in PROFILE_TIMES.items():
-            logger.info(f"  Function {func} Took {total_time:.4f} seconds")
-
-        return cp_graph, cp_graph.critical_path()
+        return clipped_df
 
     @staticmethod
     def _is_zero_weight_launch_edge(e: CPEdge) -> bool:
@@ -1674,40 +3175,42 @@ class CriticalPathAnalysis:
         output_file = os.path.join(
             str(path), "overlaid_critical_path_" + t.trace_files[rank].split("/")[-1]
         )
-        overlaid_trace = t.get_raw_trace_for_one_rank(rank=rank)
-        raw_events = overlaid_trace["traceEvents"]
 
-        # Traverse events and mark them as critical
-        for ev_idx, event in enumerate(raw_events):
-            if ev_idx in critical_path_graph.critical_path_events_set:
-                event["args"]["critical"] = 1
+        if show_all_edges:
+            edges = critical_path_graph.get_all_edges()
+            if not hta_options.critical_path_show_zero_weight_launch_edges():
+                edges = (
+                    e
+                    for e in edges
+                    if not CriticalPathAnalysis._is_zero_weight_launch_edge(e)
+                )
+        else:
+            edges = (e for e in critical_path_graph.critical_path_edges_set)
+        edges_with_events = [
+            (e, critical_path_graph.get_events_for_edge(e)) for e in edges
+        ]
 
-        flow_events = []
-        flow_id = 0
+        # Fields of the raw events at the ends of the edges: (pid, tid, ts, end_ts)
+        edge_event_fields: Dict[int, Tuple[Any, Any, Any, Any]] = {
+            ev_id: None for _, ev_ids in edges_with_events for ev_id in ev_ids
+        }
+        critical_events = critical_path_graph.critical_path_events_set
 
         def get_flow_event(
             nid: int,
-            event: Dict[str, Any],
+            ev_id: int,
             edge: CPEdge,
             flow_id: int,
             is_start: bool,
         ):
-            # This helps with showing the arrows in chrome trace
-            end_ts = event["ts"] + event["dur"]
-            if event["args"].get("device", -1) >= 0:
-                end_ts -= min(1, event["dur"])
-
-            is_critical = e in critical_path_graph.critical_path_edges_set
+            pid, tid, ts, end_ts = edge_event_fields[ev_id]
+            is_critical = edge in critical_path_graph.critical_path_edges_set
 
             return Trace.flow_event(
                 id=flow_id,
-                pid=event["pid"],
-                tid=event["tid"],
-                ts=int(
-                    event["ts"]
-                    if critical_path_graph.node_list[nid].is_start
-                    else end_ts
-                ),
+                pid=pid,
+                tid=tid,
+                ts=int(ts if critical_path_graph.node_list[nid].is_start else end_ts),
                 is_start=is_start,
                 name="critical_path",
                 cat=str(edge.type.value),
@@ -1717,50 +3220,48 @@ class CriticalPathAnalysis:
                 },
             )
 
-        if show_all_edges:
-            # Networkx provides iteration over the edges represented as (u, v)
-            edges = (
-                critical_path_graph.edges[u, v]["object"]
-                for u, v in critical_path_graph.edges
-            )
-            if not hta_options.critical_path_show_zero_weight_launch_edges():
-                edges = (
-                    e
-                    for e in edges
-                    if not CriticalPathAnalysis._is_zero_weight_launch_edge(e)
-                )
-        else:
-            edges = (e for e in critical_path_graph.critical_path_edges_set)
-
-        for e in edges:
-            u, v = e.begin, e.end
-            start_ev_id, end_ev_id = critical_path_graph.get_events_for_edge(e)
-            start_ev, end_ev = raw_events[start_ev_id], raw_events[end_ev_id]
-
-            # XXX need to assert if raw event name and dataframe name are same
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f"Adding cp edge between {start_ev_id} and {end_ev_id}")
-
-            flow_events.append(get_flow_event(u, start_ev, e, flow_id, is_start=True))
-            flow_events.append(get_flow_event(v, end_ev, e, flow_id, is_start=False))
-            flow_id += 1
-
-        if only_show_critical_events:
-            raw_events2 = [
-                event
-                for event in raw_events
+        def get_overlaid_events(
+            raw_events: Iterable[Dict[str, Any]]
+        ) -> Generator[Dict[str, Any], None, None]:
+            # Traverse events and mark them as critical
+            for ev_idx, event in enumerate(raw_events):
+                if ev_idx in critical_events:
+                    event["args"]["critical"] = 1
+                if ev_idx in edge_event_fields:
+                    # This helps with showing the arrows in chrome trace
+                    end_ts = event["ts"] + event["dur"]
+                    if event["args"].get("device", -1) >= 0:
+                        end_ts -= min(1, event["dur"])
+                    edge_event_fields[ev_idx] = (
+                        event["pid"],
+                        event["tid"],
+                        event["ts"],
+                        end_ts,
+                    )
                 if (
-                    event["ph"] != "X"
+                    not only_show_critical_events
+                    or event["ph"] != "X"
                     or event.get("cat", "") in ["user_annotation", "python_function"]
                     or ("args" in event and event["args"].get("critical", 0) == 1)
-                )
-            ]
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug("Length of new raw events = {raw_events2}")
-            overlaid_trace["traceEvents"] = raw_events2
+                ):
+                    yield event
 
-        overlaid_trace["traceEvents"].extend(flow_events)
+            for flow_id, (e, (start_ev_id, end_ev_id)) in enumerate(edges_with_events):
+                # XXX need to assert if raw event name and dataframe name are same
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        f"Adding cp edge between {start_ev_id} and {end_ev_id}"
+                    )
+                yield get_flow_event(e.begin, start_ev_id, e, flow_id, is_start=True)
+                yield get_flow_event(e.end, end_ev_id, e, flow_id, is_start=False)
 
-        t.write_raw_trace(output_file, overlaid_trace)
+        # Stream the events from the raw trace to the overlaid trace
+        t.write_raw_trace_items(
+            output_file,
+            (
+                (key, get_overlaid_events(value) if key == "traceEvents" else value)
+                for key, value in t.iter_raw_trace_for_one_rank(rank=rank)
+            ),
+        )
 
         return output_file
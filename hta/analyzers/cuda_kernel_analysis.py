@@ -423,7 +423,7 @@ class CudaKernelAnalysis:
 
             # filter cpu and gpu ops
             cpu_kernels = trace_df[trace_df["stream"].eq(-1)].copy()
-            gpu_kernels = trace_df[trace_df["stream"].ne(-1)].copy()
+            gpu_kernels = t.get_derived_frame(rank, "gpu_kernels")
 
             # get correlation id, duration, timestamp and name of cpu and gpu events
             cpu_kernels_filtered = cpu_kernels[
@@ -64,7 +64,7 @@ class CuptiCounterAnalysis:
         for idx, kernel_idx, launch_idx in gpu_kernels[
             ["index", "index_runtime"]
         ].itertuples(index=True):
-            stack = cg.get_stack_of_node(launch_idx).sort_values("ts")
+            stack = df.loc[cg.get_ancestors(launch_idx, rank)].sort_values("ts")
             ops = stack.loc[stack.s_cat.eq("cpu_op"), "index"].to_list()
             op_stacks[idx] = ops
             top_level_ops[idx] = ops[0]
@@ -4,11 +4,12 @@
 
 from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
 
 from hta.common.trace import Trace
 from hta.configs.config import logger
-from hta.utils.utils import get_kernel_type, get_memory_kernel_type, KernelType
+from hta.utils.utils import get_memory_kernel_type, KernelType, map_ranks
 
 
 class TraceCounters:
@@ -44,60 +45,44 @@ class TraceCounters:
                 time series. The value remains constant until the next timestamp.
                 In essence, it can be thought of as a step function.
         """
-        # get trace for a rank
-        trace_df: pd.DataFrame = t.get_trace(rank)
-
-        # CUDA Runtime events that may launch kernels
-        # - filter events that have a correlated kernel event only.
-        runtime_calls: pd.DataFrame = trace_df.query(
-            t.symbol_table.get_runtime_launch_events_query()
-        ).copy()
-        runtime_calls.drop(["stream", "pid", "tid"], axis=1, inplace=True)
-        runtime_calls["queue"] = 1
-
-        # GPU kernel events
-        gpu_kernels = trace_df[trace_df["stream"].ne(-1)].copy()
-        gpu_kernels["queue"] = -1
-
-        # use the pid, tid and cuda stream from the correlated GPU event.
-        runtime_calls_filt = runtime_calls.join(
-            gpu_kernels[["stream", "pid", "tid", "correlation"]].set_index(
-                "correlation"
-            ),
-            on="correlation",
-        )
-
-        # filter GPU kernels with valid parent runtime events only, use a semi-join
-        gpu_kernels_filt = gpu_kernels[
-            gpu_kernels["correlation"].isin(runtime_calls["correlation"])
-        ]
 
-        assert len(runtime_calls_filt) == len(gpu_kernels_filt)
+        # CUDA Runtime events that launch kernels, with the pid, tid and cuda stream
+        # of the GPU kernel they are correlated with.
+        kernel_launches = t.get_derived_frame(rank, "kernel_launches")
+        if kernel_launches.empty:
+            return None
 
-        # Concat the series of runtime launch events and GPU kernel events
-        merged_df = (
-            pd.concat([runtime_calls_filt, gpu_kernels_filt])
-            .sort_values(by="ts")
-            .set_index("index")
+        # The queue of a stream grows by 1 at each launch event and shrinks by 1
+        # when the corresponding GPU kernel starts.
+        num_launches = len(kernel_launches)
+        events = pd.DataFrame(
+            {
+                "index": np.concatenate(
+                    [kernel_launches["index"], kernel_launches["index_kernel"]]
+                ),
+                "ts": np.concatenate(
+                    [kernel_launches["ts"], kernel_launches["ts_kernel"]]
+                ),
+                "pid": np.tile(kernel_launches["pid_kernel"].to_numpy(), 2),
+                "tid": np.tile(kernel_launches["tid_kernel"].to_numpy(), 2),
+                "stream": np.tile(kernel_launches["stream_kernel"].to_numpy(), 2),
+                "queue": np.repeat([1, -1], num_launches),
+            }
         )
+        # A stable sort keeps the launches before the kernels starting at the same time.
+        events = events.take(
+            np.lexsort((events["ts"].to_numpy(), events["stream"].to_numpy()))
+        ).set_index("index")
+        events["queue_length"] = events.groupby("stream")["queue"].cumsum()
 
-        result_df_list = []
-        for stream, stream_df in merged_df.groupby("stream"):
-            logger.debug(f"Processing queue_length for rank {rank}, stream {stream}")
-            stream_df["queue_length"] = stream_df["queue"].cumsum()
-            result_df_list.append(stream_df)
-
-        return (
-            pd.concat(result_df_list)[["ts", "pid", "tid", "stream", "queue_length"]]
-            if len(result_df_list) > 0
-            else None
-        )
+        return events[["ts", "pid", "tid", "stream", "queue_length"]]
 
     @classmethod
     def get_queue_length_time_series(
         cls,
         t: "Trace",
         ranks: Optional[List[int]] = None,
+        use_multiprocessing: Optional[bool] = None,
     ) -> Dict[int, pd.DataFrame]:
         """
         Returns a dictionary of rank -> time series for the queue length of a CUDA stream.
@@ -109,7 +94,9 @@ class TraceCounters:
 
         Args:
             t (Trace): Input trace data structure.
-            rank (int): rank to perform this analysis for.
+            ranks (list of int): ranks to perform this analysis for.
+            use_multiprocessing (bool): compute the ranks in parallel. Default = None,
+                see hta.utils.utils.map_ranks().
 
         Returns:
             Dict[int, pd.DataFrame]:
@@ -130,11 +117,15 @@ class TraceCounters:
             "stays constant until the next update."
         )
 
-        result = {
-            rank: TraceCounters._get_queue_length_time_series_for_rank(t, rank)
-            for rank in ranks
+        result = map_ranks(
+            t,
+            cls._get_queue_length_time_series_for_rank,
+            ranks,
+            use_multiprocessing=use_multiprocessing,
+        )
+        return {
+            rank: series for rank, series in zip(ranks, result) if series is not None
         }
-        return dict(filter(lambda x: x[1] is not None, result.items()))
 
     @classmethod
     def get_queue_length_summary_from_time_series(
@@ -171,6 +162,7 @@ class TraceCounters:
         cls,
         t: "Trace",
         ranks: Optional[List[int]] = None,
+        use_multiprocessing: Optional[bool] = None,
     ) -> Optional[pd.DataFrame]:
         """
         Returns an (optional) dataframewith queue length statistics per CUDA stream and rank.
@@ -178,6 +170,8 @@ class TraceCounters:
         Args:
             t (Trace): Input trace data structure.
             ranks (list of int): ranks to perform this analysis.
+            use_multiprocessing (bool): compute the ranks in parallel. Default = None,
+                see hta.utils.utils.map_ranks().
 
         Returns:
             Optional[pd.DataFrame]
@@ -188,7 +182,7 @@ class TraceCounters:
             ranks = [0]
 
         return TraceCounters.get_queue_length_summary_from_time_series(
-            TraceCounters.get_queue_length_time_series(t, ranks)
+            TraceCounters.get_queue_length_time_series(t, ranks, use_multiprocessing)
         )
 
     @classmethod
@@ -274,59 +268,54 @@ class TraceCounters:
                 ts (timestamp), pid (of corresponding GPU), name of memory copy type
                 and memory_bw_gbps (memory bandwidth in GB/sec).
         """
-        # get trace for a rank
-        trace_df: pd.DataFrame = t.get_trace(rank)
         sym_table = t.symbol_table.get_sym_table()
 
-        gpu_kernels = trace_df[trace_df["stream"].ne(-1)].copy()
-        gpu_kernels["kernel_type"] = gpu_kernels[["name"]].apply(
-            lambda x: get_kernel_type(sym_table[x["name"]]), axis=1
-        )
+        gpu_kernels = t.get_derived_frame(rank, "gpu_kernels")
+        memcpy_kernels = gpu_kernels[gpu_kernels.kernel_type == KernelType.MEMORY.name]
+        if memcpy_kernels.empty:
+            return None
 
-        memcpy_kernels = gpu_kernels[
-            gpu_kernels.kernel_type == KernelType.MEMORY.name
-        ].copy()
-        memcpy_kernels["name"] = memcpy_kernels[["name"]].apply(
-            lambda x: get_memory_kernel_type(sym_table[x["name"]]), axis=1
+        # Look up the memory copy type once per kernel name symbol.
+        name_ids = memcpy_kernels["name"].to_numpy()
+        unique_ids, inverse = np.unique(name_ids, return_inverse=True)
+        memcpy_types = np.array(
+            [get_memory_kernel_type(sym_table[name_id]) for name_id in unique_ids],
+            dtype=object,
         )
+        type_codes, type_names = pd.factorize(memcpy_types[inverse], sort=True)
 
         # In case of 0 us duration events round it up to 1 us to avoid -ve values
         # see https://github.com/facebookresearch/HolisticTraceAnalysis/issues/20
-        memcpy_kernels.loc[memcpy_kernels.dur == 0, ["dur"]] = 1
-
-        membw_time_series_a = memcpy_kernels[["ts", "name", "pid", "memory_bw_gbps"]]
-        membw_time_series_b = memcpy_kernels[
-            ["ts", "name", "dur", "pid", "memory_bw_gbps"]
-        ].copy()
-
-        # The end events have timestamps = start timestamp + duration
-        membw_time_series_b.ts = membw_time_series_b.ts + membw_time_series_b.dur
-        membw_time_series_b.memory_bw_gbps = -membw_time_series_b.memory_bw_gbps
-
-        membw_time_series = pd.concat(
-            [
-                membw_time_series_a,
-                membw_time_series_b[["ts", "pid", "name", "memory_bw_gbps"]],
-            ],
-            ignore_index=True,
-        ).sort_values(by="ts")
-
-        result_df_list = []
-        for _, membw_df in membw_time_series.groupby("name"):
-            membw_df.memory_bw_gbps = membw_df.memory_bw_gbps.cumsum()
-            result_df_list.append(membw_df)
-
-        if len(result_df_list) == 0:
-            return None
-
-        result_df = pd.concat(result_df_list)[["ts", "pid", "name", "memory_bw_gbps"]]
-        return result_df
+        ts = memcpy_kernels["ts"].to_numpy()
+        dur = memcpy_kernels["dur"].to_numpy()
+        dur = np.where(dur == 0, 1, dur)
+        memory_bw = memcpy_kernels["memory_bw_gbps"].to_numpy()
+
+        # The bandwidth of a memory type grows at the start of a kernel and shrinks at
+        # its end, with timestamp = start timestamp + duration.
+        num_kernels = len(memcpy_kernels)
+        events_ts = np.concatenate([ts, ts + dur])
+        codes = np.tile(type_codes, 2)
+        # A stable sort keeps the starts before the ends at the same timestamp.
+        order = np.lexsort((events_ts, codes))
+        codes = codes[order]
+        events_bw = np.concatenate([memory_bw, -memory_bw])[order]
+
+        return pd.DataFrame(
+            {
+                "ts": events_ts[order],
+                "pid": np.tile(memcpy_kernels["pid"].to_numpy(), 2)[order],
+                "name": type_names[codes],
+                "memory_bw_gbps": pd.Series(events_bw).groupby(codes).cumsum(),
+            },
+        ).set_index(order)
 
     @classmethod
     def get_memory_bw_time_series(
         cls,
         t: "Trace",
         ranks: Optional[List[int]] = None,
+        use_multiprocessing: Optional[bool] = None,
     ) -> Dict[int, pd.DataFrame]:
         """
         Returns a dictionary of rank -> time series for the memory bandwidth.
@@ -334,6 +323,8 @@ class TraceCounters:
         Args:
             t (Trace): Input trace data structure.
             ranks (list of int): ranks to perform this analysis for.
+            use_multiprocessing (bool): compute the ranks in parallel. Default = None,
+                see hta.utils.utils.map_ranks().
 
         Returns:
             Dict[int, pd.DataFrame]
@@ -350,17 +341,22 @@ class TraceCounters:
             "when the value changes. Once a values is observed the time series "
             "stays constant until the next update."
         )
-        result = {
-            rank: TraceCounters._get_memory_bw_time_series_for_rank(t, rank)
-            for rank in ranks
+        result = map_ranks(
+            t,
+            cls._get_memory_bw_time_series_for_rank,
+            ranks,
+            use_multiprocessing=use_multiprocessing,
+        )
+        return {
+            rank: series for rank, series in zip(ranks, result) if series is not None
         }
-        return dict(filter(lambda x: x[1] is not None, result.items()))
 
     @classmethod
     def get_memory_bw_summary(
         cls,
         t: "Trace",
         ranks: Optional[List[int]] = None,
+        use_multiprocessing: Optional[bool] = None,
     ) -> Optional[pd.DataFrame]:
         """
         Returns an (optional) dataframe containing the summary statistics of memory ops. The
@@ -369,6 +365,8 @@ class TraceCounters:
         Args:
             t (Trace): Input trace data structure.
             ranks (list of int): ranks to perform this analysis for.
+            use_multiprocessing (bool): compute the time series of the ranks in
+                parallel. Default = None, see hta.utils.utils.map_ranks().
 
         Returns:
             Optional[pd.DataFrame]
@@ -378,17 +376,194 @@ class TraceCounters:
         if ranks is None or len(ranks) == 0:
             ranks = [0]
 
-        results_list: List[pd.DataFrame] = []
+        series_dict = TraceCounters.get_memory_bw_time_series(
+            t, ranks, use_multiprocessing
+        )
+        if len(series_dict) == 0:
+            return None
 
-        for rank, rank_df in TraceCounters.get_memory_bw_time_series(t, ranks).items():
-            rank_df["rank"] = rank
-            # Exclude the 0 points in time series
-            rank_df = rank_df[rank_df.memory_bw_gbps > 0]
+        membw_df = pd.concat(
+            [series[["name", "memory_bw_gbps"]] for series in series_dict.values()],
+            keys=list(series_dict.keys()),
+            names=["rank", None],
+        ).reset_index("rank")
+        # Exclude the 0 points in time series
+        membw_df = membw_df[membw_df.memory_bw_gbps > 0]
+
+        # Same columns as describe() but with one grouped aggregation for all the ranks.
+        membw_groupby = membw_df.groupby(["rank", "name"], sort=False)["memory_bw_gbps"]
+        result = pd.DataFrame(
+            {
+                "count": membw_groupby.count().astype(float),
+                "mean": membw_groupby.mean(),
+                "std": membw_groupby.std(),
+                "min": membw_groupby.min(),
+                "25%": membw_groupby.quantile(0.25),
+                "50%": membw_groupby.quantile(0.5),
+                "75%": membw_groupby.quantile(0.75),
+                "max": membw_groupby.max(),
+            }
+        )
+        result.columns = pd.MultiIndex.from_product(
+            [["memory_bw_gbps"], result.columns]
+        )
+        return result
 
-            result = (
-                rank_df[["rank", "name", "memory_bw_gbps"]]
-                .groupby(["rank", "name"])
-                .describe()
+    @classmethod
+    def downsample_time_series(
+        cls,
+        series: pd.DataFrame,
+        value_col: str,
+        series_cols: List[str],
+        max_points: Optional[int] = None,
+        bin_size: Optional[int] = None,
+        method: str = "max",
+    ) -> pd.DataFrame:
+        """
+        Downsamples step function time series, such as the queue length and memory
+        bandwidth time series, into fixed size time bins.
+
+        The methods are:
+        1. "max" - one point per bin with the maximum value observed in the bin,
+           including the value carried over from the previous bin.
+        2. "mean" - one point per bin with the time weighted mean value of the bin.
+        3. "minmax" - keeps the first, last, minimum and maximum points of every bin.
+           This preserves the peaks and the shape of the series at the original
+           timestamps.
+
+        With "max" and "mean" a bin may also add a point at its end, to restore the
+        last value of the bin when the next bin has no changes.
+
+        Args:
+            series (pd.DataFrame): time series with a ts column and a value column.
+            value_col (str): name of the value column, e.g. queue_length.
+            series_cols (List[str]): columns identifying each series in the dataframe,
+                e.g. ["stream"] for queue length and ["name"] for memory bandwidth.
+            max_points (int): maximum number of points per series. The bins of every
+                series are sized to fit the time span of that series. Ignored when
+                bin_size is set.
+            bin_size (int): size of the time bins in the unit of ts. The bins of all
+                series are aligned to the first timestamp of the dataframe.
+            method (str): one of "max", "mean" or "minmax". Default = "max".
+
+        Returns:
+            pd.DataFrame
+                The downsampled time series with the same columns as series, sorted
+                by series and timestamp. The other columns are taken from the first
+                point of every bin.
+
+        Raises:
+            ValueError: if method is unknown or neither max_points nor bin_size is a
+                positive number.
+        """
+        points_per_bin = {"max": 2, "mean": 2, "minmax": 4}
+        if method not in points_per_bin:
+            raise ValueError(
+                f"Unknown downsampling method {method}, "
+                f"expected one of {list(points_per_bin)}"
             )
-            results_list.append(result)
-        return pd.concat(results_list) if len(results_list) > 0 else None
+        if (bin_size is None or bin_size <= 0) and (
+            max_points is None or max_points <= 0
+        ):
+            raise ValueError("One of max_points or bin_size must be positive")
+        if series.empty:
+            return series
+
+        # Sort the points by series and time.
+        codes = series.groupby(series_cols, sort=False).ngroup().to_numpy()
+        ts = series["ts"].to_numpy()
+        order = np.lexsort((ts, codes))
+        df = series.take(order)
+        codes, ts = codes[order], ts[order]
+        values = df[value_col].to_numpy(dtype=float)
+
+        n = len(df)
+        new_series = np.ones(n, dtype=bool)
+        new_series[1:] = codes[1:] != codes[:-1]
+
+        if bin_size is None or bin_size <= 0:
+            # Size the bins of every series to fit its own time span.
+            series_starts = np.flatnonzero(new_series)
+            series_lengths = np.diff(np.append(series_starts, n))
+            first_ts = ts[series_starts]
+            last_ts = ts[np.append(series_starts[1:], n) - 1]
+            num_bins = max(max_points // points_per_bin[method], 1)
+            t0 = np.repeat(first_ts, series_lengths)
+            bin_size = np.repeat(
+                np.maximum(-(-(last_ts - first_ts + 1) // num_bins), 1),
+                series_lengths,
+            )
+        else:
+            t0 = ts.min()
+        bins = (ts - t0) // bin_size
+
+        new_bin = new_series.copy()
+        new_bin[1:] |= bins[1:] != bins[:-1]
+        starts = np.flatnonzero(new_bin)
+        ends = np.append(starts[1:], n)
+
+        if method == "minmax":
+            bin_ids = np.cumsum(new_bin) - 1
+            grouped = pd.Series(values).groupby(bin_ids, sort=False)
+            positions = np.unique(
+                np.concatenate(
+                    [
+                        starts,
+                        ends - 1,
+                        grouped.idxmin().to_numpy(),
+                        grouped.idxmax().to_numpy(),
+                    ]
+                )
+            )
+            return df.iloc[positions]
+
+        bin_start = t0 + bins * bin_size
+        bin_end = bin_start + bin_size
+        # The value of the previous point holds from the start of the bin to the first
+        # point of the bin.
+        prev_values = np.roll(values, 1)
+        carried = new_bin & ~new_series & (ts > bin_start)
+
+        if method == "max":
+            agg = np.maximum.reduceat(
+                np.where(carried, np.maximum(values, prev_values), values), starts
+            )
+        else:
+            # Every point holds its value until the next point of the series, clipped
+            # to the end of its bin; the last point of a series holds until the end of
+            # its bin.
+            last_in_series = np.append(new_series[1:], True)
+            next_ts = np.where(last_in_series, bin_end, np.roll(ts, -1))
+            durations = (np.minimum(next_ts, bin_end) - ts).astype(float)
+            carried_durations = np.where(carried, ts - bin_start, 0).astype(float)
+            weighted = np.add.reduceat(
+                values * durations + prev_values * carried_durations, starts
+            )
+            total = np.add.reduceat(durations + carried_durations, starts)
+            agg = np.divide(
+                weighted,
+                total,
+                out=values[ends - 1].copy(),
+                where=total > 0,
+            )
+
+        # A bin without a carried value starts at its first point.
+        point_ts = np.where(carried[starts], bin_start[starts], ts[starts])
+        last_values = values[ends - 1]
+        # Restore the last value of the bin at its end unless the next bin of the
+        # series has its own point.
+        next_adjacent = np.zeros(len(starts), dtype=bool)
+        next_adjacent[:-1] = (codes[starts[1:]] == codes[starts[:-1]]) & (
+            bins[starts[1:]] == bins[starts[:-1]] + 1
+        )
+        add_end = ~next_adjacent & (last_values != agg)
+
+        # Interleave the bin points and the end points, and drop the unused end points.
+        keep = np.stack([np.ones(len(starts), dtype=bool), add_end], axis=1).ravel()
+        result = df.iloc[np.repeat(starts, 2)[keep]].reset_index(drop=True)
+        result["ts"] = np.stack([point_ts, bin_end[starts]], axis=1).ravel()[keep]
+        result_values = np.stack([agg, last_values], axis=1).ravel()[keep]
+        if method == "max" and pd.api.types.is_integer_dtype(series[value_col]):
+            result_values = result_values.astype(series[value_col].dtype)
+        result[value_col] = result_values
+        return result
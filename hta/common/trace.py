@@ -5,6 +5,7 @@
 from __future__ import annotations
 
 import gzip
+import itertools
 import json
 import multiprocessing as mp
 import os
@@ -12,7 +13,18 @@ import re
 import sys
 import time
 import tracemalloc
-from typing import Any, Dict, List, Optional, Tuple, Union
+from collections.abc import Iterator
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 
@@ -20,7 +32,11 @@ import pandas as pd
 
 from hta.common.trace_file import create_rank_to_trace_dict, get_trace_files
 from hta.common.trace_filter import CPUOperatorFilter, GPUKernelFilter
-from hta.common.trace_parser import parse_trace_dataframe, parse_trace_dict
+from hta.common.trace_parser import (
+    parse_trace_dataframe,
+    parse_trace_dict,
+    parse_trace_dict_items,
+)
 from hta.common.trace_symbol_table import (
     decode_symbol_id_to_symbol_name,
     TraceSymbolTable,
@@ -28,7 +44,7 @@ from hta.common.trace_symbol_table import (
 from hta.configs.config import logger
 from hta.configs.default_values import DEFAULT_TRACE_DIR
 from hta.configs.parser_config import ParserConfig
-from hta.utils.utils import get_mp_pool_size, normalize_path
+from hta.utils.utils import get_kernel_type, get_mp_pool_size, normalize_path
 
 MetaData = Dict[str, Any]
 PHASE_COUNTER: str = "C"
@@ -36,6 +52,40 @@ PHASE_FLOW_START: str = "s"
 PHASE_FLOW_END: str = "f"
 
 
+class JSONFragment(str):
+    """A json encoded value that Trace.write_raw_trace_items() writes verbatim."""
+
+
+def _to_json_column(column: pd.Series) -> np.ndarray:
+    """Encodes every value of a column as json text, returns an object array of str.
+    Missing values of nullable and object columns are encoded as null."""
+    # Nullable extension dtypes may hold NA, they are encoded value by value below.
+    if isinstance(column.dtype, np.dtype):
+        if pd.api.types.is_bool_dtype(column):
+            return np.where(column.to_numpy(), "true", "false").astype(object)
+        if pd.api.types.is_integer_dtype(column):
+            return column.to_numpy().astype(str).astype(object)
+        if pd.api.types.is_float_dtype(column):
+            values = column.to_numpy(dtype=float)
+            # numpy prints the shortest repr of floats like json, except for nan and inf.
+            return np.select(
+                [np.isnan(values), values == np.inf, values == -np.inf],
+                ["NaN", "Infinity", "-Infinity"],
+                values.astype(str),
+            ).astype(object)
+    codes, uniques = pd.factorize(column, use_na_sentinel=False)
+    encoded = np.array(
+        [
+            json.dumps(
+                None if pd.isna(v) else v.item() if isinstance(v, np.generic) else v
+            )
+            for v in uniques
+        ],
+        dtype=object,
+    )
+    return encoded[codes]
+
+
 def trace_event_timestamp_to_unixtime_ns(
     trace_event_ts_us: float, trace_metadata: MetaData
 ) -> int:
@@ -326,6 +376,51 @@ def add_fwd_bwd_links(df: pd.DataFrame) -> None:
     logger.debug(f"Time taken to add fwd_bwd links: {t1 - t0 :.2f} seconds")
 
 
+def _get_gpu_kernels_frame(t: "Trace", rank: int) -> pd.DataFrame:
+    """The events on a GPU stream with a `kernel_type` column."""
+    trace_df = t.get_trace(rank)
+    gpu_kernels = trace_df.loc[trace_df["stream"].ne(-1)]
+    sym_table = t.symbol_table.get_sym_table()
+    kernel_types = {
+        name: get_kernel_type(sym_table[name]) for name in gpu_kernels["name"].unique()
+    }
+    return gpu_kernels.assign(
+        kernel_type=gpu_kernels["name"].map(kernel_types).astype(object)
+    )
+
+
+def _get_cpu_ops_frame(t: "Trace", rank: int) -> pd.DataFrame:
+    """The CPU events, excluding the GPU kernels and synchronization events."""
+    return CPUOperatorFilter()(t.get_trace(rank), t.symbol_table)
+
+
+def _get_runtime_launches_frame(t: "Trace", rank: int) -> pd.DataFrame:
+    """The runtime events that launch kernels and memory operations."""
+    return t.get_trace(rank).query(t.symbol_table.get_runtime_launch_events_query())
+
+
+def _get_kernel_launches_frame(t: "Trace", rank: int) -> pd.DataFrame:
+    """The runtime launch events joined with the GPU kernel they launch."""
+    gpu_kernels = t.get_derived_frame(rank, "gpu_kernels")
+    kernel_columns = ["index", "ts", "dur", "stream", "pid", "tid"]
+    return t.get_derived_frame(rank, "runtime_launches").join(
+        gpu_kernels[kernel_columns]
+        .add_suffix("_kernel")
+        .join(gpu_kernels["kernel_type"]),
+        on="index_correlation",
+        how="inner",
+    )
+
+
+# The builders of the frames returned by Trace.get_derived_frame().
+_DERIVED_FRAME_BUILDERS: Dict[str, Callable[["Trace", int], pd.DataFrame]] = {
+    "gpu_kernels": _get_gpu_kernels_frame,
+    "cpu_ops": _get_cpu_ops_frame,
+    "runtime_launches": _get_runtime_launches_frame,
+    "kernel_launches": _get_kernel_launches_frame,
+}
+
+
 class Trace:
     """
     A container for the traces collected for a distributed ML training job.
@@ -391,6 +486,10 @@ class Trace:
         self.symbol_table = TraceSymbolTable()
         self.meta_data: Dict[int, MetaData] = {}
         self.min_ts: int = 0
+        # (rank, name) -> (trace of the rank, derived frame); see get_derived_frame()
+        self._derived_frames: Dict[
+            Tuple[int, str], Tuple[pd.DataFrame, pd.DataFrame]
+        ] = {}
 
         self._normalize_trace_filenames()
         if not self._validate_trace_files():
@@ -632,6 +731,58 @@ class Trace:
         """
         return self.traces
 
+    def get_derived_frame(self, rank: int, name: str) -> pd.DataFrame:
+        """
+        Get a frame derived from the trace of a rank. The frame is computed on first use and
+        reused until the trace of the rank is replaced or invalidate_derived_frames() is called.
+
+        Args:
+            rank (int) : the rank of the trace.
+            name (str) : the name of the derived frame, one of
+                "gpu_kernels": the events on a GPU stream with a `kernel_type` column.
+                "cpu_ops": the CPU events selected by CPUOperatorFilter.
+                "runtime_launches": the runtime events that launch kernels and memory operations.
+                "kernel_launches": the runtime launch events joined with the `index`, `ts`, `dur`,
+                    `stream`, `pid` and `tid` of their GPU kernel, suffixed by `_kernel`, and its
+                    `kernel_type`.
+
+        Returns:
+            The derived DataFrame. It is shared by all the callers and should be copied before
+            being modified.
+
+        Raises:
+            ValueError when the name is unknown or this Trace object doesn't have trace for the
+            given rank.
+        """
+        if name not in _DERIVED_FRAME_BUILDERS:
+            raise ValueError(f"Unknown derived frame {name}")
+        trace_df = self.get_trace(rank)
+        source_df, derived_df = self._derived_frames.get((rank, name), (None, None))
+        if source_df is not trace_df or derived_df is None:
+            derived_df = _DERIVED_FRAME_BUILDERS[name](self, rank)
+            self._derived_frames[(rank, name)] = (trace_df, derived_df)
+        return derived_df
+
+    def invalidate_derived_frames(self, rank: Optional[int] = None) -> None:
+        """
+        Drop the cached derived frames. Call it after modifying a trace dataframe in place.
+
+        Args:
+            rank (Optional[int]) : the rank whose frames are dropped; all ranks when None.
+        """
+        if rank is None:
+            self._derived_frames.clear()
+        else:
+            for key in [key for key in self._derived_frames if key[0] == rank]:
+                del self._derived_frames[key]
+
+    def __copy__(self) -> "Trace":
+        # A shallow copy gets its own cache as its traces may be replaced.
+        t = Trace.__new__(Trace)
+        t.__dict__.update(self.__dict__)
+        t._derived_frames = {}
+        return t
+
     def get_raw_trace_for_one_rank(self, rank: int = 0) -> Dict[str, Any]:
         """
         Get raw trace content for one rank without filtering or compression to support writing back
@@ -652,10 +803,102 @@ class Trace:
         trace_filepath = self.trace_files[rank]
         return parse_trace_dict(trace_filepath)
 
+    def iter_raw_trace_for_one_rank(
+        self, rank: int = 0
+    ) -> Generator[Tuple[str, Any], None, None]:
+        """
+        Lazily get the raw trace content for one rank, see get_raw_trace_for_one_rank().
+
+        Args:
+            rank (int) : the rank of the trainer whose trace is to be returned.
+
+        Returns:
+            A generator of the top level (key, value) items of the trace file of the given rank.
+            The trace events are parsed one at a time when ijson is available,
+            see parse_trace_dict_items().
+
+        Raises:
+            ValueError when this Trace object doesn't have trace for the given rank.
+        """
+        if rank not in self.trace_files:
+            logger.error(f"get_rank_trace - no trace for rank {rank}")
+            raise ValueError
+        return parse_trace_dict_items(self.trace_files[rank])
+
     def write_raw_trace(self, output_file: str, trace_contents: Dict[str, Any]) -> None:
         with gzip.open(output_file, "wt") as fp:
             json.dump(trace_contents, fp, indent=2)
 
+    @staticmethod
+    def write_raw_trace_items(
+        output_file: str,
+        trace_items: Iterable[Tuple[str, Any]],
+        compresslevel: int = 6,
+    ) -> None:
+        """
+        Incrementally write the top level items of a raw trace as compact json.
+
+        Args:
+            output_file (str) : the path of the gzipped output file.
+            trace_items (Iterable[Tuple[str, Any]]) : the (key, value) items of the trace.
+                Values that are iterators, like the trace events, are written as json
+                arrays one element at a time. Elements that are JSONFragment are
+                already encoded and written as is.
+            compresslevel (int) : the gzip compression level from 0 to 9. Default: 6.
+        """
+        encode = json.JSONEncoder(separators=(",", ":")).encode
+        with gzip.open(output_file, "wt", compresslevel=compresslevel) as fp:
+            fp.write("{")
+            for i, (key, value) in enumerate(trace_items):
+                fp.write(("," if i > 0 else "") + json.dumps(key) + ":")
+                if not isinstance(value, Iterator):
+                    fp.write(encode(value))
+                    continue
+                fp.write("[")
+                for j, element in enumerate(value):
+                    if j > 0:
+                        fp.write(",")
+                    fp.write(
+                        element
+                        if isinstance(element, JSONFragment)
+                        else encode(element)
+                    )
+                fp.write("]")
+            fp.write("}")
+
+    def write_raw_trace_with_events(
+        self,
+        rank: int,
+        output_file: str,
+        events: List[Union[Dict[str, Any], JSONFragment]],
+        compresslevel: int = 6,
+    ) -> None:
+        """
+        Stream the raw trace of a rank to a new file with extra events appended to its
+        trace events, see write_raw_trace_items().
+
+        Args:
+            rank (int) : the rank of the trainer whose trace is to be copied.
+            output_file (str) : the path of the gzipped output file.
+            events (List[Union[Dict[str, Any], JSONFragment]]) : the events to append,
+                e.g. counter events from convert_time_series_to_json_events().
+            compresslevel (int) : the gzip compression level from 0 to 9. Default: 6.
+
+        Raises:
+            ValueError when this Trace object doesn't have trace for the given rank.
+        """
+        self.write_raw_trace_items(
+            output_file,
+            (
+                (
+                    key,
+                    (itertools.chain(value, events) if key == "traceEvents" else value),
+                )
+                for key, value in self.iter_raw_trace_for_one_rank(rank=rank)
+            ),
+            compresslevel=compresslevel,
+        )
+
     def _normalize_trace_filenames(self) -> None:
         """
         Normalize the trace filenames so that a rank's trace file can be located by self.trace_files[rank] itself.
@@ -701,6 +944,7 @@ class Trace:
         for rank, trace_df in self.traces.items():
             trace_df["ts"] = trace_df["ts"] - self.min_ts
             self.traces[rank] = trace_df
+        self.invalidate_derived_frames()
 
     def _filter_irrelevant_gpu_kernels(
         self, include_last_profiler_step: Optional[bool] = False
@@ -755,6 +999,7 @@ class Trace:
             decode_symbol_id_to_symbol_name(
                 self.get_trace(rank), self.symbol_table, use_shorten_name
             )
+        self.invalidate_derived_frames()
 
     def convert_time_series_to_events(
         self, series: pd.DataFrame, counter_name: str, counter_col: str
@@ -793,13 +1038,58 @@ class Trace:
         # add back ts delta
         events_df["ts"] = events_df["ts"] + self.min_ts
 
-        def convert_to_args(value: int):
-            return {counter_name: value}
-
-        events_df.args = events_df.args.apply(convert_to_args)
+        events_df["args"] = [{counter_name: value} for value in events_df["args"]]
 
         return events_df.to_dict("records")
 
+    def convert_time_series_to_json_events(
+        self, series: pd.DataFrame, counter_name: str, counter_col: str
+    ) -> List[JSONFragment]:
+        """
+        Same as convert_time_series_to_events(), but encodes the counter events as compact
+        json text with vectorized string operations over the columns of the time series,
+        without building a dictionary for every event. The events can be passed directly
+        to write_raw_trace_items() and write_raw_trace_with_events().
+
+        @args
+            series: is a dataframe with a minimum of pid, tid, ts.
+                    (the id field is optional but use it to distinguish series with same name)
+            counter_name (str): name of the counter.
+            counter_col (str): name of the column used as the counter itself.
+
+        Returns a list of json encoded events that can be appended to the trace.
+        """
+        required_columns = ["pid", "ts", counter_col]
+        if not set(required_columns).issubset(series.columns):
+            logger.warning(
+                "Time series dataframe does NOT contain required columns "
+                f"{required_columns}, columns contained = {series.columns}"
+            )
+            return []
+        if series.empty:
+            return []
+
+        # Same keys in the same order as convert_time_series_to_events().
+        events = (
+            '{"pid":'
+            + _to_json_column(series["pid"])
+            + ',"ts":'
+            + _to_json_column(series["ts"] + self.min_ts)
+            + ',"args":{'
+            + json.dumps(counter_name)
+            + ":"
+            + _to_json_column(series[counter_col])
+            + f'}},"ph":"{PHASE_COUNTER}","name":'
+        )
+        if "name" in series.columns:
+            events = events + _to_json_column(series["name"])
+        else:
+            events = events + json.dumps(counter_name)
+        if "id" in series.columns:
+            events = events + ',"id":' + _to_json_column(series["id"])
+
+        return list(map(JSONFragment, events + "}"))
+
     @staticmethod
     def flow_event(
         id: int,
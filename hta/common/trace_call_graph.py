@@ -1,13 +1,22 @@
+import hashlib
+import os
 from time import perf_counter
-from typing import Dict, Generator, List, Optional
+from typing import cast, Dict, Generator, List, Optional, Set, Tuple
 
+import numpy as np
 import pandas as pd
 
 from hta.common.trace import get_cpu_gpu_correlation, Trace
-from hta.common.trace_call_stack import CallStackGraph, CallStackIdentity, CallStackNode
+from hta.common.trace_call_stack import (
+    CallStackArrays,
+    CallStackGraph,
+    CallStackIdentity,
+)
 from hta.common.trace_symbol_table import TraceSymbolTable
 from hta.common.types import DeviceType, infer_device_type
 from hta.configs.config import logger
+from hta.configs.env_options import cache_call_stack_columns
+from hta.utils.utils import map_ranks
 
 
 class CallGraph:
@@ -31,16 +40,22 @@ class CallGraph:
         ranks (List[int]) : A list of trainer IDs (i.e., ranks).
         rank_to_stacks (Dict[int, Dict[CallStackIdentity, CallStackGraph]]): a map from ranks to their
         CallStackGraph objects, which are represented as another map from CallStackIdentity to CallStackGraph objects.
-        rank_to_nodes[int]: (Dict[int, Dict[int, CallStackNode]]): a map from ranks to their event indices to
-            the events' corresponding CallStackNode objects.
+        rank_to_nodes (Dict[int, CallStackArrays]): a map from ranks to the storage of their call stack nodes,
+            which is shared by all CallStackGraph objects of the rank.
         call_stacks (List[CallStackGraph]) : List of per-thread CallStackGraph objects.
         mapping (pd.DataFrame) : A mapping from CallStackIdentity to CallStackGraph using a DataFrame.
 
+        When the call graph is constructed in parallel, the stack columns are computed by the worker processes
+        and the CallStackGraph objects of a rank are rebuilt from these columns when they are first accessed.
+
         The following attributes are internal to the CallGraph implementation.
         _cached_rank(int) : the current active rank
-        _cached_nodes (Dict[int, CallStackNode]) : the CallStackGraph nodes corresponding to _cached_rank.
+        _cached_nodes (CallStackArrays) : the CallStackGraph nodes corresponding to _cached_rank.
         _cached_df (pd.DataFame) : the trace DataFrame corresponding to _cached_rank.
         _cached_gpu_kernels (pd.DataFrame) : the GPU kernels corresponding to _cached_rank.
+        _cached_tour (Tuple[np.ndarray, np.ndarray]) : the sorted `dfs_enter` values and the corresponding
+            event indices of _cached_rank, which are built on demand for the descendant queries.
+        _pending_ranks (Set[int]) : the ranks whose CallStackGraph objects haven't been rebuilt yet.
     """
 
     stack_columns = [
@@ -52,9 +67,18 @@ class CallGraph:
         "num_kernels",
         "kernel_dur_sum",
         "kernel_span",
+        "dfs_enter",
+        "dfs_exit",
     ]
 
-    def __init__(self, trace: Trace, ranks: Optional[List[int]] = None) -> None:
+    def __init__(
+        self,
+        trace: Trace,
+        ranks: Optional[List[int]] = None,
+        use_multiprocessing: bool = False,
+        cache_stack_columns: Optional[bool] = None,
+        cache_dir: Optional[str] = None,
+    ) -> None:
         """Construct a CallGraph object from a Trace object.
 
         Args:
@@ -62,6 +86,15 @@ class CallGraph:
             ranks (List[int]) : Only construct the CallGraph objects for the given set of ranks.
                 When not provided, uses all available ranks in <trace>.
                 Caution: this might be time-consuming.
+            use_multiprocessing (bool) : whether to construct the call stacks of different ranks in parallel
+                when there are more than one ranks. The threads of each rank are still processed serially.
+                It falls back to a serial construction on platforms where
+                the worker processes cannot be forked. Default: False.
+            cache_stack_columns (bool) : whether to reload the stack columns from the stack cache files of the
+                trace files when they are valid, and save the stack columns of the other ranks to their cache files.
+                When not provided, it is enabled by the environment variable HTA_CACHE_CALL_STACK_COLUMNS.
+            cache_dir (Optional[str]) : the directory of the stack cache files. When not provided, the cache files
+                are stored next to the trace files.
 
         Raises:
             ValueError: If the trace data is invalid.
@@ -72,9 +105,10 @@ class CallGraph:
         if (len(self.ranks)) == 0:
             raise ValueError("No rank was found for the trace.")
 
-        self.rank_to_nodes: Dict[int, Dict[int, CallStackNode]] = {}
-        self.rank_to_stacks: Dict[int, Dict[CallStackIdentity, CallStackGraph]] = {}
-        self.call_stacks: List[CallStackGraph] = []
+        self._rank_to_nodes: Dict[int, CallStackArrays] = {}
+        self._rank_to_stacks: Dict[int, Dict[CallStackIdentity, CallStackGraph]] = {}
+        self._call_stacks: List[Optional[CallStackGraph]] = []
+        self._pending_ranks: Set[int] = set()
         self.mapping: pd.DataFrame = pd.DataFrame(
             columns=[
                 "rank",
@@ -87,17 +121,33 @@ class CallGraph:
             ]
         )
 
-        self._construct_call_graph()
+        if cache_stack_columns is None:
+            cache_stack_columns = cache_call_stack_columns()
+        cached_data: Dict[int, Tuple[pd.DataFrame, pd.DataFrame]] = {}
+        if cache_stack_columns:
+            for rank in self.ranks:
+                if (data := self._load_stack_columns(rank, cache_dir)) is not None:
+                    cached_data[rank] = data
+        ranks_to_build = [r for r in self.ranks if r not in cached_data]
+
+        if use_multiprocessing and len(ranks_to_build) > 1:
+            self._construct_call_graph_in_parallel(ranks_to_build)
+        elif len(ranks_to_build) > 0:
+            self._construct_call_graph(ranks_to_build)
+
+        for rank, (stack_columns, mapping) in cached_data.items():
+            self._set_stack_columns(rank, stack_columns, mapping)
+        if cache_stack_columns:
+            for rank in ranks_to_build:
+                self._save_stack_columns(rank, cache_dir)
 
         # Caching current rank's data
         self._cached_rank: int = self.ranks[0]
-        self._cached_nodes: Dict[int, CallStackNode] = self.rank_to_nodes[
-            self._cached_rank
-        ]
         self._cached_df: pd.DataFrame = self.trace_data.get_trace(self._cached_rank)
         self._cached_gpu_kernels: pd.DataFrame = self._cached_df.loc[
             self._cached_df["stream"].ne(-1)
         ]
+        self._cached_tour: Optional[Tuple[np.ndarray, np.ndarray]] = None
 
     @staticmethod
     def from_dataframe(
@@ -127,17 +177,41 @@ class CallGraph:
         cg = CallGraph(t)
         return cg
 
-    def _construct_call_graph(self) -> None:
+    @property
+    def call_stacks(self) -> List[CallStackGraph]:
+        """List of per-thread CallStackGraph objects of all ranks."""
+        self._rebuild_pending_call_stacks()
+        return cast(List[CallStackGraph], self._call_stacks)
+
+    @property
+    def rank_to_nodes(self) -> Dict[int, CallStackArrays]:
+        """A map from ranks to the storage of their call stack nodes."""
+        self._rebuild_pending_call_stacks()
+        return self._rank_to_nodes
+
+    @property
+    def rank_to_stacks(self) -> Dict[int, Dict[CallStackIdentity, CallStackGraph]]:
+        """A map from ranks to their CallStackGraph objects."""
+        self._rebuild_pending_call_stacks()
+        return self._rank_to_stacks
+
+    @property
+    def _cached_nodes(self) -> CallStackArrays:
+        self._rebuild_pending_call_stacks(self._cached_rank)
+        return self._rank_to_nodes[self._cached_rank]
+
+    def _construct_call_graph(self, ranks: List[int]) -> None:
         """
         Construct the call graph from the traces of a distributed training job.
+
+        Args:
+            ranks (List[int]): the ranks whose call stacks to be constructed.
         """
-        # TODO:
-        # - make it parallel when there are more than one ranks.
-        logger.debug(f"Constructing Call Graph for ranks: {self.ranks}")
-        for rank in self.ranks:
+        logger.debug(f"Constructing Call Graph for ranks: {ranks}")
+        for rank in ranks:
             t0 = perf_counter()
-            self.rank_to_nodes[rank] = {}
-            self.rank_to_stacks[rank] = {}
+            self._rank_to_nodes[rank] = CallStackArrays()
+            self._rank_to_stacks[rank] = {}
             df = self.trace_data.get_trace(rank)
             # add an "end" column for time interval based filtering
             if "end" not in df.columns:
@@ -145,7 +219,222 @@ class CallGraph:
             self._build_call_stacks(df, self.trace_data.symbol_table, rank)
             t1 = perf_counter()
             logger.debug(
-                f"constructed {len(self.rank_to_stacks[rank])} call stacks for rank {rank} in {t1-t0:.2f} seconds"
+                f"constructed {len(self._rank_to_stacks[rank])} call stacks for rank {rank} in {t1-t0:.2f} seconds"
+            )
+
+    def _construct_call_graph_in_parallel(self, ranks: List[int]) -> None:
+        """Construct the call graph with one worker process per rank.
+
+        Each worker computes the stack columns of one rank, which are written back into the rank's trace
+        DataFrame. The CallStackGraph objects are rebuilt from these columns when they are first accessed.
+        Only the ranks are parallelized: the threads of a rank are built serially in its worker, because
+        the first layer nodes of the backward thread's stack are attached to the main thread's stack.
+        A trace with a single rank therefore gains nothing from this path.
+
+        Args:
+            ranks (List[int]): the ranks whose call stacks to be constructed.
+        """
+        t0 = perf_counter()
+        results = map_ranks(
+            self.trace_data,
+            _build_stack_columns_for_rank,
+            ranks,
+            use_multiprocessing=True,
+        )
+        t1 = perf_counter()
+
+        for rank, stack_columns, mapping in results:
+            self._set_stack_columns(rank, stack_columns, mapping)
+        t2 = perf_counter()
+        logger.debug(
+            f"constructed call stacks for {len(ranks)} ranks in {t1 - t0:.2f} seconds; "
+            f"updated trace data in {t2 - t1:.2f} seconds"
+        )
+
+    def _set_stack_columns(
+        self, rank: int, stack_columns: pd.DataFrame, mapping: pd.DataFrame
+    ) -> None:
+        """Write the precomputed stack columns of a rank into its trace DataFrame.
+
+        The CallStackGraph objects of the rank are rebuilt from the stack columns when they are first accessed.
+
+        Args:
+            rank (int): the rank of the stack columns.
+            stack_columns (pd.DataFrame): the stack columns aligned with the rows of the rank's trace DataFrame.
+            mapping (pd.DataFrame): the call stack mapping of the rank, whose stack indices start from 0.
+        """
+        df = self.trace_data.get_trace(rank)
+        if "end" not in df.columns:
+            df["end"] = df["ts"] + df["dur"]
+        for col in self.stack_columns:
+            df[col] = stack_columns[col].to_numpy()
+
+        mapping = mapping.copy()
+        mapping["stack_index"] += len(self._call_stacks)
+        self._call_stacks.extend([None] * mapping.shape[0])
+        self.mapping = (
+            pd.concat([self.mapping, mapping], ignore_index=True)
+            if self.mapping.shape[0] > 0
+            else mapping.reset_index(drop=True)
+        )
+        self._pending_ranks.add(rank)
+
+    def _get_stack_cache_file(
+        self, rank: int, cache_dir: Optional[str]
+    ) -> Optional[str]:
+        """Get the path of the stack cache file of a rank; None if the rank doesn't have a trace file."""
+        trace_file = self.trace_data.trace_files.get(rank)
+        if not trace_file or not os.path.isfile(trace_file):
+            return None
+        directory = cache_dir if cache_dir else os.path.dirname(trace_file)
+        return os.path.join(
+            directory, os.path.basename(trace_file) + STACK_CACHE_FILE_SUFFIX
+        )
+
+    def _load_stack_columns(
+        self, rank: int, cache_dir: Optional[str]
+    ) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """Load the stack columns and the call stack mapping of a rank from its stack cache file.
+
+        Args:
+            rank (int): the rank to be loaded.
+            cache_dir (Optional[str]): the directory of the stack cache files.
+
+        Returns:
+            A tuple of the stack columns and the call stack mapping when the cache file is valid for the trace
+            file and the events of the rank's trace DataFrame; otherwise, None.
+        """
+        cache_file = self._get_stack_cache_file(rank, cache_dir)
+        if cache_file is None or not os.path.isfile(cache_file):
+            return None
+        try:
+            with np.load(cache_file, allow_pickle=False) as data:
+                if str(data["fingerprint"]) != get_trace_fingerprint(
+                    self.trace_data.trace_files[rank]
+                ):
+                    logger.info(f"stack cache file {cache_file} is out of date")
+                    return None
+                df = self.trace_data.get_trace(rank)
+                if not np.array_equal(data["index"], df["index"].to_numpy()):
+                    logger.info(
+                        f"stack cache file {cache_file} doesn't match the trace events"
+                    )
+                    return None
+                stack_columns = pd.DataFrame(
+                    {col: data[col] for col in self.stack_columns}, index=df.index
+                )
+                mapping = pd.DataFrame(
+                    {col: data[f"mapping_{col}"] for col in self.mapping.columns}
+                )
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"failed to load stack cache file {cache_file}: {e}")
+            return None
+        logger.debug(f"loaded the stack columns of rank {rank} from {cache_file}")
+        return stack_columns, mapping
+
+    def _save_stack_columns(self, rank: int, cache_dir: Optional[str]) -> None:
+        """Save the stack columns and the call stack mapping of a rank to its stack cache file.
+
+        Args:
+            rank (int): the rank to be saved.
+            cache_dir (Optional[str]): the directory of the stack cache files.
+        """
+        cache_file = self._get_stack_cache_file(rank, cache_dir)
+        if cache_file is None:
+            logger.warning(f"rank {rank} has no trace file to key its stack cache")
+            return
+        df = self.trace_data.get_trace(rank)
+        mapping = self.mapping.loc[self.mapping["rank"].eq(rank)].copy()
+        mapping["stack_index"] -= mapping["stack_index"].min()
+        arrays: Dict[str, np.ndarray] = {
+            col: df[col].to_numpy() for col in self.stack_columns
+        }
+        arrays.update(
+            {
+                f"mapping_{col}": (
+                    mapping[col].to_numpy(dtype=str)
+                    if mapping[col].dtype == object
+                    else mapping[col].to_numpy()
+                )
+                for col in mapping.columns
+            }
+        )
+        # Write to a temporary file first so that readers never see a partially written cache file.
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "wb") as f:
+                np.savez(
+                    f,
+                    fingerprint=np.array(
+                        get_trace_fingerprint(self.trace_data.trace_files[rank])
+                    ),
+                    index=df["index"].to_numpy(),
+                    **arrays,
+                )
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.warning(f"failed to save stack cache file {cache_file}: {e}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return
+        logger.debug(f"saved the stack columns of rank {rank} to {cache_file}")
+
+    def _rebuild_pending_call_stacks(self, rank: Optional[int] = None) -> None:
+        """Rebuild the CallStackGraph objects from the stack columns of the trace DataFrames.
+
+        Args:
+            rank (Optional[int]): the rank whose call stacks to be rebuilt. When rank is None, rebuild
+                the call stacks of all pending ranks.
+        """
+        ranks = sorted(self._pending_ranks) if rank is None else [rank]
+        for r in ranks:
+            if r not in self._pending_ranks:
+                continue
+            self._pending_ranks.discard(r)
+            t0 = perf_counter()
+            df = self.trace_data.get_trace(r)
+            df_correlation = get_cpu_gpu_correlation(df)
+            nodes = CallStackArrays()
+            self._rank_to_nodes[r] = nodes
+            self._rank_to_stacks[r] = {}
+            thread_groups = df.groupby(["pid", "tid"]).groups
+
+            stacks = self.mapping.loc[self.mapping["rank"].eq(r)]
+            for pid, tid, stack_index, stack_root in stacks[
+                ["pid", "tid", "stack_index", "stack_root"]
+            ].itertuples(index=False):
+                csi = CallStackIdentity(r, pid, tid)
+                csg = CallStackGraph(
+                    df.loc[thread_groups[(pid, tid)]],
+                    csi,
+                    df_correlation,
+                    df,
+                    self.trace_data.symbol_table,
+                    nodes,
+                    use_existing_stack_columns=True,
+                    save_call_stack_to_df=False,
+                )
+                self._rank_to_stacks[r][csi] = csg
+                self._call_stacks[stack_index] = csg
+
+            # The first layer nodes of the backward stack were attached to the main stack.
+            for csg, stack_root in zip(
+                self._rank_to_stacks[r].values(), stacks["stack_root"]
+            ):
+                if csg.root_index != stack_root:
+                    if nodes.get_children(csg.root_index).size == 0:
+                        nodes.remove_nodes([csg.root_index])
+                    csg.root_index = int(stack_root)
+
+            # The roots are not trace events, so their heights are not saved in the stack columns.
+            for root in stacks["stack_root"].unique():
+                pos = nodes.position(root)
+                children = nodes.positions(nodes.get_children(root))
+                if pos >= 0 and children.size > 0:
+                    nodes.height[pos] = nodes.height[children].max() + 1
+            t1 = perf_counter()
+            logger.debug(
+                f"rebuilt {stacks.shape[0]} call stacks for rank {r} in {t1 - t0:.2f} seconds"
             )
 
     def _build_call_stacks(
@@ -169,6 +458,9 @@ class CallGraph:
         df.loc[df.index, "kernel_span"] = 0
         df.loc[df.index, "first_kernel_start"] = -1
         df.loc[df.index, "last_kernel_end"] = -1
+        # Reset the dtypes too because the tour numbers may outgrow previously downcast columns.
+        df["dfs_enter"] = np.int64(-1)
+        df["dfs_exit"] = np.int64(-1)
 
         s_map: pd.Series = pd.Series(self.trace_data.symbol_table.get_sym_id_map())
         s_tab: pd.Series = pd.Series(self.trace_data.symbol_table.get_sym_table())
@@ -190,9 +482,10 @@ class CallGraph:
             return label
 
         df_correlation = get_cpu_gpu_correlation(df)
-        call_stacks: Dict[CallStackIdentity, CallStackGraph] = self.rank_to_stacks[rank]
-        nodes: Dict[int, CallStackNode] = self.rank_to_nodes[rank]
-        nodes.clear()
+        call_stacks: Dict[CallStackIdentity, CallStackGraph] = self._rank_to_stacks[
+            rank
+        ]
+        nodes: CallStackArrays = self._rank_to_nodes[rank]
 
         for (pid, tid), df_thread in df.groupby(["pid", "tid"]):
             csi = CallStackIdentity(rank, pid, tid)
@@ -218,14 +511,14 @@ class CallGraph:
                 save_call_stack_to_df=False,
             )
             call_stacks[csi] = csg
-            self.call_stacks.append(csg)
+            self._call_stacks.append(csg)
 
             self.mapping.loc[len(self.mapping)] = (
                 csi.rank,
                 csi.pid,
                 csi.tid,
                 _infer_stack_label(csg),
-                len(self.call_stacks) - 1,
+                len(self._call_stacks) - 1,
                 csg.root_index,
                 1,
             )
@@ -240,8 +533,8 @@ class CallGraph:
         self._update_rank_stack_mapping(rank)
 
         # Save call stack information to the dataframe
-        if len(self.call_stacks) > 0:
-            csg = self.call_stacks[-1]
+        if len(call_stacks) > 0:
+            csg = list(call_stacks.values())[-1]
             csg.save_call_stack_to_dataframe(apply_whole_graph=True)
 
         self._normalize_stack_columns(df)
@@ -258,7 +551,14 @@ class CallGraph:
             df.loc[indices_no_kernel_child, "first_kernel_start"] = -1
             df.loc[indices_no_kernel_child, "last_kernel_end"] = -1
 
-            for col in ["depth", "height", "parent", "num_kernels"]:
+            for col in [
+                "depth",
+                "height",
+                "parent",
+                "num_kernels",
+                "dfs_enter",
+                "dfs_exit",
+            ]:
                 df[col] = pd.to_numeric(df[col], errors="coerce", downcast="integer")
 
     def _connect_stacks(self, rank: int) -> None:
@@ -269,15 +569,15 @@ class CallGraph:
 
         if isinstance(stacks, pd.DataFrame) and stacks.shape[0] == 2:
             stack_indices: List[int] = stacks["stack_index"].to_list()
-            bwd_stack: CallStackGraph = self.call_stacks[stack_indices[0]]
-            main_stack: CallStackGraph = self.call_stacks[stack_indices[1]]
+            bwd_stack = cast(CallStackGraph, self._call_stacks[stack_indices[0]])
+            main_stack = cast(CallStackGraph, self._call_stacks[stack_indices[1]])
             self._link_main_and_bwd_stacks(main_stack, bwd_stack)
 
     def _update_rank_stack_mapping(self, rank: int) -> None:
         """Update the stack root and index after connect CallStackGraph objects."""
         m = self.mapping[self.mapping["rank"].eq(rank)].copy()
         m["stack_root"] = m["stack_index"].apply(
-            lambda i: self.call_stacks[i].root_index
+            lambda i: cast(CallStackGraph, self._call_stacks[i]).root_index
         )
         m["count"] = 1
         m["count"] = m.groupby("stack_root")["count"].cumsum()
@@ -348,8 +648,10 @@ class CallGraph:
         if stack_index is not None:
             df = df.loc[df["stack_index"].eq(stack_index)]
         indices: List[int] = df["stack_index"].to_list()
+        for r in df["rank"].unique():
+            self._rebuild_pending_call_stacks(r)
         for i in indices:
-            yield self.call_stacks[i]
+            yield cast(CallStackGraph, self._call_stacks[i])
 
     def _update_cached_data(self, rank: int) -> None:
         """Set rank to the current active rank and update the cached data accordingly.
@@ -363,11 +665,11 @@ class CallGraph:
         """
         if rank in self.ranks and rank != self._cached_rank:
             self._cached_rank = rank
-            self._cached_nodes = self.rank_to_nodes[self._cached_rank]
             self._cached_df = self.trace_data.get_trace(self._cached_rank)
             self._cached_gpu_kernels = self._cached_df.loc[
                 self._cached_df["stream"].ne(-1)
             ]
+            self._cached_tour = None
 
     def get_node_attributes(self, index: int, rank: Optional[int] = None) -> pd.Series:
         """Get the attributes for a given node identified by <index>.
@@ -384,10 +686,11 @@ class CallGraph:
         Raises:
             ValueError when the index is not in the DataFrame.
         """
-        if rank and rank != self._cached_rank:
+        if rank is not None and rank != self._cached_rank:
             self._update_cached_data(rank)
+        # The DataFrame index of a trace event is the same as its `index` column.
         if index in self._cached_df.index:
-            return self._cached_df.loc[self._cached_df["index"].eq(index)].squeeze()
+            return self._cached_df.loc[index]
         raise ValueError(f"invalid node index - {index}")
 
     def get_csg_of_node(self, index: int, rank: Optional[int] = None) -> CallStackGraph:
@@ -444,28 +747,7 @@ class CallGraph:
             is_cpu_op = False
             node = self.get_node_attributes(node["parent"], rank)
 
-        call_stack = next(
-            self.get_call_stacks(
-                rank=self._cached_rank, pid=node["pid"], tid=node["tid"]
-            )
-        )
-
-        if call_stack:
-            if is_cpu_op:
-                descendants = call_stack.get_descendants(node["index"])
-            else:
-                descendants = [index]
-
-            if skip_ancestors:
-                valid_indices = [i for i in set(descendants) if i >= 0]
-            else:
-                ancestors = call_stack.get_path_to_root(node["index"])
-                indices = set(ancestors).union(set(descendants))
-                valid_indices = [i for i in indices if i >= 0]
-
-            df = call_stack.full_df.loc[valid_indices].copy().sort_values("ts")
-            return df
-        else:
+        if node["dfs_enter"] < 0:
             logger.error(
                 f"CallGraph::get_stack_of_node: could not locate call stack for node {index}"
             )
@@ -473,6 +755,90 @@ class CallGraph:
                 f"CallGraph::get_stack_of_node:: could not locate call stack for node {index}"
             )
 
+        if is_cpu_op:
+            descendants = self.get_descendants(node["index"])
+        else:
+            descendants = [index]
+
+        if skip_ancestors:
+            valid_indices = descendants
+        else:
+            ancestors = self.get_ancestors(node["index"])
+            valid_indices = sorted(set(ancestors).union(descendants))
+
+        return self._cached_df.loc[valid_indices].copy().sort_values("ts")
+
+    def get_descendants(self, index: int, rank: Optional[int] = None) -> List[int]:
+        """Get the descendants of node <index> using the Euler tour numbering of the stack columns.
+
+        The descendants of a node are the events whose `dfs_enter` values are in the range
+        [node.dfs_enter, node.dfs_exit], which is a contiguous slice of the events sorted by `dfs_enter`.
+
+        Args:
+            index (int): the index of a given event.
+            rank (Optional[int]): the rank of the trace.
+                When a valid rank is provided, the cached_data will be updated.
+                When rank is None, the cached_data will be used.
+
+        Returns:
+            List[int]: the indices of node <index> and its descendants, including the GPU kernels, in pre-order.
+        """
+        node = self.get_node_attributes(index, rank)
+        enter, exit_ = node["dfs_enter"], node["dfs_exit"]
+        if enter < 0:
+            return [index]
+        if self._cached_tour is None:
+            df = self._cached_df.loc[self._cached_df["dfs_enter"].ge(0)]
+            sorter = np.argsort(df["dfs_enter"].to_numpy(), kind="stable")
+            self._cached_tour = (
+                df["dfs_enter"].to_numpy()[sorter],
+                df["index"].to_numpy()[sorter],
+            )
+        tour_enter, tour_index = self._cached_tour
+        start = np.searchsorted(tour_enter, enter, side="left")
+        end = np.searchsorted(tour_enter, exit_, side="right")
+        return tour_index[start:end].tolist()
+
+    def get_ancestors(self, index: int, rank: Optional[int] = None) -> List[int]:
+        """Get the ancestors of node <index> by following the parent column.
+
+        Args:
+            index (int): the index of a given event.
+            rank (Optional[int]): the rank of the trace.
+                When a valid rank is provided, the cached_data will be updated.
+                When rank is None, the cached_data will be used.
+
+        Returns:
+            List[int]: the indices of node <index> and its ancestors, excluding the root of the call stack.
+        """
+        if rank is not None and rank != self._cached_rank:
+            self._update_cached_data(rank)
+        parents = self._cached_df["parent"]
+        ancestors: List[int] = []
+        while index >= 0 and index in parents.index and len(ancestors) <= len(parents):
+            ancestors.append(index)
+            index = int(parents.at[index])
+        return ancestors
+
+    def is_ancestor(
+        self, ancestor: int, descendant: int, rank: Optional[int] = None
+    ) -> bool:
+        """Test whether node <ancestor> is an ancestor of node <descendant> or the node itself.
+
+        Args:
+            ancestor (int): the index of the candidate ancestor.
+            descendant (int): the index of the candidate descendant.
+            rank (Optional[int]): the rank of the trace.
+                When a valid rank is provided, the cached_data will be updated.
+                When rank is None, the cached_data will be used.
+
+        Returns:
+            bool: True if enter[ancestor] <= enter[descendant] <= exit[ancestor].
+        """
+        a = self.get_node_attributes(ancestor, rank)
+        d = self.get_node_attributes(descendant, rank)
+        return bool(0 <= a["dfs_enter"] <= d["dfs_enter"] <= a["dfs_exit"])
+
     def get_gpu_kernels(self, rank: Optional[int] = None) -> pd.DataFrame:
         """Get the GPU kernels for a given rank.
 
@@ -480,6 +846,46 @@ class CallGraph:
             rank (Optional[int]): a rank of the trace data to be searched.
 
         """
-        if rank and rank != self._cached_rank:
+        if rank is not None and rank != self._cached_rank:
             self._update_cached_data(rank)
         return self._cached_gpu_kernels
+
+
+# The suffix of the stack cache files; the version is bumped when the stack columns change.
+STACK_CACHE_FILE_SUFFIX = ".call_stack.v1.npz"
+
+
+def get_trace_fingerprint(trace_file: str) -> str:
+    """Get a fingerprint of a trace file from its path, size and modification time.
+
+    Args:
+        trace_file (str): the path to the trace file.
+
+    Returns:
+        str: a hex digest which changes when the trace file is replaced or modified.
+    """
+    st = os.stat(trace_file)
+    key = f"{os.path.abspath(trace_file)}:{st.st_size}:{st.st_mtime_ns}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _build_stack_columns_for_rank(
+    t: Trace, rank: int
+) -> Tuple[int, pd.DataFrame, pd.DataFrame]:
+    """Compute the stack columns and the call stack mapping of one rank in a worker process.
+
+    Args:
+        t (Trace): the trace shared with the worker processes.
+        rank (int): the rank whose call stacks to be constructed.
+
+    Returns:
+        A tuple of the rank, the stack columns of the rank's trace, and the mapping of the rank's call stacks.
+    """
+    cg = CallGraph(
+        t,
+        ranks=[rank],
+        use_multiprocessing=False,
+        cache_stack_columns=False,
+    )
+    df = cg.trace_data.get_trace(rank)
+    return rank, df[CallGraph.stack_columns], cg.mapping
@@ -1,8 +1,18 @@
-from collections import defaultdict, namedtuple
+from collections import namedtuple
 from dataclasses import dataclass, field
 from functools import cmp_to_key
 from time import perf_counter
-from typing import Callable, Dict, List, NamedTuple, Optional
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import pandas as pd
@@ -167,6 +177,335 @@ class CallStackNode:
     children: List[int] = field(default_factory=lambda: [])
 
 
+class CallStackArrays(Mapping[int, CallStackNode]):
+    """A struct-of-arrays storage for the nodes of one or more CallStackGraph objects.
+
+    Each node is identified by its index, which is the trace event index for trace events and a negative
+    integer for the root nodes. The node attributes are stored in parallel numpy arrays sorted by the node
+    index, and the children of all nodes are stored in a compressed sparse row (CSR) layout, which is rebuilt
+    lazily from the parent array after the graph structure changes.
+
+    For backward compatibility, this class also implements the read-only Mapping interface from node indices
+    to CallStackNode objects. The CallStackNode objects are materialized on access, so modifying them doesn't
+    change the underlying arrays.
+
+    Attributes:
+        ids (np.ndarray) : the sorted node indices.
+        parent (np.ndarray) : the index of the parent of each node.
+        depth (np.ndarray) : the depth of each node.
+        height (np.ndarray) : the height of each node.
+        device (np.ndarray) : the DeviceType value of each node.
+        order (np.ndarray) : the insertion order of each node, which determines the order among siblings.
+
+    The nodes are also numbered by an Euler tour of the forest, which visits the roots in the order of their
+    indices and the children of each node in their insertion order. A node's `enter` number is its pre-order
+    number and its `exit` number is the largest pre-order number in its subtree. Therefore, the subtree of a
+    node occupies a contiguous range of the tour, and a node X is an ancestor of a node Y if and only if
+    enter[X] <= enter[Y] <= exit[X].
+    """
+
+    def __init__(self) -> None:
+        self.ids: np.ndarray = np.empty(0, dtype=np.int64)
+        self.parent: np.ndarray = np.empty(0, dtype=np.int64)
+        self.depth: np.ndarray = np.empty(0, dtype=np.int32)
+        self.height: np.ndarray = np.empty(0, dtype=np.int32)
+        self.device: np.ndarray = np.empty(0, dtype=np.int8)
+        self.order: np.ndarray = np.empty(0, dtype=np.int64)
+        self._next_order: int = 0
+        self._child_offsets: Optional[np.ndarray] = None
+        self._child_positions: Optional[np.ndarray] = None
+        self._parent_positions: Optional[np.ndarray] = None
+        self._tour: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return self.ids.size
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids.tolist())
+
+    def __contains__(self, idx: object) -> bool:
+        try:
+            return self.position(idx) >= 0  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            return False
+
+    def __getitem__(self, idx: int) -> CallStackNode:
+        pos = self.position(idx)
+        if pos < 0:
+            raise KeyError(idx)
+        return CallStackNode(
+            parent=int(self.parent[pos]),
+            depth=int(self.depth[pos]),
+            height=int(self.height[pos]),
+            device=DeviceType(int(self.device[pos])),
+            children=self.get_children(idx).tolist(),
+        )
+
+    def __repr__(self) -> str:
+        return f"CallStackArrays(num_nodes={len(self)})"
+
+    def position(self, idx: int) -> int:
+        """Get the position of node <idx> in the arrays.
+
+        Returns:
+            int: the position of the node; -1 if the node doesn't exist.
+        """
+        pos = int(np.searchsorted(self.ids, idx))
+        if pos < self.ids.size and self.ids[pos] == idx:
+            return pos
+        return -1
+
+    def positions(self, indices: Union[np.ndarray, List[int]]) -> np.ndarray:
+        """Get the positions of the nodes <indices> in the arrays.
+
+        Returns:
+            np.ndarray: the positions of the nodes; -1 for the nodes which don't exist.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        pos = np.searchsorted(self.ids, indices)
+        pos[pos >= self.ids.size] = 0
+        found = self.ids[pos] == indices if self.ids.size > 0 else False
+        return np.where(found, pos, -1)
+
+    def add_nodes(
+        self,
+        indices: Union[np.ndarray, List[int]],
+        parents: Union[np.ndarray, List[int], int],
+        device: Union[np.ndarray, DeviceType],
+        depth: Union[np.ndarray, int] = -1,
+        height: Union[np.ndarray, int] = -1,
+    ) -> np.ndarray:
+        """Add a batch of nodes.
+
+        Args:
+            indices (np.ndarray): the indices of the new nodes.
+            parents (np.ndarray): the indices of the parents of the new nodes.
+            device (np.ndarray): the DeviceType of the new nodes.
+            depth (np.ndarray): the depth of the new nodes.
+            height (np.ndarray): the height of the new nodes.
+
+        Returns:
+            np.ndarray: a boolean mask of the nodes which were added. A node is skipped when it already exists.
+
+        Note:
+            The nodes are appended to the children of their parents in the order given by <indices>.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        n = indices.size
+        if isinstance(device, DeviceType):
+            device = device.value
+
+        def _broadcast(v: Union[np.ndarray, List[int], int], dtype: type) -> np.ndarray:
+            return np.broadcast_to(np.asarray(v, dtype=dtype), (n,))
+
+        is_new = np.zeros(n, dtype=bool)
+        is_new[np.unique(indices, return_index=True)[1]] = True
+        is_new &= self.positions(indices) < 0
+        num_new = int(is_new.sum())
+        if num_new == 0:
+            return is_new
+
+        order = np.arange(self._next_order, self._next_order + num_new, dtype=np.int64)
+        self._next_order += num_new
+        ids = np.concatenate([self.ids, indices[is_new]])
+        sorter = np.argsort(ids, kind="stable")
+        self.ids = ids[sorter]
+        for attr, values, dtype in [
+            ("parent", parents, np.int64),
+            ("depth", depth, np.int32),
+            ("height", height, np.int32),
+            ("device", device, np.int8),
+        ]:
+            arr = getattr(self, attr)
+            new_values = _broadcast(values, dtype)[is_new]
+            setattr(self, attr, np.concatenate([arr, new_values])[sorter])
+        self.order = np.concatenate([self.order, order])[sorter]
+        self._invalidate_children_index()
+        return is_new
+
+    def remove_nodes(self, indices: Union[np.ndarray, List[int]]) -> None:
+        """Remove the nodes <indices> from the storage."""
+        pos = self.positions(indices)
+        pos = pos[pos >= 0]
+        if pos.size == 0:
+            return
+        keep = np.ones(self.ids.size, dtype=bool)
+        keep[pos] = False
+        for attr in ["ids", "parent", "depth", "height", "device", "order"]:
+            setattr(self, attr, getattr(self, attr)[keep])
+        self._invalidate_children_index()
+
+    def set_parent(
+        self, indices: Union[np.ndarray, List[int]], new_parent_index: int
+    ) -> None:
+        """Set the parent of the nodes <indices> to <new_parent_index>.
+
+        The re-attached nodes are placed after the existing children of the new parent.
+        """
+        pos = self.positions(np.unique(np.asarray(indices, dtype=np.int64)))
+        pos = pos[pos >= 0]
+        if pos.size == 0:
+            return
+        self.parent[pos] = new_parent_index
+        self.order[pos] = np.arange(
+            self._next_order, self._next_order + pos.size, dtype=np.int64
+        )
+        self._next_order += pos.size
+        self._invalidate_children_index()
+
+    def set_order(
+        self, indices: Union[np.ndarray, List[int]], order: Union[np.ndarray, List[int]]
+    ) -> None:
+        """Set the sibling order of the nodes <indices>; the nodes which don't exist are skipped."""
+        order = np.asarray(order, dtype=np.int64)
+        pos = self.positions(indices)
+        found = pos >= 0
+        if not found.any():
+            return
+        self.order[pos[found]] = order[found]
+        self._next_order = max(self._next_order, int(order[found].max()) + 1)
+        self._invalidate_children_index()
+
+    def get_children(self, idx: int) -> np.ndarray:
+        """Get the indices of the children of node <idx> in their insertion order."""
+        pos = self.position(idx)
+        if pos < 0:
+            return np.empty(0, dtype=np.int64)
+        offsets, child_positions = self.get_children_index()
+        return self.ids[child_positions[offsets[pos] : offsets[pos + 1]]]
+
+    def get_children_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the CSR children index.
+
+        Returns:
+            A tuple (offsets, child_positions), where the positions of the children of the node at position
+            `i` are stored in `child_positions[offsets[i]:offsets[i + 1]]`.
+        """
+        if self._child_offsets is None or self._child_positions is None:
+            self._build_children_index()
+        assert self._child_offsets is not None and self._child_positions is not None
+        return self._child_offsets, self._child_positions
+
+    def get_parent_positions(self) -> np.ndarray:
+        """Get the position of the parent of each node; -1 for the nodes whose parent doesn't exist."""
+        if self._parent_positions is None:
+            self._build_children_index()
+        assert self._parent_positions is not None
+        return self._parent_positions
+
+    def get_levels(self, root_indices: List[int]) -> List[np.ndarray]:
+        """Traverse the subtrees rooted at <root_indices> level by level.
+
+        Args:
+            root_indices (List[int]): the indices of the root nodes of the subtrees.
+
+        Returns:
+            List[np.ndarray]: the positions of the nodes in the subtrees, where the i-th array contains
+                the nodes at distance i from the roots.
+        """
+        offsets, child_positions = self.get_children_index()
+        frontier = self.positions(root_indices)
+        frontier = np.unique(frontier[frontier >= 0])
+        levels: List[np.ndarray] = []
+        # A tree can't have more levels than nodes; the bound guards against cycles.
+        while frontier.size > 0 and len(levels) <= self.ids.size:
+            levels.append(frontier)
+            starts = offsets[frontier]
+            counts = offsets[frontier + 1] - starts
+            # Gather the children of all nodes in the frontier from the CSR index.
+            gather = np.repeat(starts - np.cumsum(counts) + counts, counts)
+            frontier = child_positions[gather + np.arange(gather.size)]
+        return levels
+
+    def get_euler_tour(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get the Euler tour numbering of the nodes.
+
+        Returns:
+            A tuple (enter, exit, tour), where enter[i] and exit[i] are the pre-order number of the node at
+            position `i` and the largest pre-order number in its subtree, and tour[k] is the position of the
+            node with pre-order number `k`. Nodes which are not reachable from a root have -1 as numbers.
+        """
+        if self._tour is None:
+            self._build_euler_tour()
+        assert self._tour is not None
+        return self._tour
+
+    def get_subtree_positions(self, idx: int) -> np.ndarray:
+        """Get the positions of the nodes in the subtree rooted at node <idx> in pre-order."""
+        pos = self.position(idx)
+        if pos < 0:
+            return np.empty(0, dtype=np.int64)
+        enter, exit_, tour = self.get_euler_tour()
+        if enter[pos] < 0:
+            return np.array([pos], dtype=np.int64)
+        return tour[enter[pos] : exit_[pos] + 1]
+
+    def get_subtree(self, idx: int) -> np.ndarray:
+        """Get the indices of the nodes in the subtree rooted at node <idx> in pre-order."""
+        return self.ids[self.get_subtree_positions(idx)]
+
+    def is_ancestor(self, ancestor: int, descendant: int) -> bool:
+        """Test whether node <ancestor> is an ancestor of node <descendant> or the node itself."""
+        pos_a, pos_d = self.position(ancestor), self.position(descendant)
+        if pos_a < 0 or pos_d < 0:
+            return False
+        enter, exit_, _ = self.get_euler_tour()
+        return bool(enter[pos_a] >= 0 and enter[pos_a] <= enter[pos_d] <= exit_[pos_a])
+
+    def _build_euler_tour(self) -> None:
+        """Number the nodes with an Euler tour using level-by-level passes over the CSR index."""
+        n = self.ids.size
+        parent_pos = self.get_parent_positions()
+        levels = self.get_levels(self.ids[parent_pos < 0].tolist())
+
+        # Compute the subtree sizes bottom-up.
+        size = np.ones(n, dtype=np.int64)
+        for positions in reversed(levels[1:]):
+            np.add.at(size, parent_pos[positions], size[positions])
+
+        # Compute the pre-order numbers top-down. The nodes of a level are grouped by their parents and
+        # ordered as siblings, so a node's subtree starts after its parent and its preceding siblings' subtrees.
+        enter = np.full(n, -1, dtype=np.int64)
+        for level, positions in enumerate(levels):
+            preceding = np.cumsum(size[positions]) - size[positions]
+            if level == 0:
+                enter[positions] = preceding
+                continue
+            parents = parent_pos[positions]
+            is_first = np.ones(positions.size, dtype=bool)
+            is_first[1:] = parents[1:] != parents[:-1]
+            group_start = preceding[is_first][np.cumsum(is_first) - 1]
+            enter[positions] = enter[parents] + 1 + preceding - group_start
+        exit_ = np.where(enter >= 0, enter + size - 1, -1)
+
+        visited = enter >= 0
+        tour = np.empty(int(visited.sum()), dtype=np.int64)
+        tour[enter[visited]] = np.flatnonzero(visited)
+        self._tour = (enter, exit_, tour)
+
+    def _build_children_index(self) -> None:
+        """Build the CSR children index from the parent array."""
+        n = self.ids.size
+        parent_pos = self.positions(self.parent)
+        # A root node whose index equals NULL_NODE_INDEX is its own parent; it isn't its own child.
+        parent_pos[parent_pos == np.arange(n)] = -1
+        self._parent_positions = parent_pos
+        child_pos = np.flatnonzero(parent_pos >= 0)
+        child_pos = child_pos[
+            np.lexsort((self.order[child_pos], parent_pos[child_pos]))
+        ]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(parent_pos[child_pos], minlength=n), out=offsets[1:])
+        self._child_offsets = offsets
+        self._child_positions = child_pos
+
+    def _invalidate_children_index(self) -> None:
+        self._child_offsets = None
+        self._child_positions = None
+        self._parent_positions = None
+        self._tour = None
+
+
 DFSCallback = Callable[[int, CallStackNode], None]
 
 
@@ -177,7 +516,8 @@ class CallStackGraph:
     Attributes:
         identity (CallStackIdentity) : the identity of this CallStackGraph object.
         df (pd.DataFrame) : the dataframe used to construct this CallStackGraph object.
-        nodes (Dict[int, node]): a map from a trace entity's index to a CallStackNode object.
+        nodes (CallStackArrays): the storage of the call stack nodes, which also maps a trace entity's index
+            to a CallStackNode object.
         root_index (int): the index of the root node.
         device_type (DeviceType) : the type of device on which the call stack resides.
         correlations (pd.DataFrame) : a DataFrame that specifies the GPU to CPU correlation.
@@ -199,7 +539,7 @@ class CallStackGraph:
         cpu_gpu_correlation: pd.DataFrame,
         full_df: pd.DataFrame,
         symbol_table: TraceSymbolTable,
-        nodes: Optional[Dict[int, CallStackNode]] = None,
+        nodes: Optional[CallStackArrays] = None,
         use_existing_stack_columns: bool = True,
         save_call_stack_to_df: bool = True,
     ) -> None:
@@ -212,15 +552,15 @@ class CallStackGraph:
                 the `cpu_index` and `gpu_index` columns.
             full_df (pd.DataFrame): The complete DataFrame which contains all relevant trace events.
             symbol_table (TraceSymbolTable): The symbol table which encode the string columns in the Trace DataFrames.
-            nodes (Dict[int, CallStackNode]): Map from node index to CallStackNode object for one rank.
+            nodes (CallStackArrays): The node storage for one rank.
             use_existing_stack_columns (bool): A flag indicating whether constructing the CallGraphObjects from the
                 existing stack columns available in the df. This feature is used to reconstruct the CallStackGraph data
                 after loading a Trace object from its cache file.
             save_call_stack_to_df (bool): A flag indicating whether saving the CallStackGraph into full_df.
 
         Note:
-            By passing a nodes map object to the CallStackGraph constructor, different call stacks can share the same
-            node map so that we can link nodes across different call stacks.
+            By passing a node storage object to the CallStackGraph constructor, different call stacks can share the
+            same nodes so that we can link nodes across different call stacks.
         """
         self.df = df
         self.identity: CallStackIdentity = identity
@@ -231,14 +571,14 @@ class CallStackGraph:
             )
             return
 
-        # Share trace event index to CallStackNode map when the map is passed into the constructor as an argument.
-        self.nodes: Dict[int, CallStackNode] = nodes if nodes is not None else {}
+        # Share the node storage when it is passed into the constructor as an argument.
+        self.nodes: CallStackArrays = nodes if nodes is not None else CallStackArrays()
 
         # Set the index of the root node to a negative integer so that it doesn't collide with the trace event indices.
         self.root_index: int = -abs(identity.tid)
         if self.root_index not in self.nodes:
-            self.nodes[self.root_index] = CallStackNode(
-                NULL_NODE_INDEX, -1, -1, self.device_type, []
+            self.nodes.add_nodes(
+                [self.root_index], NULL_NODE_INDEX, self.device_type, -1, -1
             )
 
         self.correlations: pd.DataFrame = cpu_gpu_correlation
@@ -298,8 +638,8 @@ class CallStackGraph:
             return False
 
         # Test condition #3
-        parents = self.full_df.loc[self.df.index, "parent"].unique()
-        if parents == [-1]:
+        parents = self.full_df.loc[self.df.index, "parent"].to_numpy()
+        if len(parents) == 0 or np.all(parents == -1):
             return False
 
         return True
@@ -307,21 +647,33 @@ class CallStackGraph:
     def _construct_call_stack_graph_from_existing_df(self) -> None:
         """Construct the call stack from the existing stack columns."""
         stack_columns = ["index", "parent", "depth", "height"]
+        cpu_ops = self.full_df.loc[self.df["index"], stack_columns].to_numpy(
+            dtype=np.int64
+        )
+        self.nodes.add_nodes(
+            cpu_ops[:, 0], cpu_ops[:, 1], self.device_type, cpu_ops[:, 2], cpu_ops[:, 3]
+        )
 
-        children: Dict[int, List[int]] = defaultdict(list)
-        for idx, parent in self.full_df.parent.items():
-            children[parent].append(idx)
-
-        for idx, parent, depth, height in self.full_df.loc[self.df["index"]][
-            stack_columns
-        ].values:
-            self.nodes[idx] = CallStackNode(
-                parent=parent,
-                depth=depth,
-                height=height,
-                device=self.device_type,
-                children=children[idx],
-            )
+        # The GPU kernels are the children of their launch events on this thread.
+        kernels = (
+            self.full_df.loc[
+                self.full_df["stream"].ne(-1)
+                & self.full_df["parent"].isin(cpu_ops[:, 0]),
+                stack_columns,
+            ]
+            .dropna()
+            .to_numpy(dtype=np.int64)
+        )
+        self.nodes.add_nodes(
+            kernels[:, 0], kernels[:, 1], DeviceType.GPU, kernels[:, 2], kernels[:, 3]
+        )
+
+        # Restore the sibling order from the saved Euler tour numbering so that the tour is reproduced.
+        if "dfs_enter" in self.full_df.columns:
+            indices = np.concatenate([cpu_ops[:, 0], kernels[:, 0]])
+            enter = self.full_df.loc[indices, "dfs_enter"].to_numpy()
+            valid = ~np.isnan(enter.astype(float)) & (enter >= 0)
+            self.nodes.set_order(indices[valid], enter[valid])
 
     def _construct_call_stack_graph(self, df: pd.DataFrame) -> None:
         """Construct the call stack graph from the trace.
@@ -368,18 +720,26 @@ class CallStackGraph:
         if len(np.unique(events, axis=0)) != len(events):
             logger.error("BUG: the sorted array contains duplicates")
 
+        # Collect the edges in the order of the events' starting time and add them in bulk.
+        children: List[int] = []
+        parents: List[int] = []
+        depths: List[int] = []
         stack: List[int] = []
         for ev_idx, _ev_dur, ev_kind, _ev_ts in events:
             if ev_kind == -1:
-                if len(stack) > 0:
-                    parent_index = stack[-1]
-                else:
-                    parent_index = self.root_index
-                self._add_edge(parent_index, ev_idx)
+                children.append(ev_idx)
+                parents.append(stack[-1] if len(stack) > 0 else self.root_index)
+                depths.append(len(stack))
                 stack.append(ev_idx)
             else:  # e.type == 1
                 if len(stack) > 0:
                     stack.pop(-1)
+        self._add_edges(
+            np.array(parents, dtype=np.int64),
+            np.array(children, dtype=np.int64),
+            DeviceType.CPU,
+            np.array(depths, dtype=np.int32),
+        )
         t2 = perf_counter()
 
         self._link_cpu_and_gpu()
@@ -400,34 +760,70 @@ class CallStackGraph:
             parent_index (int): the index of the parent node.
             child_index (int): the index of the child node.
         """
-        if child_index in self.nodes:
-            # Based on the single thread sequential execution assumption,
-            # a child node should always be added come after its parent node.
-            self._num_errors = self._num_errors + 1
-            if self._num_errors <= 2:
-                logger.error(
-                    f"Error: edge={int(parent_index)}-{int(child_index)}; reason=node {int(child_index)} exists."
-                )
-                logger.error(f"Parent {int(parent_index)}: {self.nodes[parent_index]}")
-                logger.error(f"Children {int(child_index)}: {self.nodes[child_index]}")
-            return
+        self._add_edges(
+            np.array([parent_index], dtype=np.int64),
+            np.array([child_index], dtype=np.int64),
+            device,
+        )
 
-        if parent_index not in self.nodes:
-            # This should only occur for the root node
-            self.nodes[parent_index] = CallStackNode(
-                self.root_index, 0, -1, device, [child_index]
-            )
-        else:
-            self.nodes[parent_index].children.append(child_index)
+    def _add_edges(
+        self,
+        parent_indices: np.ndarray,
+        child_indices: np.ndarray,
+        device: DeviceType = DeviceType.CPU,
+        depths: Optional[np.ndarray] = None,
+    ) -> None:
+        """Add a batch of edges (parent->child) to the graph.
 
-        # The parent node should always exist at this point.
-        self.nodes[child_index] = CallStackNode(
-            parent_index, self.nodes[parent_index].depth + 1, -1, device, []
+        Args:
+            parent_indices (np.ndarray): the indices of the parent nodes.
+            child_indices (np.ndarray): the indices of the child nodes.
+            device (DeviceType): the device type of the child nodes.
+            depths (np.ndarray): the depths of the child nodes.
+                When not provided, a child's depth is its parent's depth + 1.
+        """
+        # Based on the single thread sequential execution assumption,
+        # a child node should always be added come after its parent node.
+        is_new = self.nodes.add_nodes(child_indices, parent_indices, device, -1)
+        if not is_new.all():
+            for child_index, parent_index in zip(
+                child_indices[~is_new], parent_indices[~is_new]
+            ):
+                self._num_errors = self._num_errors + 1
+                if self._num_errors <= 2:
+                    logger.error(
+                        f"Error: edge={int(parent_index)}-{int(child_index)}; reason=node {int(child_index)} exists."
+                    )
+                    if parent_index in self.nodes:
+                        logger.error(
+                            f"Parent {int(parent_index)}: {self.nodes[parent_index]}"
+                        )
+                    logger.error(
+                        f"Children {int(child_index)}: {self.nodes[child_index]}"
+                    )
+            parent_indices = parent_indices[is_new]
+            child_indices = child_indices[is_new]
+            depths = depths[is_new] if depths is not None else None
+
+        # This should only occur for the root node
+        missing_parents = np.unique(
+            parent_indices[self.nodes.positions(parent_indices) < 0]
         )
+        if missing_parents.size > 0:
+            self.nodes.add_nodes(missing_parents, self.root_index, device, 0)
+
+        child_pos = self.nodes.positions(child_indices)
+        if depths is None:
+            depths = self.nodes.depth[self.nodes.positions(parent_indices)] + 1
+        self.nodes.depth[child_pos] = depths
 
     def get_nodes(self) -> Dict[int, CallStackNode]:
-        """Return the nodes of this call stack graph."""
-        return self.nodes
+        """Return the nodes of this call stack graph.
+
+        Returns:
+            A map from the node indices to the CallStackNode objects materialized from the node storage.
+        """
+        return dict(self.nodes)
 
     def update_parent_of_first_layer_nodes(self, new_parent_index: int) -> None:
         """Set the parent of the first layer nodes on call stack to node <new_root_index>.
@@ -448,7 +844,7 @@ class CallStackGraph:
             ["ts", "end"]
         ].to_numpy()[0]
 
-        indices = self.nodes[self.root_index].children
+        indices = self.nodes.get_children(self.root_index)
         guarded_indices = set(
             self.full_df.loc[
                 self.full_df["index"].isin(indices)
@@ -475,23 +871,18 @@ class CallStackGraph:
         # filter out invalid node which are either
         # (1) not in self.nodes or
         # (2) already a child of the new parent
-        valid_indices = set(node_indices).intersection(set(self.nodes)) - set(
-            self.nodes[new_parent_index].children
-        )
-        old_parents = {self.nodes[n].parent for n in valid_indices}
+        indices = np.asarray(node_indices, dtype=np.int64)
+        pos = self.nodes.positions(indices)
+        valid = (pos >= 0) & (self.nodes.parent[pos] != new_parent_index)
+        indices, pos = indices[valid], pos[valid]
+        old_parents = np.unique(self.nodes.parent[pos])
 
         # attach nodes to new parents
-        for idx in valid_indices:
-            self.nodes[idx].parent = new_parent_index
-        self.nodes[new_parent_index].children.extend(valid_indices)
+        self.nodes.set_parent(indices, new_parent_index)
 
         # detach nodes from previous parent
-        for p in old_parents:
-            children_of_p = set(self.nodes[p].children).intersection(valid_indices)
-            for c in children_of_p:
-                self.nodes[p].children.remove(c)
-            if len(self.nodes[p].children) == 0:
-                del self.nodes[p]
+        childless_parents = old_parents[~np.isin(old_parents, self.nodes.parent)]
+        self.nodes.remove_nodes(childless_parents)
 
     def get_parent(self, idx: int) -> int:
         """Return the parent of a given node <idx>""
@@ -502,8 +893,9 @@ class CallStackGraph:
         Returns:
             the index of the parent node; return -2 if node <idx> is not in the graph.
         """
-        if idx in self.nodes:
-            return self.nodes[idx].parent
+        pos = self.nodes.position(idx)
+        if pos >= 0:
+            return int(self.nodes.parent[pos])
 
         logger.error(f"node {idx} is not in current CallStackGraph {self.identity}")
         return NON_EXISTENT_NODE_INDEX
@@ -517,9 +909,7 @@ class CallStackGraph:
         Returns:
             The list of indices of the specified node's children.
         """
-        if idx in self.nodes:
-            return self.nodes[idx].children
-        return []
+        return self.nodes.get_children(idx).tolist()
 
     def get_root(self, idx: int) -> int:
         """Get the root index of the subtree which contains node <idx>
@@ -530,12 +920,16 @@ class CallStackGraph:
         Returns:
             int: the root index
         """
-        if idx not in self.nodes:
+        pos = self.nodes.position(idx)
+        if pos < 0:
             return NULL_NODE_INDEX
 
-        root = self.nodes[idx].parent
-        while root >= 0 and root in self.nodes:
-            idx, root = root, self.nodes[root].parent
+        root = int(self.nodes.parent[pos])
+        while root >= 0:
+            pos = self.nodes.position(root)
+            if pos < 0:
+                break
+            root = int(self.nodes.parent[pos])
         return root
 
     def get_path_to_root(self, idx: int) -> List[int]:
@@ -547,17 +941,15 @@ class CallStackGraph:
         Returns:
             List[int]: the list of ancestors' indices, including the node <idx> itself.
         """
-        if idx not in self.nodes:
+        pos = self.nodes.position(idx)
+        if pos < 0:
             return []
 
         path = [idx]
-        while idx >= 0:
-            if idx in self.nodes:
-                parent = self.nodes[idx].parent
-                path.append(parent)
-                idx = parent
-            else:
-                break
+        while idx >= 0 and pos >= 0:
+            idx = int(self.nodes.parent[pos])
+            path.append(idx)
+            pos = self.nodes.position(idx)
         return path
 
     def get_paths_to_leaves(
@@ -573,25 +965,24 @@ class CallStackGraph:
         Returns:
             List[List[int]]: the list of paths from node <idx> to leaf nodes.
         """
-        paths: List[List[int]] = []
-        curr_path: List[int] = []
-
-        def _dfs(_idx: int) -> None:
-            if _idx not in self.nodes:
-                return
-
-            if not include_cuda_kernel and self.nodes[idx].device != DeviceType.CPU:
-                return
+        if not self._is_valid_subtree_root(idx, include_cuda_kernel):
+            return []
 
-            curr_path.append(_idx)
-            if not self.nodes[_idx].children:
-                paths.append(list(curr_path))
-            else:
-                for child in self.nodes[_idx].children:
-                    _dfs(child)
-            curr_path.pop()
+        enter, exit_, _ = self.nodes.get_euler_tour()
+        offsets, _ = self.nodes.get_children_index()
+        subtree = self.nodes.get_subtree_positions(idx)
+        is_leaf = offsets[subtree + 1] == offsets[subtree]
+        ids = self.nodes.ids
 
-        _dfs(idx)
+        paths: List[List[int]] = []
+        curr_path: List[int] = []
+        # Walk the subtree in pre-order; a node is on the current path until the tour leaves its subtree.
+        for p, leaf in zip(subtree.tolist(), is_leaf.tolist()):
+            while curr_path and enter[p] > exit_[curr_path[-1]]:
+                curr_path.pop()
+            curr_path.append(p)
+            if leaf:
+                paths.append(ids[curr_path].tolist())
         return paths
 
     def get_leaf_nodes(self, idx: int, include_gpu_kernel: bool = False) -> List[int]:
@@ -604,22 +995,50 @@ class CallStackGraph:
         Returns:
             List[int]: the list of leaves nodes on the sub graph with node <idx> as the root.
         """
-        return [path[-1] for path in self.get_paths_to_leaves(idx, include_gpu_kernel)]
+        if not self._is_valid_subtree_root(idx, include_gpu_kernel):
+            return []
+        offsets, _ = self.nodes.get_children_index()
+        subtree = self.nodes.get_subtree_positions(idx)
+        is_leaf = offsets[subtree + 1] == offsets[subtree]
+        return self.nodes.ids[subtree[is_leaf]].tolist()
 
     def get_descendants(self, idx: int, include_gpu_kernel: bool = False) -> List[int]:
-        """Get all leaf nodes on the sub graph with node <idx> as the root.
+        """Get all descendant nodes on the sub graph with node <idx> as the root.
 
         Args:
             idx (int): the index of a given node.
             include_gpu_kernel (bool): should kernel nodes be included in the results.
 
         Returns:
-            List[int]: the list of descendants nodes on the sub graph with node <idx> as the root.
+            List[int]: the list of descendants nodes on the sub graph with node <idx> as the root,
+                including node <idx> itself, in pre-order.
         """
-        descendants = []
-        for path in self.get_paths_to_leaves(idx, include_gpu_kernel):
-            descendants.extend(path)
-        return list(set(descendants))
+        if not self._is_valid_subtree_root(idx, include_gpu_kernel):
+            return []
+        return self.nodes.get_subtree(idx).tolist()
+
+    def is_ancestor(self, ancestor: int, descendant: int) -> bool:
+        """Test whether node <ancestor> is an ancestor of node <descendant> or the node itself.
+
+        Args:
+            ancestor (int): the index of the candidate ancestor.
+            descendant (int): the index of the candidate descendant.
+
+        Returns:
+            bool: True if node <descendant> is in the subtree rooted at node <ancestor>.
+        """
+        return self.nodes.is_ancestor(ancestor, descendant)
+
+    def _is_valid_subtree_root(self, idx: int, include_gpu_kernel: bool) -> bool:
+        """Test whether the subtree queries from node <idx> return a non-empty result.
+
+        Note: the GPU kernels are included in the subtree of a CPU node regardless of <include_gpu_kernel>;
+        the flag only controls whether a GPU kernel itself can be the root of a query.
+        """
+        pos = self.nodes.position(idx)
+        if pos < 0:
+            return False
+        return include_gpu_kernel or self.nodes.device[pos] == DeviceType.CPU.value
 
     def get_dataframe(self) -> pd.DataFrame:
         """Get the trace dataframe for this CallStackGraph object."""
@@ -627,7 +1046,28 @@ class CallStackGraph:
 
     def _get_all_root_indices(self) -> List[int]:
         """Get all root indices of the CallGraph's CallStackGraph objects."""
-        return [idx for idx in self.nodes if idx < 0 and idx != NON_EXISTENT_NODE_INDEX]
+        ids = self.nodes.ids
+        return ids[(ids < 0) & (ids != NON_EXISTENT_NODE_INDEX)].tolist()
+
+    def _get_traversal_levels(
+        self, root_index: Optional[int], apply_whole_graph: bool
+    ) -> List[np.ndarray]:
+        """Get the nodes of the subgraph rooted at <root_index> or of the whole graph level by level.
+
+        Args:
+            root_index (int): The index of the root node. If it is None, use the root of current stack.
+            apply_whole_graph (bool): Whether to traverse the subgraphs of all roots.
+
+        Returns:
+            List[np.ndarray]: the positions of the nodes in self.nodes grouped by their distance to the roots.
+        """
+        if apply_whole_graph:
+            root_indices = self._get_all_root_indices()
+        else:
+            root_indices = [self.root_index if root_index is None else root_index]
+            if root_indices[0] not in self.nodes:
+                logger.error(f"invalid root node index {root_indices[0]}")
+        return self.nodes.get_levels(root_indices)
 
     def _compute_depth(
         self, root_index: Optional[int] = None, apply_whole_graph: bool = False
@@ -641,25 +1081,11 @@ class CallStackGraph:
                 whole graph only once.
 
         A node's depth is the maximum length of the path from the node to the root.
-        The depth of the root is 0.
+        The depth of the root is -1.
         """
-
-        def _bfs(_idx: int, parent_depth: int) -> None:
-            """Compute the depth of node <idx> and its descendants"""
-            if _idx in self.nodes:
-                node = self.nodes[_idx]
-                node.depth = parent_depth + 1
-                for c in node.children:
-                    _bfs(c, node.depth)
-            else:
-                logger.error(f"_compute_depth::_bfs: invalid node index {_idx}")
-
-        if not apply_whole_graph:
-            root_idx = self.root_index if root_index is None else root_index
-            _bfs(root_idx, -2)
-        else:
-            for root_idx in self._get_all_root_indices():
-                _bfs(root_idx, -2)
+        levels = self._get_traversal_levels(root_index, apply_whole_graph)
+        for level, positions in enumerate(levels):
+            self.nodes.depth[positions] = level - 1
 
     def _compute_height(
         self, root_index: Optional[int] = None, apply_whole_graph: bool = False
@@ -669,36 +1095,20 @@ class CallStackGraph:
         A node's height is the maximum length of the path from a GPU kernel to the node.
         The height of a GPU kernel is 0.
         """
-
-        def _dfs(idx: int) -> int:
-            """Compute the height of node <idx>
-
-            Args:
-                idx: the index of a node
-            Returns:
-                the height of the node <idx>
-            """
-            if idx in self.nodes:
-                node = self.nodes[idx]
-                if node.device == DeviceType.GPU:
-                    node.height = 0
-                else:
-                    h = 1
-                    for c in node.children:
-                        h_c = _dfs(c) + 1
-                        h = h_c if h_c > h else h
-                    node.height = h
-                return node.height
-            else:
-                logger.error(f"_compute_height::_dfs: invalid node index {idx}")
-                return -1
-
-        if not apply_whole_graph:
-            root_idx = root_index if root_index else self.root_index
-            _dfs(root_idx)
-        else:
-            for root_idx in self._get_all_root_indices():
-                _dfs(root_idx)
+        levels = self._get_traversal_levels(root_index, apply_whole_graph)
+        if len(levels) == 0:
+            return
+        height = self.nodes.height
+        is_gpu = self.nodes.device == DeviceType.GPU.value
+        parent_pos = self.nodes.get_parent_positions()
+
+        visited = np.concatenate(levels)
+        height[visited] = np.where(is_gpu[visited], 0, 1)
+        # Reduce the heights bottom-up; all children of a node are one level below it.
+        for positions in reversed(levels[1:]):
+            parents = parent_pos[positions]
+            to_cpu = ~is_gpu[parents]
+            np.maximum.at(height, parents[to_cpu], height[positions[to_cpu]] + 1)
 
     def _save_call_stack_to_df(self) -> None:
         """Save the call stack data into the data frame for quick search."""
@@ -708,36 +1118,16 @@ class CallStackGraph:
             logger.warning("full_df doesn't have required column `parent`.")
             return
         t0 = perf_counter()
-        parent = pd.Series(
-            {idx: node.parent for idx, node in self.nodes.items() if idx >= 0},
-            name="parent",
-            dtype=pd.Int64Dtype(),
-            copy=True,
-        )
-
-        depth = pd.Series(
-            data={idx: node.depth for idx, node in self.nodes.items() if idx >= 0},
-            name="depth",
-            dtype=pd.Int16Dtype(),
-            copy=True,
-        )
-
-        height = pd.Series(
-            data={idx: node.height for idx, node in self.nodes.items() if idx >= 0},
-            name="height",
-            dtype=pd.Int16Dtype(),
-            copy=True,
-        )
-
-        self.full_df.loc[parent.index, "parent"] = parent.astype(
-            self.full_df.dtypes["height"]
-        )
-        self.full_df.loc[depth.index, "depth"] = depth.astype(
-            self.full_df.dtypes["height"]
-        )
-        self.full_df.loc[height.index, "height"] = height.astype(
-            self.full_df.dtypes["height"]
-        )
+        is_event = self.nodes.ids >= 0
+        indices = self.nodes.ids[is_event]
+        dtype = self.full_df.dtypes["height"]
+        self.full_df.loc[indices, "parent"] = self.nodes.parent[is_event].astype(dtype)
+        self.full_df.loc[indices, "depth"] = self.nodes.depth[is_event].astype(dtype)
+        self.full_df.loc[indices, "height"] = self.nodes.height[is_event].astype(dtype)
+        if {"dfs_enter", "dfs_exit"}.issubset(self.full_df.columns):
+            enter, exit_, _ = self.nodes.get_euler_tour()
+            self.full_df.loc[indices, "dfs_enter"] = enter[is_event]
+            self.full_df.loc[indices, "dfs_exit"] = exit_[is_event]
 
         t1 = perf_counter()
         logger.debug(f"added call stack information in {t1 - t0:.2}s")
@@ -751,8 +1141,10 @@ class CallStackGraph:
         if "depth" in self.full_df:
             return self.full_df.loc[self.df["index"]]["depth"]
         else:
+            is_event = self.nodes.ids >= 0
             return pd.Series(
-                data={idx: node.depth for idx, node in self.nodes.items() if idx >= 0},
+                data=self.nodes.depth[is_event],
+                index=self.nodes.ids[is_event],
                 name="depth",
                 dtype=pd.Int16Dtype(),
                 copy=True,
@@ -760,12 +1152,11 @@ class CallStackGraph:
 
     def _link_cpu_and_gpu(self) -> None:
         """Add an edge from cuda_launch to gpu kernel"""
-        correlations: List[List[int]] = self.correlations[
+        correlations: np.ndarray = self.correlations[
             self.correlations["cpu_index"].isin(self.df["index"])
-        ][["cpu_index", "gpu_index"]].values.tolist()
+        ][["cpu_index", "gpu_index"]].to_numpy(dtype=np.int64)
 
-        for cpu_index, gpu_index in correlations:
-            self._add_edge(cpu_index, gpu_index, DeviceType.GPU)
+        self._add_edges(correlations[:, 0], correlations[:, 1], DeviceType.GPU)
 
     def _add_kernel_info_to_cpu_ops(
         self, root_index: Optional[int] = None, apply_whole_graph: bool = False
@@ -780,88 +1171,78 @@ class CallStackGraph:
             logger.warning("full_df doesn't have stack columns such `num_kernels`.")
             return
 
-        # extract nodes data
-        ops: pd.DataFrame = self.full_df.loc[self.full_df["index"].isin(self.nodes)]
-        gpu_kernels = ops.loc[ops.stream.ne(-1)][["ts", "dur", "end"]]
-        s_start: Dict[int, int] = gpu_kernels["ts"]
-        s_end: Dict[int, int] = gpu_kernels["end"]
-        s_dur: Dict[int, int] = gpu_kernels["dur"]
-
-        t1 = perf_counter()
-        KernelInfo = namedtuple(
-            "KernelInfo", "count sum_dur kernel_span first_start last_end"
-        )
-        kernel_info: Dict[int, KernelInfo] = {}
-
-        t_max: int = self.full_df["ts"].max() * 2
-
-        def _dfs(idx: int) -> KernelInfo:
-            if idx not in self.nodes:
-                return KernelInfo(0, 0, 0, t_max, -1)
-            node: CallStackNode = self.nodes[idx]
-            # node is a GPU kernel
-            if node.device == DeviceType.GPU:
-                if idx in s_start:
-                    start = s_start[idx]
-                    end = s_end[idx]
-                    sum_dur = s_dur[idx]
-                    kernel_info[idx] = KernelInfo(1, sum_dur, end - start, start, end)
-                    return KernelInfo(1, sum_dur, end - start, start, end)
-                else:
-                    logger.error(f"unknown kernel (index={idx})")
-                    return KernelInfo(0, 0, 0, t_max, -1)
-
-            # node is a CPU op
-            count, sum_dur, span, start, end = 0, 0, 0, t_max, -1
-
-            for c in node.children:
-                c_info = _dfs(c)
-                count = count + c_info.count
-                sum_dur = sum_dur + c_info.sum_dur
-                start = min(start, c_info.first_start)
-                end = max(end, c_info.last_end)
-                span = end - start
-
-            if idx >= 0:  # skip the root node
-                kernel_info[idx] = KernelInfo(count, sum_dur, span, start, end)
-            return KernelInfo(count, sum_dur, span, start, end)
-
-        # traverse all nodes
         if not apply_whole_graph:
             root_index = self.root_index if root_index is None else root_index
             if (
                 root_index not in self.nodes
-                or len(self.nodes[root_index].children) == 0
+                or self.nodes.get_children(root_index).size == 0
             ):
                 logger.warning(f"CallStackGraph {self.identity} is empty.")
                 return
-            _dfs(root_index)
-        else:
-            for root_idx in self._get_all_root_indices():
-                _dfs(root_idx)
+        levels = self._get_traversal_levels(root_index, apply_whole_graph)
+        if len(levels) == 0:
+            logger.error("df_info is empty.")
+            return
+        visited = np.concatenate(levels)
+
+        # extract the kernels' data
+        n = len(self.nodes)
+        is_gpu = self.nodes.device == DeviceType.GPU.value
+        gpu_pos = visited[is_gpu[visited]]
+        kernels = self.full_df.loc[
+            self.full_df["stream"].ne(-1), ["ts", "dur", "end"]
+        ].reindex(self.nodes.ids[gpu_pos])
+        is_known = kernels["ts"].notna().to_numpy()
+        if not is_known.all():
+            unknown = self.nodes.ids[gpu_pos[~is_known]]
+            logger.error(f"unknown kernels (index={unknown[:10].tolist()})")
+        kernel_pos = gpu_pos[is_known]
+        kernels = kernels.loc[is_known].to_numpy(dtype=np.int64)
+
+        t1 = perf_counter()
+        t_max: int = self.full_df["ts"].max() * 2
+        count = np.zeros(n, dtype=np.int64)
+        sum_dur = np.zeros(n, dtype=np.int64)
+        first_start = np.full(n, t_max, dtype=np.int64)
+        last_end = np.full(n, -1, dtype=np.int64)
+        count[kernel_pos] = 1
+        first_start[kernel_pos] = kernels[:, 0]
+        sum_dur[kernel_pos] = kernels[:, 1]
+        last_end[kernel_pos] = kernels[:, 2]
+
+        # Reduce the kernel information bottom-up to the cpu operators.
+        parent_pos = self.nodes.get_parent_positions()
+        for positions in reversed(levels[1:]):
+            parents = parent_pos[positions]
+            np.add.at(count, parents, count[positions])
+            np.add.at(sum_dur, parents, sum_dur[positions])
+            np.minimum.at(first_start, parents, first_start[positions])
+            np.maximum.at(last_end, parents, last_end[positions])
+
+        offsets, _ = self.nodes.get_children_index()
+        has_children = offsets[1:] > offsets[:-1]
+        span = np.where(is_gpu | has_children, last_end - first_start, 0)
         t2 = perf_counter()
 
-        # add information to the data frame
-        df_info = pd.DataFrame.from_dict(kernel_info, orient="index")
-        df_info = df_info.loc[df_info.index >= 0]
-        if df_info.empty:
+        # add information to the data frame; skip the root nodes and the unknown kernels
+        is_valid = (self.nodes.ids[visited] >= 0) & (
+            ~is_gpu[visited] | np.isin(visited, kernel_pos)
+        )
+        info_pos = visited[is_valid]
+        if info_pos.size == 0:
             logger.error("df_info is empty.")
             return
-        self.full_df.loc[df_info.index, "num_kernels"] = df_info["count"].astype(
-            self.full_df.dtypes["num_kernels"]
-        )
-        self.full_df.loc[df_info.index, "kernel_dur_sum"] = df_info["sum_dur"].astype(
-            self.full_df.dtypes["kernel_dur_sum"]
-        )
-        self.full_df.loc[df_info.index, "kernel_span"] = df_info["kernel_span"].astype(
-            self.full_df.dtypes["kernel_span"]
-        )
-        self.full_df.loc[df_info.index, "first_kernel_start"] = df_info[
-            "first_start"
-        ].astype(self.full_df.dtypes["first_kernel_start"])
-        self.full_df.loc[df_info.index, "last_kernel_end"] = df_info["last_end"].astype(
-            self.full_df.dtypes["last_kernel_end"]
-        )
+        info_index = self.nodes.ids[info_pos]
+        for col, values in [
+            ("num_kernels", count),
+            ("kernel_dur_sum", sum_dur),
+            ("kernel_span", span),
+            ("first_kernel_start", first_start),
+            ("last_kernel_end", last_end),
+        ]:
+            self.full_df.loc[info_index, col] = values[info_pos].astype(
+                self.full_df.dtypes[col]
+            )
 
         t3 = perf_counter()
         logger.debug(
@@ -877,12 +1258,21 @@ class CallStackGraph:
     def _dfs_traverse_node(
         self, node_id: int, enter_func: DFSCallback, exit_func: DFSCallback
     ) -> None:
-        node = self.nodes[node_id]
-        enter_func(node_id, node)
-
-        all_nodes = self.nodes.keys()
-        for child_nid in node.children:
-            if child_nid in all_nodes:
-                self._dfs_traverse_node(child_nid, enter_func, exit_func)
-
-        exit_func(node_id, node)
+        """Traverse the subtree rooted at <node_id> in depth first order without recursion."""
+        offsets, child_positions = self.nodes.get_children_index()
+        ids = self.nodes.ids
+
+        # Each stack entry is (node_id, node, entered); a node is exited after all its children.
+        stack: List[Tuple[int, CallStackNode, bool]] = [
+            (node_id, self.nodes[node_id], False)
+        ]
+        while stack:
+            nid, node, entered = stack.pop()
+            if entered:
+                exit_func(nid, node)
+                continue
+            enter_func(nid, node)
+            stack.append((nid, node, True))
+            pos = self.nodes.position(nid)
+            for c in ids[child_positions[offsets[pos] : offsets[pos + 1]][::-1]]:
+                stack.append((int(c), self.nodes[c], False))
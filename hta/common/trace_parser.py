@@ -9,6 +9,7 @@ import io
 import json
 import math
 import os
+import re
 import time
 import tracemalloc
 from collections.abc import Generator
@@ -121,6 +122,159 @@ def _open_trace_file(trace_file_path: str) -> io.BufferedIOBase:
     )
 
 
+def parse_trace_dict_items(
+    trace_file_path: str,
+) -> Generator[Tuple[str, Any], None, None]:
+    """
+    Lazily parse the top level items of a raw trace file in file order.
+
+    Args:
+        trace_file_path (str) : the path to a trace file.
+
+    Yields:
+        (key, value) pairs of the trace dictionary. The value of "traceEvents" is a
+        generator that parses one event at a time, it has to be consumed before the
+        next item is requested; any remaining events are skipped. The file is parsed
+        with ijson when it is available, else with _parse_trace_dict_items_json().
+    """
+    try:
+        import ijson
+    except ModuleNotFoundError:
+        yield from _parse_trace_dict_items_json(trace_file_path)
+        return
+
+    def build_value(parser: Generator, event: str, value: Any) -> Any:
+        """Builds the json value starting with the given parser event."""
+        builder = ijson.ObjectBuilder()
+        builder.event(event, value)
+        depth = 1 if event in ["start_map", "start_array"] else 0
+        while depth > 0:
+            _, event, value = next(parser)
+            builder.event(event, value)
+            if event in ["start_map", "start_array"]:
+                depth += 1
+            elif event in ["end_map", "end_array"]:
+                depth -= 1
+        return builder.value
+
+    def iter_array(parser: Generator) -> Generator[Any, None, None]:
+        """Yields the elements of the json array starting at the next parser event."""
+        _, event, value = next(parser)
+        if event != "start_array":
+            raise ValueError(f"expected an array in {trace_file_path}, got {event}")
+        for _, event, value in parser:
+            if event == "end_array":
+                return
+            yield build_value(parser, event, value)
+
+    with _open_trace_file(trace_file_path) as fh:
+        parser = ijson.parse(fh, use_float=True)
+        for prefix, event, value in parser:
+            if prefix != "" or event != "map_key":
+                continue
+            if value == "traceEvents":
+                events = iter_array(parser)
+                yield value, events
+                for _ in events:
+                    pass
+            else:
+                _, next_event, next_value = next(parser)
+                yield value, build_value(parser, next_event, next_value)
+
+
+# Number of characters read at a time by _parse_trace_dict_items_json()
+_JSON_STREAM_CHUNK_SIZE: int = 1 << 20
+_JSON_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+
+
+def _parse_trace_dict_items_json(
+    trace_file_path: str,
+) -> Generator[Tuple[str, Any], None, None]:
+    """
+    Lazily parse the top level items of a raw trace file with the json module,
+    see parse_trace_dict_items().
+
+    The file is read in chunks and each top level value or trace event is
+    decoded with json.JSONDecoder.raw_decode() once it is complete in the buffer.
+    """
+    decoder = json.JSONDecoder()
+    with io.TextIOWrapper(_open_trace_file(trace_file_path), encoding="utf-8") as fh:
+        buf, pos, eof = "", 0, False
+
+        def fill() -> None:
+            """Reads more of the file, dropping the parsed part of the buffer."""
+            nonlocal buf, pos, eof
+            if eof:
+                raise ValueError(f"unexpected end of {trace_file_path}")
+            # Grow the reads with the buffer to decode large values in linear time
+            chunk = fh.read(max(_JSON_STREAM_CHUNK_SIZE, len(buf) - pos))
+            eof = chunk == ""
+            buf, pos = buf[pos:] + chunk, 0
+
+        def next_char() -> str:
+            """Skips whitespace and returns the next character without consuming it."""
+            nonlocal pos
+            while True:
+                pos = _JSON_WHITESPACE_RE.match(buf, pos).end()
+                if pos < len(buf):
+                    return buf[pos]
+                fill()
+
+        def expect(chars: str) -> str:
+            """Consumes the next character, which must be one of chars."""
+            nonlocal pos
+            c = next_char()
+            if c not in chars:
+                raise ValueError(
+                    f"expected one of {chars!r} in {trace_file_path}, got {c!r}"
+                )
+            pos += 1
+            return c
+
+        def decode() -> Any:
+            """Decodes the next json value."""
+            nonlocal pos
+            next_char()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                    # A number may continue in the next chunk
+                    if end < len(buf) or eof:
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+
+        def iter_array() -> Generator[Any, None, None]:
+            """Yields the elements of the json array starting at the next character."""
+            expect("[")
+            if next_char() == "]":
+                expect("]")
+                return
+            while True:
+                yield decode()
+                if expect(",]") == "]":
+                    return
+
+        expect("{")
+        if next_char() == "}":
+            return
+        while True:
+            key = decode()
+            expect(":")
+            if key == "traceEvents" and next_char() == "[":
+                events = iter_array()
+                yield key, events
+                for _ in events:
+                    pass
+            else:
+                yield key, decode()
+            if expect(",}") == "}":
+                return
+
+
 # @profile
 def _parse_trace_events_ijson(trace_file_path: str) -> pd.DataFrame:
     """
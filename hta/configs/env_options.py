@@ -18,6 +18,9 @@ HTA_DISABLE_NS_ROUNDING_ENV = "HTA_DISABLE_NS_ROUNDING"
 # Disable adding CG depth in hta/common/call_stack.py
 HTA_DISABLE_CG_DEPTH_ENV = "HTA_DISABLE_CG_DEPTH"
 
+# Save and reload the call stack columns in hta/common/trace_call_graph.py using stack cache files.
+HTA_CACHE_CALL_STACK_COLUMNS_ENV = "HTA_CACHE_CALL_STACK_COLUMNS"
+
 # -- Critical path analysis --
 # Add zero weight launch edges for causality.
 CP_LAUNCH_EDGE_ENV = "CRITICAL_PATH_ADD_ZERO_WEIGHT_LAUNCH_EDGE"
@@ -26,6 +29,8 @@ CP_LAUNCH_EDGE_SHOW_ENV = "CRITICAL_PATH_SHOW_ZERO_WEIGHT_LAUNCH_EDGE"
 
 # Fail when edges have negative weight, rather than correcting them to 0
 CP_STRICT_NEG_WEIGHT_CHECK_ENV = "CRITICAL_PATH_STRICT_NEGATIVE_WEIGHT_CHECKS"
+# Skip graph validation checks that do not fix up the graph: sync edges on the same stream and cycles.
+CP_FAST_VALIDATION_ENV = "CRITICAL_PATH_FAST_VALIDATION"
 
 
 def _get_env(name: str) -> Optional[str]:
@@ -48,6 +53,10 @@ def disable_call_graph_depth() -> bool:
     return _check_env_flag(HTA_DISABLE_CG_DEPTH_ENV, "0")
 
 
+def cache_call_stack_columns() -> bool:
+    return _check_env_flag(HTA_CACHE_CALL_STACK_COLUMNS_ENV, "0")
+
+
 def critical_path_add_zero_weight_launch_edges() -> bool:
     return _check_env_flag(CP_LAUNCH_EDGE_ENV, "0")
 
@@ -60,6 +69,10 @@ def critical_path_strict_negative_weight_check() -> bool:
     return _check_env_flag(CP_STRICT_NEG_WEIGHT_CHECK_ENV, "0")
 
 
+def critical_path_fast_validation() -> bool:
+    return _check_env_flag(CP_FAST_VALIDATION_ENV, "0")
+
+
 def get_options() -> str:
     def get_env(name: str) -> str:
         return _get_env(name) or "unset"
@@ -67,7 +80,9 @@ def get_options() -> str:
     return f"""
 disable_ns_rounding={disable_ns_rounding()}, HTA_DISABLE_NS_ROUNDING_ENV={get_env(HTA_DISABLE_NS_ROUNDING_ENV)}
 disable_call_graph_depth={disable_call_graph_depth()}, HTA_DISABLE_CG_DEPTH_ENV={get_env(HTA_DISABLE_CG_DEPTH_ENV)}
+cache_call_stack_columns={cache_call_stack_columns()}, HTA_CACHE_CALL_STACK_COLUMNS_ENV={get_env(HTA_CACHE_CALL_STACK_COLUMNS_ENV)}
 critical_path_add_zero_weight_launch_edges={critical_path_add_zero_weight_launch_edges()}, CP_LAUNCH_EDGE_ENV={get_env(CP_LAUNCH_EDGE_ENV)}
 critical_path_show_zero_weight_launch_edges={critical_path_show_zero_weight_launch_edges()}, CP_LAUNCH_EDGE_SHOW_ENV={get_env(CP_LAUNCH_EDGE_SHOW_ENV)}
 critical_path_strict_negative_weight_check={critical_path_strict_negative_weight_check()}, CP_STRICT_NEG_WEIGHT_CHECK_ENV={get_env(CP_STRICT_NEG_WEIGHT_CHECK_ENV)}
+critical_path_fast_validation={critical_path_fast_validation()}, CP_FAST_VALIDATION_ENV={get_env(CP_FAST_VALIDATION_ENV)}
 """
@@ -17,9 +17,23 @@ from hta.analyzers.straggler import find_stragglers_with_late_start_comm_kernels
 from hta.analyzers.straggler_analysis import StragglerAnalysis
 from hta.analyzers.trace_counters import TraceCounters
 from hta.common.constants import CUDA_MAX_LAUNCH_QUEUE_PER_STREAM
-from hta.common.trace import Trace
+from hta.common.trace import JSONFragment, Trace
 from hta.configs.config import logger
 from hta.configs.default_values import DEFAULT_TRACE_DIR
+from hta.utils.utils import map_ranks
+
+
+def _write_trace_with_counters(
+    t: Trace,
+    rank: int,
+    output_files: Dict[int, str],
+    counter_events: Dict[int, List[JSONFragment]],
+    compresslevel: int,
+) -> None:
+    """Worker function for TraceAnalysis.generate_trace_with_counters()."""
+    t.write_raw_trace_with_events(
+        rank, output_files[rank], counter_events[rank], compresslevel=compresslevel
+    )
 
 
 class TimeSeriesTypes(Flag):
@@ -120,6 +134,7 @@ class TraceAnalysis:
         num_kernels: int = 10,
         include_memory_kernels: bool = True,
         image_renderer: str = "",
+        use_multiprocessing: Optional[bool] = None,
     ) -> Tuple[pd.DataFrame, pd.DataFrame]:
         r"""
         Summarizes the time spent by each kernel and by kernel type. Outputs the following graphs:
@@ -136,6 +151,8 @@ class TraceAnalysis:
             include_memory_kernels (bool): Whether to include MEMORY kernels in the analysis. Default = True.
             image_renderer (str): Set to ``notebook`` when using jupyter and ``jupyterlab`` when using jupyter-lab.
                 To see all available options execute: ``import plotly; plotly.io.renderers`` in a python shell.
+            use_multiprocessing (bool): Analyze the ranks in parallel. Default = None, see
+                hta.utils.utils.map_ranks().
 
         Returns:
             Tuple[pd.DataFrame, pd.DataFrame]
@@ -153,6 +170,7 @@ class TraceAnalysis:
             num_kernels,
             include_memory_kernels,
             image_renderer,
+            use_multiprocessing,
         )
 
     def get_gpu_kernels_with_user_annotations(
@@ -193,6 +211,7 @@ class TraceAnalysis:
         num_kernels: int = 1000,
         allowlist_patterns: Optional[List[str]] = None,
         image_renderer: Optional[str] = None,
+        use_multiprocessing: Optional[bool] = None,
     ) -> Optional[pd.DataFrame]:
         r"""
         Summarizes the time spent by each GPU user annotation. Outputs the following graphs:
@@ -209,6 +228,8 @@ class TraceAnalysis:
             allowlist_patterns (list(str)): if user annotations match any of the patterns in this list, they will not be aggregated into "other" catgory. This argument is meant to keep some events as distinct in the aggregation. Supports strings as well as regular expressions.
             image_renderer (str): Set to ``notebook`` when using jupyter and ``jupyterlab`` when using jupyter-lab.
                 To see all available options execute: ``import plotly; plotly.io.renderers`` in a python shell.
+            use_multiprocessing (bool): Analyze the ranks in parallel. Default = None, see
+                hta.utils.utils.map_ranks().
 
         Returns:
             Optional[pd.DataFrame]
@@ -227,9 +248,12 @@ class TraceAnalysis:
             num_kernels,
             allowlist_patterns,
             image_renderer,
+            use_multiprocessing,
         )
 
-    def get_temporal_breakdown(self, visualize: bool = True) -> pd.DataFrame:
+    def get_temporal_breakdown(
+        self, visualize: bool = True, use_multiprocessing: Optional[bool] = None
+    ) -> pd.DataFrame:
         r"""
         Compute the idle time, compute time and non-compute time for each rank. Time is measured in
         nanoseconds (ns). non-compute time is defined as the total time the GPU is not executing a
@@ -239,13 +263,17 @@ class TraceAnalysis:
 
         Args:
             visualize (bool): Set to True to display the graphs. Default = True.
+            use_multiprocessing (bool): Analyze the ranks in parallel. Default = None, see
+                hta.utils.utils.map_ranks().
 
         Returns:
             pd.DataFrame
                 A dataframe containing the raw value and percentage of idle time, compute time and non-compute
                 time for each rank.
         """
-        return BreakdownAnalysis.get_temporal_breakdown(self.t, visualize)
+        return BreakdownAnalysis.get_temporal_breakdown(
+            self.t, visualize, use_multiprocessing
+        )
 
     def get_frequent_cuda_kernel_sequences(
         self,
@@ -342,10 +370,16 @@ class TraceAnalysis:
         time_series: Optional[TimeSeriesTypes] = None,
         ranks: Optional[List[int]] = None,
         output_suffix: str = "_with_counters",
+        max_points: Optional[int] = None,
+        downsample_method: str = "max",
+        compresslevel: int = 6,
+        use_multiprocessing: Optional[bool] = None,
     ) -> None:
         r"""
         Adds a set of time series to the trace in order to aid debugging traces. Creates a new trace file
-        for each requested rank with the a suffix '_with_counters.json'. The following time series are
+        for each requested rank with the a suffix '_with_counters.json'. The raw trace of every rank is
+        streamed to the new file as compact json with the counter events appended to its trace events,
+        and the ranks are written in parallel. The following time series are
         available in TimeSeriesTypes flag type.
 
         1. Queue length - adds a time series to the trace indicating the size of the queue at any given time on each CUDA stream.
@@ -359,6 +393,14 @@ class TraceAnalysis:
                 both time series are added to the trace.
             ranks (List[int]): List of ranks to generate the counters for. Default = [0].
             output_suffix (str): Suffix to add to the trace file. Default = '_with_counters.json.gz'
+            max_points (int): Optional maximum number of counter events per series. When set, the
+                time series are downsampled with TraceCounters.downsample_time_series() to bound the
+                size of the trace. Default = None (one counter event per change of value).
+            downsample_method (str): Downsampling method, one of "max", "mean" or "minmax".
+                Default = "max".
+            compresslevel (int): gzip compression level of the trace files from 0 to 9. Default = 6.
+            use_multiprocessing (bool): Compute the time series and write the trace files of the
+                ranks in a process pool. Default = None, see hta.utils.utils.map_ranks().
 
         Returns:
             None
@@ -371,48 +413,74 @@ class TraceAnalysis:
                 TimeSeriesTypes.QUEUE_LENGTH | TimeSeriesTypes.MEMCPY_BANDWIDTH
             )
 
-        counter_events: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        counter_events: Dict[int, List[JSONFragment]] = defaultdict(list)
         if output_suffix == "":
             output_suffix = "_with_counters"
 
         def add_time_series(
-            series_dict: Dict[int, pd.DataFrame], counter_name: str, counter_col: str
+            series_dict: Dict[int, pd.DataFrame],
+            counter_name: str,
+            counter_col: str,
+            series_cols: List[str],
         ):
             nonlocal counter_events
             """accept a rank -> time series dict and append it"""
             for rank, series in series_dict.items():
+                if max_points is not None:
+                    series = TraceCounters.downsample_time_series(
+                        series,
+                        counter_col,
+                        series_cols,
+                        max_points=max_points,
+                        method=downsample_method,
+                    )
                 if "stream" in series.columns:
                     series.rename(columns={"stream": "id"}, inplace=True)
-                ce = self.t.convert_time_series_to_events(
+                ce = self.t.convert_time_series_to_json_events(
                     series, counter_name, counter_col
                 )
                 counter_events[rank].extend(ce)
 
         if TimeSeriesTypes.QUEUE_LENGTH in time_series:
             add_time_series(
-                series_dict=TraceCounters.get_queue_length_time_series(self.t, ranks),
+                series_dict=TraceCounters.get_queue_length_time_series(
+                    self.t, ranks, use_multiprocessing
+                ),
                 counter_name="Queue Length",
                 counter_col="queue_length",
+                series_cols=["stream"],
             )
         if TimeSeriesTypes.MEMCPY_BANDWIDTH in time_series:
             add_time_series(
-                series_dict=TraceCounters.get_memory_bw_time_series(self.t, ranks),
+                series_dict=TraceCounters.get_memory_bw_time_series(
+                    self.t, ranks, use_multiprocessing
+                ),
                 counter_name="Memcpy BW",
                 counter_col="memory_bw_gbps",
+                series_cols=["name"],
             )
 
-        for rank, ev_list in counter_events.items():
-            raw_trace_content = self.t.get_raw_trace_for_one_rank(rank=rank)
-            raw_trace_content["traceEvents"].extend(ev_list)
-            output_file = self.t.trace_files[rank].replace(
+        output_files: Dict[int, str] = {}
+        for rank in counter_events:
+            output_files[rank] = self.t.trace_files[rank].replace(
                 ".json", f"{output_suffix}.json"
             )
-            logger.info(f"Writing trace with counters for rank {rank} to {output_file}")
-            self.t.write_raw_trace(output_file, raw_trace_content)
+            logger.info(
+                f"Writing trace with counters for rank {rank} to {output_files[rank]}"
+            )
+
+        map_ranks(
+            self.t,
+            _write_trace_with_counters,
+            list(output_files),
+            (output_files, counter_events, compresslevel),
+            use_multiprocessing,
+        )
 
     def get_queue_length_summary(
         self,
         ranks: Optional[List[int]] = None,
+        use_multiprocessing: Optional[bool] = None,
     ) -> Optional[pd.DataFrame]:
         r"""
         Queue length is defined as the number of outstanding CUDA operations on a stream. This
@@ -421,6 +489,8 @@ class TraceAnalysis:
 
         Args:
             ranks (List[int]): List of ranks for which to queue length summary is calculated. Default = [0].
+            use_multiprocessing (bool): Compute the queue length of the ranks in parallel.
+                Default = None, see hta.utils.utils.map_ranks().
 
         Returns:
             pd.DataFrame or None
@@ -428,7 +498,9 @@ class TraceAnalysis:
                 min, max, standard deviation, 25th, 50th and 75th percentiles.
                 The function returns None when the dataframe is empty.
         """
-        return TraceCounters.get_queue_length_summary(self.t, ranks)
+        return TraceCounters.get_queue_length_summary(
+            self.t, ranks, use_multiprocessing
+        )
 
     def get_queue_length_summary_from_time_series(
         self,
@@ -456,6 +528,7 @@ class TraceAnalysis:
     def get_queue_length_time_series(
         self,
         ranks: Optional[List[int]] = None,
+        use_multiprocessing: Optional[bool] = None,
     ) -> Dict[int, pd.DataFrame]:
         r"""
         Queue length is defined as the number of outstanding CUDA operations on a stream. This
@@ -464,6 +537,8 @@ class TraceAnalysis:
 
         Args:
             ranks (List[int]): List of ranks for which the queue length time series is generated. Default = [0].
+            use_multiprocessing (bool): Compute the queue length of the ranks in parallel.
+                Default = None, see hta.utils.utils.map_ranks().
 
         Returns:
             Dict[int, pd.DataFrame]
@@ -471,7 +546,9 @@ class TraceAnalysis:
                 counter events. The following fields are in each row of the dataframe: ts (timestamp), pid (process id),
                 tid (thread id), stream, and queue length.
         """
-        return TraceCounters.get_queue_length_time_series(self.t, ranks)
+        return TraceCounters.get_queue_length_time_series(
+            self.t, ranks, use_multiprocessing
+        )
 
     def get_time_spent_blocked_on_full_queue(
         self,
@@ -509,6 +586,7 @@ class TraceAnalysis:
     def get_memory_bw_summary(
         self,
         ranks: Optional[List[int]] = None,
+        use_multiprocessing: Optional[bool] = None,
     ) -> pd.DataFrame:
         r"""
         Summarizes the memory bandwidth statistics for memory copy and memset operations. This includes memory
@@ -517,6 +595,8 @@ class TraceAnalysis:
 
         Args:
             ranks (List[int]): List of ranks for which memory bandwidth is calculated. Default = [0].
+            use_multiprocessing (bool): Compute the memory bandwidth time series of the ranks in parallel.
+                Default = None, see hta.utils.utils.map_ranks().
 
         Returns:
             pd.DataFrame or None
@@ -524,11 +604,12 @@ class TraceAnalysis:
                 25th, 50th and 75th percentiles of memory copy/memset operations.
                 The function returns None when the dataframe is empty.
         """
-        return TraceCounters.get_memory_bw_summary(self.t, ranks)
+        return TraceCounters.get_memory_bw_summary(self.t, ranks, use_multiprocessing)
 
     def get_memory_bw_time_series(
         self,
         ranks: Optional[List[int]] = None,
+        use_multiprocessing: Optional[bool] = None,
     ) -> Dict[int, pd.DataFrame]:
         r"""
         Calculates the time series for memory copy bandwidth used by memcpy and memset operations in GB/s. The
@@ -537,6 +618,8 @@ class TraceAnalysis:
 
         Args:
             ranks (List[int]): List of ranks for which the memory bandwidth time series is generated. Default = [0].
+            use_multiprocessing (bool): Compute the memory bandwidth of the ranks in parallel.
+                Default = None, see hta.utils.utils.map_ranks().
 
         Returns:
             Dict[int, pd.DataFrame]
@@ -544,7 +627,9 @@ class TraceAnalysis:
                 counter events. The following fields are in each row of the dataframe: ts (timestamp), pid (process id),
                 tid (thread id), name (memcpy/memset), and memory bandwidth in GB/s.
         """
-        return TraceCounters.get_memory_bw_time_series(self.t, ranks)
+        return TraceCounters.get_memory_bw_time_series(
+            self.t, ranks, use_multiprocessing
+        )
 
     def get_idle_time_breakdown(
         self,
@@ -567,9 +652,11 @@ class TraceAnalysis:
            kernel could be waiting for a CUDA event from a communication kernel to complete.
 
         Args:
-            ranks (List[int]): List of ranks for which idle time breakdown is computed. Default = [0].
+            ranks (List[int]): List of ranks for which idle time breakdown is computed. All the ranks
+                are analyzed together in a single pass, e.g. pass ``analyzer.t.get_ranks()`` for a
+                report on every rank. Default = [0].
             streams (List[int]): List of streams to provide analysis for. Defaults to all streams.
-            visualize (bool): Set to True to show the graph. Default = True.
+            visualize (bool): Set to True to show one graph per rank. Default = True.
             visualize_pctg (bool): Show relative percentage across streams. Default = True.
             show_idle_interval_stats (bool): Returns statistics of the idle intervals like the min, max
                and median of idle intervals between kernels on a CUDA stream, also broken down by
@@ -587,25 +674,14 @@ class TraceAnalysis:
         if ranks is None or len(ranks) == 0:
             ranks = [0]
 
-        idle_time_df_list: List[pd.DataFrame] = []
-        interval_df_list: List[pd.DataFrame] = []
-        for rank in ranks:
-            idle_time_r_df, interval_r_df = BreakdownAnalysis.get_idle_time_breakdown(
-                self.t,
-                consecutive_kernel_delay,
-                rank,
-                streams,
-                visualize,
-                visualize_pctg,
-                show_idle_interval_stats,
-            )
-            idle_time_df_list.append(idle_time_r_df)
-            if interval_r_df is not None:
-                interval_df_list.append(interval_r_df)
-
-        return (
-            pd.concat(idle_time_df_list),
-            pd.concat(interval_df_list) if show_idle_interval_stats else None,
+        return BreakdownAnalysis.get_idle_time_breakdown_for_ranks(
+            self.t,
+            consecutive_kernel_delay,
+            ranks,
+            streams,
+            visualize,
+            visualize_pctg,
+            show_idle_interval_stats,
         )
 
     def get_cupti_counter_data_with_operators(
@@ -644,6 +720,7 @@ class TraceAnalysis:
         rank: int,
         annotation: str,
         instance_id: Union[Optional[int], Tuple[int, int]],
+        use_networkx: bool = True,
     ) -> Tuple[CPGraph, bool]:
         r"""
         Perform critical path analysis for trace events within a rank.
@@ -666,6 +743,9 @@ class TraceAnalysis:
                         Defaults to the first instance.
                 (Tuple(int, int)) - considers a range of annotation instances start to end,
                         inclusive of both start and end instance.
+            use_networkx (bool): if False, the critical path graph is kept in numpy
+                arrays and the longest path is computed without networkx. This is
+                faster for large traces. Default is True.
         Returns:
             Tuple[CPGraph, bool]
                 A tuple of CPGraph object and a success or fail boolean value.
@@ -684,7 +764,40 @@ class TraceAnalysis:
            Please see the documentation of this PR on how to enable CUDA sync events in the trace.
         """
         return CriticalPathAnalysis.critical_path_analysis(
-            self.t, rank, annotation, instance_id
+            self.t, rank, annotation, instance_id, use_networkx
+        )
+
+    def batch_critical_path_analysis(
+        self,
+        annotation: str,
+        rank_instances: Optional[List[Tuple[int, Optional[int]]]] = None,
+        use_networkx: bool = True,
+        use_multiprocessing: Optional[bool] = None,
+    ) -> pd.DataFrame:
+        r"""
+        Perform critical path analysis for many instances of an annotation, for
+        example for every iteration on all ranks by passing annotation='ProfilerStep'.
+        This is faster than calling critical_path_analysis() for each instance as the
+        per rank preprocessing is shared and the instances are analyzed in parallel.
+
+        Args:
+            annotation (str): a trace annotation to limit the analysis to, see
+                critical_path_analysis().
+            rank_instances (List[Tuple[int, Optional[int]]]): list of (rank, instance_id)
+                pairs to analyze. Defaults to all instances of the annotation on all ranks.
+            use_networkx (bool): if False, the critical path graphs are kept in numpy
+                arrays and the longest path is computed without networkx. Default is True.
+            use_multiprocessing (bool): analyze the instances in parallel. Default is None,
+                see hta.utils.utils.map_ranks().
+
+        Returns:
+            pd.DataFrame
+                A summary with one row per (rank, instance_id) pair containing a success
+                flag, the duration of the critical path and the % of the duration
+                bounded by each resource, see CPGraph.summary().
+        """
+        return CriticalPathAnalysis.batch_critical_path_analysis(
+            self.t, annotation, rank_instances, use_networkx, use_multiprocessing
         )
 
     def overlay_critical_path_analysis(
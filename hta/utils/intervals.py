@@ -0,0 +1,321 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Interval algebra on numpy arrays of start and end times.
+
+A set of intervals is given by two arrays ``starts`` and ``ends`` of the same
+length, the i-th interval being [starts[i], ends[i]). The functions below accept
+intervals in any order and possibly overlapping; they return disjoint intervals
+sorted by start time. Touching intervals such as [0, 1) and [1, 2) are merged.
+"""
+
+import heapq
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+Intervals = Tuple[np.ndarray, np.ndarray]
+
+
+def union_intervals(starts: np.ndarray, ends: np.ndarray) -> Intervals:
+    """
+    Merge intervals such that there are no overlapping intervals.
+
+    Args:
+        starts (np.ndarray): start times of the intervals.
+        ends (np.ndarray): end times of the intervals.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]
+            start and end times of the disjoint intervals sorted by start time.
+    """
+    starts, ends = np.asarray(starts), np.asarray(ends)
+    if len(starts) == 0:
+        return starts.copy(), ends.copy()
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], np.maximum.accumulate(ends[order])
+    # An interval starts a new group if it starts after all previous intervals end.
+    group_starts = np.flatnonzero(np.r_[True, starts[1:] > ends[:-1]])
+    group_ends = np.r_[group_starts[1:] - 1, len(starts) - 1]
+    return starts[group_starts], ends[group_ends]
+
+
+def sweep_intervals(
+    starts: np.ndarray, ends: np.ndarray, weights: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sweep over the boundaries of the intervals and compute the sum of the weights
+    of the intervals covering each segment between two consecutive boundaries.
+
+    Args:
+        starts (np.ndarray): start times of the intervals.
+        ends (np.ndarray): end times of the intervals.
+        weights (np.ndarray): weight of each interval. Default = 1 for every interval.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]
+            the sorted unique boundary times and the weighted count for the
+            segment starting at each boundary time. The count after the last
+            boundary is always 0.
+    """
+    starts, ends = np.asarray(starts), np.asarray(ends)
+    if weights is None:
+        weights = np.ones(len(starts), dtype=np.int64)
+    times = np.concatenate([starts, ends])
+    deltas = np.concatenate([weights, -np.asarray(weights)])
+    order = np.argsort(times, kind="stable")
+    times, counts = times[order], np.cumsum(deltas[order])
+    if len(times) == 0:
+        return times, counts
+    # Keep the count after the last change at every boundary time.
+    last = np.r_[times[1:] != times[:-1], True]
+    return times[last], counts[last]
+
+
+def _select_segments(times: np.ndarray, selected: np.ndarray) -> Intervals:
+    """Union of the segments [times[i], times[i + 1]) with selected[i] set."""
+    selected = np.flatnonzero(selected[:-1])
+    return union_intervals(times[selected], times[selected + 1])
+
+
+def intersect_intervals(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    other_starts: np.ndarray,
+    other_ends: np.ndarray,
+) -> Intervals:
+    """
+    Intersection of two sets of intervals.
+
+    Args:
+        starts, ends (np.ndarray): start and end times of the first set of intervals.
+        other_starts, other_ends (np.ndarray): start and end times of the second set.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]
+            start and end times of the time ranges covered by both sets.
+    """
+    times, labels = _sweep_two_sets(starts, ends, other_starts, other_ends)
+    return _select_segments(times, labels == 3)
+
+
+def subtract_intervals(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    other_starts: np.ndarray,
+    other_ends: np.ndarray,
+) -> Intervals:
+    """
+    Difference of two sets of intervals.
+
+    Args:
+        starts, ends (np.ndarray): start and end times of the first set of intervals.
+        other_starts, other_ends (np.ndarray): start and end times of the second set.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]
+            start and end times of the time ranges covered by the first set
+            but not by the second set.
+    """
+    times, labels = _sweep_two_sets(starts, ends, other_starts, other_ends)
+    return _select_segments(times, labels == 1)
+
+
+def _sweep_two_sets(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    other_starts: np.ndarray,
+    other_ends: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Sweep over two sets of intervals labeled with the bits 1 and 2."""
+    return sweep_labeled_intervals(
+        np.concatenate([starts, other_starts]),
+        np.concatenate([ends, other_ends]),
+        np.repeat([0, 1], [len(starts), len(other_starts)]),
+    )
+
+
+def interval_coverage(starts: np.ndarray, ends: np.ndarray) -> float:
+    """
+    Total time covered by the intervals, counting overlapping time ranges once.
+
+    Args:
+        starts (np.ndarray): start times of the intervals.
+        ends (np.ndarray): end times of the intervals.
+
+    Returns:
+        The total length of the union of the intervals.
+    """
+    starts, ends = union_intervals(starts, ends)
+    # differences of end - ts are commutative
+    return ends.sum() - starts.sum()
+
+
+def sweep_labeled_intervals(
+    starts: np.ndarray, ends: np.ndarray, labels: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sweep over intervals labeled with small non negative integers and compute the
+    set of labels covering each segment between two consecutive boundaries.
+
+    Args:
+        starts (np.ndarray): start times of the intervals.
+        ends (np.ndarray): end times of the intervals.
+        labels (np.ndarray): label of each interval, less than 63.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]
+            the sorted unique boundary times and, for the segment starting at each
+            boundary time, a bit mask with bit (1 << label) set for every label
+            of the intervals covering it.
+    """
+    starts, ends = np.asarray(starts), np.asarray(ends)
+    labels = np.asarray(labels, dtype=np.int64)
+    merged_starts, merged_ends, bits = [starts[:0]], [ends[:0]], [labels[:0]]
+    # Intervals with the same label are merged so the sum of the bits is a bit mask.
+    for label in np.unique(labels):
+        s, e = union_intervals(starts[labels == label], ends[labels == label])
+        merged_starts.append(s)
+        merged_ends.append(e)
+        bits.append(np.full(len(s), 1 << int(label), dtype=np.int64))
+    return sweep_intervals(
+        np.concatenate(merged_starts),
+        np.concatenate(merged_ends),
+        np.concatenate(bits),
+    )
+
+
+def overlap_by_label(
+    starts: np.ndarray, ends: np.ndarray, labels: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Total time covered by every combination of labels.
+
+    Args:
+        starts (np.ndarray): start times of the intervals.
+        ends (np.ndarray): end times of the intervals.
+        labels (np.ndarray): label of each interval, less than 63.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]
+            the sorted bit masks of the combinations of labels covering some time,
+            see sweep_labeled_intervals(), and the time covered by exactly the
+            labels in each combination.
+    """
+    times, masks = sweep_labeled_intervals(starts, ends, labels)
+    durations = np.diff(times)
+    masks = masks[:-1]
+    covered = masks > 0
+    unique_masks, inverse = np.unique(masks[covered], return_inverse=True)
+    totals = np.zeros(len(unique_masks), dtype=durations.dtype)
+    np.add.at(totals, inverse, durations[covered])
+    return unique_masks, totals
+
+
+def _range_max(values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Returns max(values[lo[i] : hi[i] + 1]) for every i using a sparse table,
+    or -1 for empty ranges."""
+    result = np.full(len(lo), -1, dtype=np.int64)
+    valid = lo <= hi
+    lo, hi = lo[valid], hi[valid]
+    if len(lo) == 0:
+        return result
+    level = np.log2(hi - lo + 1).astype(np.int64)
+    # table[k][i] = max(values[i : i + 2 ** k])
+    table = [np.asarray(values, dtype=np.int64)]
+    for k in range(1, level.max() + 1):
+        prev, half = table[-1], 1 << (k - 1)
+        table.append(np.maximum(prev[:-half], prev[half:]))
+    range_max = np.empty(len(lo), dtype=np.int64)
+    for k in np.unique(level):
+        sel = level == k
+        range_max[sel] = np.maximum(
+            table[k][lo[sel]], table[k][hi[sel] - (1 << int(k)) + 1]
+        )
+    result[valid] = range_max
+    return result
+
+
+def max_priority_overlaps(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    priorities: np.ndarray,
+    query_starts: np.ndarray,
+    query_ends: np.ndarray,
+) -> np.ndarray:
+    """
+    Find for each query interval the overlapping interval with the highest priority.
+
+    Two intervals [a, b) and [c, d) overlap if a < d and c < b, the same as
+    pandas.IntervalIndex.overlaps() for intervals closed on the left. The intervals
+    are swept once keeping the active ones in a heap, and the queries are answered
+    with range maximum queries over the segments between interval boundaries.
+
+    Args:
+        starts (np.ndarray): start times of the intervals.
+        ends (np.ndarray): end times of the intervals, ends >= starts.
+        priorities (np.ndarray): priority of each interval, ties are broken
+            in favor of the interval that comes last.
+        query_starts (np.ndarray): start times of the query intervals.
+        query_ends (np.ndarray): end times of the query intervals, query_ends >= query_starts.
+
+    Returns:
+        np.ndarray
+            the index of the overlapping interval with the highest priority for
+            every query interval, -1 if a query interval overlaps no interval.
+    """
+    starts, ends = np.asarray(starts), np.asarray(ends)
+    query_starts, query_ends = np.asarray(query_starts), np.asarray(query_ends)
+    if len(starts) == 0:
+        return np.full(len(query_starts), -1, dtype=np.int64)
+    # Replace the priorities by unique ranks, the result is mapped back at the end.
+    by_priority = np.argsort(priorities, kind="stable")
+    rank = np.empty(len(starts), dtype=np.int64)
+    rank[by_priority] = np.arange(len(starts))
+
+    bounds = np.unique(np.concatenate([starts, ends]))
+    start_pos = np.searchsorted(bounds, starts)
+    end_pos = np.searchsorted(bounds, ends)
+
+    # Sweep over the bounds, segment_max[j] is the highest rank of the intervals
+    # covering [bounds[j], bounds[j + 1]) and spanning_max[j] is the highest rank
+    # of the intervals with start < bounds[j] < end.
+    segment_max = np.full(len(bounds), -1, dtype=np.int64)
+    spanning_max = np.full(len(bounds), -1, dtype=np.int64)
+    heap: List[Tuple[int, int]] = []
+    by_start = np.argsort(start_pos, kind="stable").tolist()
+    start_pos_list, end_pos_list = start_pos.tolist(), end_pos.tolist()
+    rank_list = rank.tolist()
+    i = 0
+    for j in range(len(bounds)):
+        while heap and heap[0][1] <= j:
+            heapq.heappop(heap)
+        spanning_max[j] = -heap[0][0] if heap else -1
+        while i < len(by_start) and start_pos_list[by_start[i]] == j:
+            idx = by_start[i]
+            if end_pos_list[idx] > j:
+                heapq.heappush(heap, (-rank_list[idx], end_pos_list[idx]))
+            i += 1
+        segment_max[j] = -heap[0][0] if heap else -1
+
+    # Queries overlap the segments between their start and end, a zero length
+    # query at a bound only overlaps the intervals spanning that bound.
+    first_segment = np.searchsorted(bounds[1:], query_starts, side="right")
+    last_segment = np.searchsorted(bounds, query_ends, side="left") - 1
+    result = _range_max(segment_max, first_segment, last_segment)
+    at_bound = np.searchsorted(bounds, query_starts)
+    at_bound = (query_starts == query_ends) & (
+        bounds[np.minimum(at_bound, len(bounds) - 1)] == query_starts
+    )
+    result[at_bound] = spanning_max[np.searchsorted(bounds, query_starts[at_bound])]
+
+    # Zero length intervals overlap the queries with start < point < end.
+    points = np.flatnonzero(starts == ends)
+    if len(points) > 0:
+        points = points[np.argsort(starts[points], kind="stable")]
+        first_point = np.searchsorted(starts[points], query_starts, side="right")
+        last_point = np.searchsorted(starts[points], query_ends, side="left") - 1
+        result = np.maximum(result, _range_max(rank[points], first_point, last_point))
+
+    return np.where(result >= 0, by_priority[np.maximum(result, 0)], -1)
@@ -4,13 +4,21 @@
 
 import multiprocessing as mp
 import re
+import sys
+import threading
 from enum import Enum
 from pathlib import Path
-from typing import Any, List, Tuple
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TYPE_CHECKING
 
 import pandas as pd
 import psutil
 from hta.configs.config import logger
+from hta.utils.intervals import union_intervals
+
+# import statement used without the "if TYPE_CHECKING" guard will cause a circular
+# dependency with trace.py.
+if TYPE_CHECKING:
+    from hta.common.trace import Trace
 
 
 class KernelType(Enum):
@@ -131,17 +139,9 @@ def merge_kernel_intervals(kernel_df: pd.DataFrame) -> pd.DataFrame:
     """
     Merge all kernel intervals in the given dataframe such that there are no overlapping.
     """
-    kernel_df.sort_values(by="ts", inplace=True)
-    kernel_df["end"] = kernel_df["ts"] + kernel_df["dur"]
-    # Operators within the same group need to be merged together to form a larger interval.
-    kernel_df["group"] = (kernel_df["ts"] > kernel_df["end"].shift().cummax()).cumsum()
-    kernel_df = (
-        kernel_df.groupby("group", as_index=False)
-        .agg({"ts": "min", "end": "max"})
-        .drop(["group"], axis=1)
-        .sort_values(by="ts")
-    )
-    return kernel_df
+    starts = kernel_df["ts"].to_numpy()
+    starts, ends = union_intervals(starts, starts + kernel_df["dur"].to_numpy())
+    return pd.DataFrame({"ts": starts, "end": ends})
 
 
 def shorten_name(name: str) -> str:
@@ -200,6 +200,90 @@ def get_mp_pool_size(obj_size: int, num_objs: int) -> int:
     return min(max_np, num_objs, mp.cpu_count())
 
 
+# The trace, function and arguments shared with the worker processes of map_ranks()
+_map_ranks_state: Optional[Tuple["Trace", Callable[..., Any], Tuple[Any, ...]]] = None
+
+
+def _map_ranks_worker(rank: Any) -> Any:
+    """Worker function for map_ranks()."""
+    assert _map_ranks_state is not None
+    t, func, args = _map_ranks_state
+    return func(t, rank, *args)
+
+
+def can_fork_workers() -> bool:
+    """
+    Check if worker processes can be created with the fork start method.
+
+    Returns:
+        bool
+            False on platforms without fork (Windows) or where forking a process
+            with threads is unsafe (macOS), and inside daemonic worker processes
+            which cannot have children.
+    """
+    return (
+        "fork" in mp.get_all_start_methods()
+        and sys.platform != "darwin"
+        and not mp.current_process().daemon
+    )
+
+
+# The minimum number of ranks computed in parallel by map_ranks() by default.
+MAP_RANKS_MIN_PARALLEL_RANKS: int = 8
+
+
+def map_ranks(
+    t: "Trace",
+    func: Callable[..., Any],
+    ranks: Sequence[Any],
+    args: Tuple[Any, ...] = (),
+    use_multiprocessing: Optional[bool] = None,
+) -> List[Any]:
+    """
+    Compute func(t, rank, *args) for every rank, optionally in a pool of forked processes.
+
+    The worker processes inherit the trace, the function and its arguments from the
+    parent process instead of receiving them pickled, only the results are pickled.
+    The ranks are computed serially when use_multiprocessing is False, there is at
+    most one rank, or fork is not available, see can_fork_workers().
+
+    Forking copies only the calling thread, so by default the ranks are computed in
+    parallel only when there are at least MAP_RANKS_MIN_PARALLEL_RANKS ranks and the
+    process has no other threads. Interactive kernels such as Jupyter run background
+    threads and therefore compute serially unless the caller opts in.
+
+    Args:
+        t (Trace): the trace shared with the worker processes.
+        func (Callable): the per rank function.
+        ranks (Sequence[Any]): the ranks, or other per rank work items such as
+            (rank, instance) pairs, passed as the second argument of func.
+        args (Tuple[Any, ...]): additional arguments of func.
+        use_multiprocessing (bool): compute the ranks in a process pool. Default =
+            None, which decides from the number of ranks and threads as above.
+
+    Returns:
+        List[Any]
+            the results in the order of ranks.
+    """
+    global _map_ranks_state
+    if use_multiprocessing is None:
+        use_multiprocessing = (
+            len(ranks) >= MAP_RANKS_MIN_PARALLEL_RANKS and threading.active_count() == 1
+        )
+    if not use_multiprocessing or len(ranks) <= 1 or not can_fork_workers():
+        return [func(t, rank, *args) for rank in ranks]
+
+    num_procs = min(mp.cpu_count(), len(ranks))
+    logger.debug(f"Computing {len(ranks)} ranks using {num_procs} processes")
+    _map_ranks_state = (t, func, args)
+    try:
+        with mp.get_context("fork").Pool(num_procs) as pool:
+            return pool.map(_map_ranks_worker, ranks, chunksize=1)
+    finally:
+        # Release the trace held for the workers.
+        _map_ranks_state = None
+
+
 def get_symbol_column_names(df: pd.DataFrame) -> Tuple[str, str]:
     """Get the proper column names for the `name` and `cat` attributes of string type in the DataFrame.
 
@@ -1,19 +1,31 @@
 import gzip
 import json
 import os
+import time
 import unittest
 from collections import Counter
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from typing import Tuple
+from unittest.mock import patch
 
 import hta.configs.env_options as hta_options
+import networkx as nx
+import numpy as np
+import pandas as pd
 from hta.analyzers.critical_path_analysis import (
+    _dfs_traverse_call_stack,
+    bound_by,
     CPEdge,
+    CPEdgeArrays,
+    CPEdgeScaling,
     CPEdgeType,
+    CPGraph,
+    CPNodeArrays,
     CriticalPathAnalysis,
     restore_cpgraph,
 )
+from hta.common.trace_call_graph import CallGraph
 from hta.common.trace_parser import (
     _auto_detect_parser_backend,
     get_default_trace_parsing_backend,
@@ -63,6 +75,11 @@ class CriticalPathAnalysisTestCase(unittest.TestCase):
         )
         self.assertTrue(success)
 
+        # The clipped trace shares the symbol table with the full trace
+        self.assertEqual(list(cp_graph.t.get_all_traces().keys()), [0])
+        self.assertIs(cp_graph.t.symbol_table, critical_path_t.t.symbol_table)
+        self.assertLess(len(cp_graph.trace_df), len(critical_path_t.t.get_trace(0)))
+
         trace_df = critical_path_t.t.get_trace(0)
         sym_table = critical_path_t.t.symbol_table.get_sym_table()
 
@@ -436,6 +453,18 @@ class CriticalPathAnalysisTestCase(unittest.TestCase):
             rank=0, annotation=annotation, instance_id=instance_id
         )
         self.assertTrue(success)
+        self.assertEqual(len(cp_graph.edges), 85)
+
+        # Kernels starting with their launch count the launch in the queue first,
+        # else a kernel_launch_delay edge is added
+        with patch.dict(os.environ, {hta_options.CP_LAUNCH_EDGE_ENV: "0"}):
+            graph_without_launch_edges, success = (
+                critical_path_t.critical_path_analysis(
+                    rank=0, annotation=annotation, instance_id=instance_id
+                )
+            )
+        self.assertTrue(success)
+        self.assertEqual(len(graph_without_launch_edges.edges), 82)
 
         # The trace contains the following
         # 1. GPU kernel 1 (correlation = 27)  stream = 20
@@ -460,6 +489,11 @@ class CriticalPathAnalysisTestCase(unittest.TestCase):
         self.assertEqual(
             event_records[2]["correlation_launch_event"], correlation_kernel1
         )
+        self.assertEqual(event_record_df.index_previous_launch.tolist(), [26, 56, 26])
+
+        # The cudaStreamWaitEvent should be followed by the launch of kernel 3
+        stream_wait_event_df = cp_graph._get_cuda_stream_wait_event_df()
+        self.assertEqual(stream_wait_event_df.index_next_launch.to_dict(), {70: 86})
 
         # Check that sync edge is added
         kernel1_idx = 24  # ampere_sgemm_128x64_nn
@@ -510,6 +544,9 @@ class CriticalPathAnalysisTestCase(unittest.TestCase):
 
         # Check the boundby column is populated
         self.assertEqual(edf.bound_by.isnull().sum() + edf.bound_by.isna().sum(), 0)
+        self.assertEqual(edf.bound_by.tolist(), edf.apply(bound_by, axis=1).tolist())
+        # The breakdown does not decode the symbols in the trace dataframe
+        self.assertNotIn("s_name", cp_graph.trace_df)
 
         # Check Save and Restore functionality
         zip_file = cp_graph.save(out_dir="/tmp/my_saved_cp_graph")
@@ -538,6 +575,382 @@ class CriticalPathAnalysisTestCase(unittest.TestCase):
             len(rest_graph.critical_path_edges_set), orig_num_critical_edges
         )
 
+    def test_critical_path_save_restore_binary(self):
+        annotation = "[param|pytorch.model.alex_net|0|0|0|measure|forward]"
+        instance_id = 1
+        rank = 0
+
+        critical_path_t = self.alexnet_trace
+        cp_graph, success = critical_path_t.critical_path_analysis(
+            rank=rank, annotation=annotation, instance_id=instance_id
+        )
+        self.assertTrue(success)
+
+        with TemporaryDirectory() as tmpdir:
+            path = cp_graph.save_binary(os.path.join(tmpdir, "cp_graph.bin"))
+            self.assertEqual(os.listdir(tmpdir), ["cp_graph.bin"])
+            rest_graph = restore_cpgraph(
+                zip_filename=path, t_full=critical_path_t.t, rank=rank
+            )
+
+        # The restored graph is array backed until the networkx graph is built
+        self.assertFalse(rest_graph.use_networkx)
+        self.assertEqual(len(rest_graph.edges), 0)
+        self.assertEqual(rest_graph.node_list, cp_graph.node_list)
+        self.assertEqual(set(rest_graph.get_all_edges()), set(cp_graph.get_all_edges()))
+        rest_graph.build_networkx_graph()
+        self.assertTrue(rest_graph.use_networkx)
+        self.assertEqual(
+            sorted(rest_graph.edges(data="weight")),
+            sorted(cp_graph.edges(data="weight")),
+        )
+        self.assertEqual(rest_graph.critical_path_nodes, cp_graph.critical_path_nodes)
+        self.assertEqual(
+            rest_graph.critical_path_edges_set, cp_graph.critical_path_edges_set
+        )
+        self.assertEqual(
+            rest_graph.critical_path_events_set, cp_graph.critical_path_events_set
+        )
+        self.assertEqual(rest_graph.edge_to_event_map, cp_graph.edge_to_event_map)
+        self.assertEqual(
+            rest_graph.event_to_start_node_map, cp_graph.event_to_start_node_map
+        )
+        self.assertEqual(
+            rest_graph.event_to_end_node_map, cp_graph.event_to_end_node_map
+        )
+        pd.testing.assert_frame_equal(rest_graph.trace_df, cp_graph.trace_df)
+        rest_edf, edf = (
+            df.sort_values(list(df.columns)).reset_index(drop=True)
+            for df in (
+                rest_graph.get_critical_path_breakdown(),
+                cp_graph.get_critical_path_breakdown(),
+            )
+        )
+        pd.testing.assert_frame_equal(rest_edf, edf)
+
+        # run critical path algorithm again
+        self.assertTrue(rest_graph.critical_path())
+        self.assertEqual(rest_graph.critical_path_nodes, cp_graph.critical_path_nodes)
+
+    def test_critical_path_save_restore_binary_object_columns(self):
+        annotation = "[param|pytorch.model.alex_net|0|0|0|measure|forward]"
+        critical_path_t = self.alexnet_trace
+        cp_graph, success = critical_path_t.critical_path_analysis(
+            rank=0, annotation=annotation, instance_id=1
+        )
+        self.assertTrue(success)
+
+        def repeat(values):
+            return (values * len(cp_graph.trace_df))[: len(cp_graph.trace_df)]
+
+        trace_df = cp_graph.trace_df.assign(
+            mixed=repeat([1, "1", True, 1.0, None, "a"]),
+            with_nan=repeat(["x", np.nan, 2.5]),
+            nullable=pd.array(repeat([1, None, 3]), dtype="Int64"),
+            strings=pd.array(repeat(["a", None]), dtype="string"),
+        )
+        with TemporaryDirectory() as tmpdir:
+            cp_graph.trace_df = trace_df
+            path = cp_graph.save_binary(os.path.join(tmpdir, "cp_graph.bin"))
+            rest_graph = restore_cpgraph(
+                zip_filename=path, t_full=critical_path_t.t, rank=0
+            )
+            pd.testing.assert_frame_equal(rest_graph.trace_df, trace_df)
+            self.assertEqual(
+                [type(v) for v in rest_graph.trace_df["mixed"].iloc[:6]],
+                [int, str, bool, float, type(None), str],
+            )
+
+            # Values that cannot be stored are refused
+            for values in ([(1, 2)], ["a", None, np.nan]):
+                cp_graph.trace_df = trace_df.assign(bad=repeat(values))
+                with self.assertRaisesRegex(ValueError, "bad"):
+                    cp_graph.save_binary(os.path.join(tmpdir, "bad.bin"))
+            self.assertEqual(os.listdir(tmpdir), ["cp_graph.bin"])
+
+    def test_critical_path_graph_validation(self):
+        annotation = "[param|pytorch.model.alex_net|0|0|0|measure|forward]"
+        critical_path_t = self.alexnet_trace
+
+        def get_graph(*edges: CPEdge):
+            cp_graph, success = critical_path_t.critical_path_analysis(
+                rank=0, annotation=annotation, instance_id=1
+            )
+            self.assertTrue(success)
+            for edge in edges:
+                cp_graph._add_edge(edge)
+            return cp_graph
+
+        last_node = len(get_graph().node_list) - 1
+
+        # Negative weights are ignored unless the strict check is enabled
+        negative_edge = CPEdge(
+            begin=0, end=last_node, weight=-5, type=CPEdgeType.DEPENDENCY
+        )
+        cp_graph = get_graph(negative_edge)
+        self.assertTrue(cp_graph._validate_graph())
+        self.assertEqual(cp_graph.edges[0, last_node]["weight"], 0)
+        with patch.dict(os.environ, {hta_options.CP_STRICT_NEG_WEIGHT_CHECK_ENV: "1"}):
+            self.assertFalse(get_graph(negative_edge)._validate_graph())
+
+        # Sync edges between kernels on the same stream
+        cp_graph = get_graph()
+        kernels = cp_graph.trace_df[cp_graph.trace_df.stream > 0]
+        stream_kernels = kernels[kernels.stream == kernels.stream.iloc[0]].index
+        sync_edge = CPEdge(
+            begin=cp_graph.event_to_end_node_map[stream_kernels[0]],
+            end=cp_graph.event_to_start_node_map[stream_kernels[-1]],
+            type=CPEdgeType.SYNC_DEPENDENCY,
+        )
+        self.assertFalse(get_graph(sync_edge)._validate_graph())
+
+        # Cycles
+        cycle_edge = CPEdge(
+            begin=cp_graph.critical_path_nodes[-1],
+            end=cp_graph.critical_path_nodes[0],
+            type=CPEdgeType.DEPENDENCY,
+        )
+        cp_graph = get_graph(cycle_edge)
+        self.assertFalse(cp_graph._validate_graph())
+        self.assertIsNone(cp_graph._get_topological_order())
+
+        # The edge arrays are validated in both modes
+        cp_graph, success = critical_path_t.critical_path_analysis(
+            rank=0, annotation=annotation, instance_id=1, use_networkx=False
+        )
+        self.assertTrue(success)
+        cp_graph._add_edge(negative_edge)
+        self.assertTrue(cp_graph._validate_graph())
+        position = cp_graph.edge_arrays.find([0], [last_node])
+        self.assertEqual(cp_graph.edge_arrays.path_weight[position].tolist(), [0])
+        cp_graph._add_edge(cycle_edge)
+        self.assertFalse(cp_graph._validate_graph())
+
+        # Fast validation only skips the sync check
+        with patch.dict(os.environ, {hta_options.CP_FAST_VALIDATION_ENV: "1"}):
+            self.assertTrue(get_graph(sync_edge)._validate_graph())
+            self.assertTrue(get_graph()._validate_graph())
+            self.assertFalse(get_graph(cycle_edge)._validate_graph())
+
+    def test_critical_path_without_networkx(self):
+        """Checks the array based engine matches the networkx based one"""
+        annotation = "[param|pytorch.model.alex_net|0|0|0|measure|forward]"
+        instance_id = 1
+        rank = 0
+
+        critical_path_t = self.alexnet_trace
+        nx_graph, success = critical_path_t.critical_path_analysis(
+            rank=rank, annotation=annotation, instance_id=instance_id
+        )
+        self.assertTrue(success)
+        cp_graph, success = critical_path_t.critical_path_analysis(
+            rank=rank,
+            annotation=annotation,
+            instance_id=instance_id,
+            use_networkx=False,
+        )
+        self.assertTrue(success)
+
+        self.assertEqual(len(cp_graph.nodes), 0)
+        self.assertEqual(len(cp_graph.edge_arrays), len(nx_graph.edges))
+        self.assertEqual(set(cp_graph.get_all_edges()), set(nx_graph.get_all_edges()))
+
+        self.assertEqual(cp_graph.critical_path_nodes, nx_graph.critical_path_nodes)
+        self.assertEqual(
+            cp_graph.critical_path_events_set, nx_graph.critical_path_events_set
+        )
+        self.assertEqual(
+            cp_graph.critical_path_edges_set, nx_graph.critical_path_edges_set
+        )
+        pd.testing.assert_frame_equal(
+            cp_graph.get_critical_path_breakdown(),
+            nx_graph.get_critical_path_breakdown(),
+        )
+
+        # Every attributed edge maps back to its event
+        attributed = cp_graph.get_edge_attributed_events()
+        for i in np.flatnonzero(attributed >= 0)[:20]:
+            e = cp_graph.edge_arrays.get_edge(i)
+            self.assertEqual(cp_graph.get_event_attribution_for_edge(e), attributed[i])
+
+        # Saved graphs are restored as networkx graphs
+        zip_file = cp_graph.save(out_dir="/tmp/my_saved_cp_graph_arrays")
+        rest_graph = restore_cpgraph(
+            zip_filename=zip_file, t_full=critical_path_t.t, rank=rank
+        )
+        self.assertEqual(len(rest_graph.nodes), len(cp_graph.node_list))
+        self.assertEqual(len(rest_graph.edges), len(cp_graph.edge_arrays))
+
+    def test_batch_critical_path_analysis(self):
+        """Checks the batch API matches running the analysis per instance"""
+        annotation = "ProfilerStep"
+        critical_path_t = self.ns_resolution_trace
+
+        summary_df = critical_path_t.batch_critical_path_analysis(annotation)
+        self.assertEqual(summary_df["rank"].tolist(), [0, 0, 0, 0])
+        self.assertEqual(summary_df.instance_id.tolist(), [0, 1, 2, 3])
+        self.assertTrue(summary_df.success.all())
+
+        # The call stacks of the rank are built once and shared by the instances
+        with patch(
+            "hta.analyzers.critical_path_analysis.CallGraph", wraps=CallGraph
+        ) as call_graph:
+            serial_all_df = critical_path_t.batch_critical_path_analysis(
+                annotation, use_multiprocessing=False
+            )
+        self.assertEqual(call_graph.call_count, 1)
+        pd.testing.assert_frame_equal(serial_all_df, summary_df)
+
+        serial_df = critical_path_t.batch_critical_path_analysis(
+            annotation, rank_instances=[(0, 1)], use_multiprocessing=False
+        )
+        pd.testing.assert_frame_equal(
+            serial_df, summary_df.iloc[[1]].reset_index(drop=True)
+        )
+
+        cp_graph, success = critical_path_t.critical_path_analysis(
+            rank=0, annotation=annotation, instance_id=1
+        )
+        self.assertTrue(success)
+        edf = cp_graph.get_critical_path_breakdown()
+        self.assertEqual(serial_df.duration[0], edf.duration.sum())
+        summary = cp_graph.summary()
+        for bound_by_type in ["cpu_bound", "gpu_compute_bound"]:
+            self.assertAlmostEqual(serial_df[bound_by_type][0], summary[bound_by_type])
+
+    def test_dfs_traverse_call_stack(self):
+        """Checks traversing a slice of a call stack uses the nearest ancestors"""
+        # Event 0 contains 1 that contains 2, event 3 follows 0, event 1 is sliced out
+        thread_df = pd.DataFrame(
+            {
+                "index": [3, 2, 0],
+                "ts": [30, 12, 10],
+                "depth": [0, 2, 0],
+                "dfs_enter": [3, 2, 0],
+                "dfs_exit": [3, 2, 2],
+            }
+        )
+        visits = []
+        _dfs_traverse_call_stack(
+            thread_df,
+            lambda ev_id, parent, depth: visits.append(("enter", ev_id, parent, depth)),
+            lambda ev_id, parent, depth: visits.append(("exit", ev_id, parent, depth)),
+        )
+        self.assertEqual(
+            visits,
+            [
+                ("enter", 0, -1, 0),
+                ("enter", 2, 0, 1),
+                ("exit", 2, 0, 1),
+                ("exit", 0, -1, 0),
+                ("enter", 3, -1, 0),
+                ("exit", 3, -1, 0),
+            ],
+        )
+
+    def test_critical_path_what_if(self):
+        """Checks what-if estimates match recomputing the critical path"""
+        annotation = "[param|pytorch.model.alex_net|0|0|0|measure|forward]"
+        critical_path_t = self.alexnet_trace
+        cp_graph, success = critical_path_t.critical_path_analysis(
+            rank=0, annotation=annotation, instance_id=1
+        )
+        self.assertTrue(success)
+        edf = cp_graph.get_critical_path_breakdown()
+
+        length, what_if_df = cp_graph.what_if([])
+        self.assertEqual(length, edf.duration.sum())
+        self.assertEqual(
+            sorted(what_if_df.event_idx.fillna(-1)), sorted(edf.event_idx.fillna(-1))
+        )
+
+        scalings = [
+            CPEdgeScaling(0, edge_type=CPEdgeType.KERNEL_LAUNCH_DELAY),
+            CPEdgeScaling(2, event_name_pattern="^aten::"),
+        ]
+        length, what_if_df = cp_graph.what_if(scalings)
+        self.assertEqual(length, what_if_df.duration.sum())
+        launch_delays = what_if_df.type == CPEdgeType.KERNEL_LAUNCH_DELAY.value
+        self.assertEqual(what_if_df.duration[launch_delays].sum(), 0)
+
+        # The graph is not modified
+        pd.testing.assert_frame_equal(cp_graph.get_critical_path_breakdown(), edf)
+
+        # Compare against the critical path of a copy with the scaled weights
+        scaled_graph = nx.DiGraph(cp_graph)
+        for u, v, data in scaled_graph.edges(data=True):
+            edge = data["object"]
+            event = cp_graph.get_event_attribution_for_edge(edge)
+            if edge.type == CPEdgeType.KERNEL_LAUNCH_DELAY:
+                data["weight"] = 0
+            elif event is not None and cp_graph.sym_table[
+                cp_graph.trace_df.name[event]
+            ].startswith("aten::"):
+                data["weight"] *= 2
+        self.assertEqual(
+            length, nx.dag_longest_path_length(scaled_graph, weight="weight")
+        )
+
+        # Event names are matched the same way when the names are decoded
+        mask = cp_graph._get_scaled_edges_mask(scalings[1])
+        self.assertTrue(mask.any())
+        decoded_df = cp_graph.trace_df.assign(
+            name=cp_graph.trace_df["name"].map(cp_graph.sym_table.__getitem__)
+        )
+        with patch.object(cp_graph, "trace_df", decoded_df):
+            np.testing.assert_array_equal(
+                cp_graph._get_scaled_edges_mask(scalings[1]), mask
+            )
+
+    def test_longest_path_chain_with_merges(self):
+        """Checks the array based longest path stays linear on long graphs where
+        every node merges two in-edges, node i has in-edges from i-1 and i-2"""
+        num_nodes = 40000
+        rng = np.random.default_rng(0)
+        src = np.concatenate([np.arange(num_nodes - 1), np.arange(num_nodes - 2)])
+        dst = np.concatenate([np.arange(1, num_nodes), np.arange(2, num_nodes)])
+        weight = rng.integers(0, 100, src.size)
+
+        cp_graph = CPGraph(None, self.simple_add_trace.t, 0, use_networkx=False)
+        cp_graph.node_list = CPNodeArrays.from_arrays(
+            ev_idx=np.zeros(num_nodes, dtype=np.int64),
+            ts=np.arange(num_nodes),
+            is_start=np.ones(num_nodes, dtype=bool),
+            is_blocking=np.zeros(num_nodes, dtype=bool),
+        )
+        cp_graph.edge_arrays = CPEdgeArrays.from_arrays(
+            src=src,
+            dst=dst,
+            weight=weight,
+            path_weight=weight.copy(),
+            type_code=np.full(
+                src.size, CPEdgeArrays.get_type_code(CPEdgeType.DEPENDENCY), np.int8
+            ),
+            float_weights=False,
+        )
+
+        t0 = time.perf_counter()
+        path = cp_graph._longest_path()
+        # Updating the nodes downstream of the middle node
+        weights = weight.astype(np.float64)
+        weights[num_nodes // 2] *= 3
+        dist, _ = cp_graph._longest_path_distances(
+            weights,
+            cp_graph._get_downstream_nodes(dst[[num_nodes // 2]]),
+            *(x.copy() for x in cp_graph._base_distances),
+        )
+        elapsed = time.perf_counter() - t0
+        self.assertLess(elapsed, 5.0)
+
+        G = nx.DiGraph()
+        G.add_weighted_edges_from(zip(src.tolist(), dst.tolist(), weight.tolist()))
+        self.assertEqual(
+            nx.path_weight(G, path, "weight"), nx.dag_longest_path_length(G)
+        )
+        np.testing.assert_array_equal(
+            dist, cp_graph._longest_path_distances(weights)[0]
+        )
+
     def test_ns_resolution_trace(self):
         """New Kineto feature enables sub microsecond timstamp and duration,
         check that these traces are compatible with Critical Path Analysis"""
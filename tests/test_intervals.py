@@ -0,0 +1,110 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from hta.utils.intervals import (
+    intersect_intervals,
+    interval_coverage,
+    max_priority_overlaps,
+    overlap_by_label,
+    subtract_intervals,
+    sweep_intervals,
+    union_intervals,
+)
+from hta.utils.utils import merge_kernel_intervals
+
+
+class TestIntervals(unittest.TestCase):
+    def setUp(self) -> None:
+        # [0, 4) [2, 5) [5, 7) [10, 12) [11, 11)
+        self.starts = np.array([5, 0, 10, 2, 11])
+        self.ends = np.array([7, 4, 12, 5, 11])
+        # [3, 6) [8, 11)
+        self.other_starts = np.array([3, 8])
+        self.other_ends = np.array([6, 11])
+
+    def assertIntervalsEqual(self, intervals, expected) -> None:
+        starts, ends = intervals
+        self.assertListEqual(list(zip(starts.tolist(), ends.tolist())), expected)
+
+    def test_union_intervals(self) -> None:
+        self.assertIntervalsEqual(
+            union_intervals(self.starts, self.ends), [(0, 7), (10, 12)]
+        )
+        self.assertIntervalsEqual(union_intervals(np.zeros(0), np.zeros(0)), [])
+
+        merged = merge_kernel_intervals(
+            pd.DataFrame({"ts": self.starts, "dur": self.ends - self.starts})
+        )
+        self.assertListEqual(merged["ts"].tolist(), [0, 10])
+        self.assertListEqual(merged["end"].tolist(), [7, 12])
+
+    def test_intersect_and_subtract_intervals(self) -> None:
+        self.assertIntervalsEqual(
+            intersect_intervals(
+                self.starts, self.ends, self.other_starts, self.other_ends
+            ),
+            [(3, 6), (10, 11)],
+        )
+        self.assertIntervalsEqual(
+            subtract_intervals(
+                self.starts, self.ends, self.other_starts, self.other_ends
+            ),
+            [(0, 3), (6, 7), (11, 12)],
+        )
+        self.assertIntervalsEqual(
+            subtract_intervals(
+                self.other_starts, self.other_ends, self.starts, self.ends
+            ),
+            [(8, 10)],
+        )
+
+    def test_interval_coverage(self) -> None:
+        self.assertEqual(interval_coverage(self.starts, self.ends), 9)
+        self.assertEqual(interval_coverage(np.zeros(0), np.zeros(0)), 0)
+
+    def test_sweep_intervals(self) -> None:
+        times, counts = sweep_intervals(
+            self.other_starts, self.other_ends, np.array([2, 3])
+        )
+        self.assertListEqual(times.tolist(), [3, 6, 8, 11])
+        self.assertListEqual(counts.tolist(), [2, 0, 3, 0])
+
+        times, counts = sweep_intervals(self.starts, self.ends)
+        self.assertListEqual(times.tolist(), [0, 2, 4, 5, 7, 10, 11, 12])
+        self.assertListEqual(counts.tolist(), [1, 2, 1, 1, 0, 1, 1, 0])
+
+    def test_overlap_by_label(self) -> None:
+        masks, durations = overlap_by_label(
+            np.concatenate([self.starts, self.other_starts]),
+            np.concatenate([self.ends, self.other_ends]),
+            np.array([0, 0, 0, 0, 0, 2, 2]),
+        )
+        self.assertListEqual(masks.tolist(), [1, 4, 5])
+        self.assertListEqual(durations.tolist(), [5, 2, 4])
+
+    def test_max_priority_overlaps(self) -> None:
+        # Nested annotations [0, 10) > [2, 6) > [3, 4) and [6, 6), higher
+        # priorities for the shorter ones.
+        starts = np.array([0, 2, 3, 6])
+        ends = np.array([10, 6, 4, 6])
+        priorities = np.array([0, 1, 2, 2])
+        query_starts = np.array([0, 3, 5, 2, 5, 3, 12, 9])
+        query_ends = np.array([1, 5, 7, 2, 5, 3, 13, 9])
+        self.assertListEqual(
+            max_priority_overlaps(
+                starts, ends, priorities, query_starts, query_ends
+            ).tolist(),
+            [0, 2, 3, 0, 1, 1, -1, 0],
+        )
+        self.assertListEqual(
+            max_priority_overlaps(
+                starts[:0], ends[:0], priorities[:0], query_starts, query_ends
+            ).tolist(),
+            [-1] * 8,
+        )
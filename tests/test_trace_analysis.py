@@ -3,18 +3,27 @@
 # LICENSE file in the root directory of this source tree.
 
 
+import gzip
+import json
 import os
+import shutil
 import unittest
 from collections import namedtuple
+from collections.abc import Iterator
+from copy import copy
 from functools import cached_property
 from pathlib import Path
-from typing import List
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, List
 from unittest.mock import patch
 
 import hta
+import numpy as np
 import pandas as pd
-from hta.common.trace import PHASE_COUNTER
+from hta.analyzers.trace_counters import TraceCounters
+from hta.common.trace import JSONFragment, PHASE_COUNTER
 from hta.trace_analysis import TimeSeriesTypes, TraceAnalysis
+from hta.utils.utils import get_kernel_type
 
 
 class TraceAnalysisTestCase(unittest.TestCase):
@@ -42,6 +51,7 @@ class TraceAnalysisTestCase(unittest.TestCase):
         cls.ns_resolution_trace_dir: str = os.path.join(
             cls.base_data_dir, "ns_resolution_trace"
         )
+        cls.multi_rank_trace_dir: str = os.path.join(cls.base_data_dir, "trace_filter")
 
     @cached_property
     def vision_transformer_t(self):
@@ -71,6 +81,10 @@ class TraceAnalysisTestCase(unittest.TestCase):
     def ns_resolution_t(self):
         return TraceAnalysis(trace_dir=self.ns_resolution_trace_dir)
 
+    @cached_property
+    def multi_rank_t(self):
+        return TraceAnalysis(trace_dir=self.multi_rank_trace_dir)
+
     def setUp(self):
         self.overlaid_trace_dir = self.base_data_dir
         self.overlaid_trace_file = os.path.join(
@@ -301,6 +315,72 @@ class TraceAnalysisTestCase(unittest.TestCase):
         self.assertEqual(kernel_breakdown.iloc[11]["kernel_type"], "MEMORY")
         self.assertEqual(kernel_breakdown.iloc[11]["sum (us)"], 400892.0)
 
+    def test_derived_frames(self):
+        t = TraceAnalysis(trace_dir=self.multi_rank_trace_dir).t
+        trace_df = t.get_trace(0)
+        sym_table = t.symbol_table.get_sym_table()
+
+        gpu_kernels = t.get_derived_frame(0, "gpu_kernels")
+        self.assertIs(t.get_derived_frame(0, "gpu_kernels"), gpu_kernels)
+        self.assertListEqual(
+            gpu_kernels.index.tolist(),
+            trace_df.index[trace_df["stream"].ne(-1)].tolist(),
+        )
+        self.assertListEqual(
+            gpu_kernels["kernel_type"].tolist(),
+            [get_kernel_type(sym_table[name]) for name in gpu_kernels["name"]],
+        )
+
+        kernel_launches = t.get_derived_frame(0, "kernel_launches")
+        self.assertGreater(len(kernel_launches), 0)
+        self.assertListEqual(
+            kernel_launches["index_kernel"].tolist(),
+            kernel_launches["index_correlation"].tolist(),
+        )
+        self.assertTrue(
+            kernel_launches["stream_kernel"]
+            .eq(trace_df.loc[kernel_launches["index_kernel"], "stream"].to_numpy())
+            .all()
+        )
+
+        # The cache is dropped explicitly or when the trace of the rank is replaced.
+        t.invalidate_derived_frames(0)
+        gpu_kernels_2 = t.get_derived_frame(0, "gpu_kernels")
+        self.assertIsNot(gpu_kernels_2, gpu_kernels)
+        pd.testing.assert_frame_equal(gpu_kernels_2, gpu_kernels)
+        t.traces[0] = trace_df.copy()
+        self.assertIsNot(t.get_derived_frame(0, "gpu_kernels"), gpu_kernels_2)
+
+        # Shallow copies have their own cache.
+        t_view = copy(t)
+        t_view.traces = {0: trace_df.iloc[:10]}
+        self.assertLessEqual(len(t_view.get_derived_frame(0, "gpu_kernels")), 10)
+        self.assertEqual(len(t.get_derived_frame(0, "gpu_kernels")), len(gpu_kernels))
+
+        with self.assertRaises(ValueError):
+            t.get_derived_frame(0, "unknown")
+
+    def test_breakdown_multiprocessing(self):
+        analyzer = self.multi_rank_t
+        self.assertEqual(len(analyzer.t.traces), 2)
+
+        parallel = analyzer.get_gpu_kernel_breakdown(visualize=False)
+        serial = analyzer.get_gpu_kernel_breakdown(
+            visualize=False, use_multiprocessing=False
+        )
+        for parallel_df, serial_df in zip(parallel, serial):
+            pd.testing.assert_frame_equal(parallel_df, serial_df)
+        self.assertListEqual(sorted(parallel[1]["rank"].unique()), [0, 1])
+
+        pd.testing.assert_frame_equal(
+            analyzer.get_gpu_user_annotation_breakdown(
+                visualize=False, use_gpu_annotation=False
+            ),
+            analyzer.get_gpu_user_annotation_breakdown(
+                visualize=False, use_gpu_annotation=False, use_multiprocessing=False
+            ),
+        )
+
     def __test_gpu_user_annotation_common(
         self, use_gpu_annotation: bool, expected_rows: int
     ) -> None:
@@ -440,6 +520,72 @@ class TraceAnalysisTestCase(unittest.TestCase):
             msg=f"queue_full_df = {queue_full_df}",
         )
 
+    def test_get_queue_length_time_series_multiple_ranks(self):
+        analyzer = self.multi_rank_t
+        ranks = analyzer.t.get_ranks()
+        queue_len_ts_dict = analyzer.get_queue_length_time_series(ranks=ranks)
+        serial_queue_len_ts_dict = analyzer.get_queue_length_time_series(
+            ranks=ranks, use_multiprocessing=False
+        )
+        self.assertListEqual(list(queue_len_ts_dict), ranks)
+
+        for rank in ranks:
+            queue_len_ts = queue_len_ts_dict[rank]
+            pd.testing.assert_frame_equal(queue_len_ts, serial_queue_len_ts_dict[rank])
+            # Every launched kernel is executed and each launch is counted once.
+            self.assertGreaterEqual(queue_len_ts.queue_length.min(), 0)
+            self.assertTrue(
+                queue_len_ts.groupby("stream").queue_length.last().eq(0).all()
+            )
+            self.assertTrue(queue_len_ts.index.is_unique)
+            for _, stream_ts in queue_len_ts.groupby("stream"):
+                self.assertTrue(stream_ts.ts.is_monotonic_increasing)
+
+    def test_get_memory_bw_time_series_tied_timestamps(self):
+        membw_ts = self.ns_resolution_t.get_memory_bw_time_series(ranks=[0])[0]
+        for _, name_ts in membw_ts.groupby("name"):
+            # Kernels starting at the same time as others end are counted first
+            is_start = name_ts.memory_bw_gbps.diff().fillna(name_ts.memory_bw_gbps) > 0
+            self.assertTrue(
+                is_start.groupby(name_ts.ts.to_numpy()).is_monotonic_decreasing.all()
+            )
+
+    def test_get_memory_bw_time_series_multiple_ranks(self):
+        analyzer = self.multi_rank_t
+        ranks = analyzer.t.get_ranks()
+        membw_ts_dict = analyzer.get_memory_bw_time_series(ranks=ranks)
+        serial_membw_ts_dict = analyzer.get_memory_bw_time_series(
+            ranks=ranks, use_multiprocessing=False
+        )
+        self.assertListEqual(list(membw_ts_dict), ranks)
+
+        for rank in ranks:
+            membw_ts = membw_ts_dict[rank]
+            pd.testing.assert_frame_equal(membw_ts, serial_membw_ts_dict[rank])
+            self.assertListEqual(
+                list(membw_ts.columns), ["ts", "pid", "name", "memory_bw_gbps"]
+            )
+            # Every memory kernel starts and ends once.
+            self.assertTrue(
+                membw_ts.groupby("name").memory_bw_gbps.last().abs().lt(1e-6).all()
+            )
+            for _, name_ts in membw_ts.groupby("name"):
+                self.assertTrue(name_ts.ts.is_monotonic_increasing)
+
+        membw_summary = analyzer.get_memory_bw_summary(ranks=ranks)
+        self.assertListEqual(
+            membw_summary.index.get_level_values("rank").unique().tolist(), ranks
+        )
+        for rank in ranks:
+            membw_ts = membw_ts_dict[rank]
+            membw_ts = membw_ts[membw_ts.memory_bw_gbps > 0]
+            pd.testing.assert_frame_equal(
+                membw_summary.loc[[rank]],
+                membw_ts.assign(rank=rank)[["rank", "name", "memory_bw_gbps"]]
+                .groupby(["rank", "name"])
+                .describe(),
+            )
+
     def test_get_mtia_queue_length_stats(self):
         qd_summary = self.mtia_single_rank_trace_t.get_queue_length_summary(ranks=[0])
         streams = qd_summary.index.to_list()
@@ -483,7 +629,19 @@ class TraceAnalysisTestCase(unittest.TestCase):
             msg=f"queue_full_df = {queue_full_df}",
         )
 
-    @patch.object(hta.common.trace.Trace, "write_raw_trace")
+    @staticmethod
+    def _decode_trace_items(trace_items) -> Dict[str, Any]:
+        """Decodes the trace items passed to Trace.write_raw_trace_items()."""
+        return {
+            key: (
+                [json.loads(ev) if isinstance(ev, JSONFragment) else ev for ev in value]
+                if isinstance(value, Iterator)
+                else value
+            )
+            for key, value in trace_items
+        }
+
+    @patch.object(hta.common.trace.Trace, "write_raw_trace_items")
     def test_generate_trace_with_counters(self, mock_write_trace):
         # Use a trace with some kernels missing attribution to operators
         # to check if our logic is robust and does not lead to negative values.
@@ -495,9 +653,10 @@ class TraceAnalysisTestCase(unittest.TestCase):
             time_series=TimeSeriesTypes.QUEUE_LENGTH | TimeSeriesTypes.MEMCPY_BANDWIDTH
         )
         mock_write_trace.assert_called_once()
-        # change to kwargs if you use kwargs while calling write_raw_trace
-        trace_filename, trace_json = mock_write_trace.call_args.args
+        # change to kwargs if you use kwargs while calling write_raw_trace_items
+        trace_filename, trace_items = mock_write_trace.call_args.args
         self.assertTrue("with_counters" in trace_filename)
+        trace_json = self._decode_trace_items(trace_items)
 
         counter_events = [
             ev for ev in trace_json["traceEvents"] if ev["ph"] == PHASE_COUNTER
@@ -535,6 +694,157 @@ class TraceAnalysisTestCase(unittest.TestCase):
         mem_bw_summary_df = self.rank_non_gpu_t.get_memory_bw_summary(ranks=[0])
         self.assertIsNone(mem_bw_summary_df)
 
+    def test_downsample_time_series(self):
+        series = pd.DataFrame(
+            {
+                "ts": [0, 1, 2, 3, 10, 11, 25, 30, 5, 6],
+                "stream": [7] * 8 + [8] * 2,
+                "queue_length": [1, 2, 5, 1, 2, 0, 3, 0, 1, 0],
+            }
+        )
+        downsampled = TraceCounters.downsample_time_series(
+            series, "queue_length", ["stream"], bin_size=10
+        )
+        self.assertListEqual(downsampled["ts"].tolist(), [0, 10, 20, 30, 5, 10])
+        self.assertListEqual(downsampled["queue_length"].tolist(), [5, 2, 3, 0, 1, 0])
+
+        downsampled = TraceCounters.downsample_time_series(
+            series, "queue_length", ["stream"], bin_size=10, method="mean"
+        )
+        self.assertListEqual(
+            downsampled["queue_length"].tolist(), [1.5, 0.2, 1.5, 0.0, 0.2, 0.0]
+        )
+
+        downsampled = TraceCounters.downsample_time_series(
+            series, "queue_length", ["stream"], bin_size=10, method="minmax"
+        )
+        self.assertListEqual(downsampled.index.tolist(), [0, 2, 3, 4, 5, 6, 7, 8, 9])
+
+        with self.assertRaises(ValueError):
+            TraceCounters.downsample_time_series(series, "queue_length", ["stream"])
+
+    def test_downsample_time_series_max_points(self):
+        # A long sparse series and a short dense series get bins fitting their spans.
+        series = pd.DataFrame(
+            {
+                "ts": np.concatenate([np.arange(0, 100_000, 10), np.arange(1000)]),
+                "stream": [7] * 10_000 + [8] * 1000,
+                "queue_length": np.tile([1, 0], 5500),
+            }
+        )
+        for method in ["max", "mean", "minmax"]:
+            downsampled = TraceCounters.downsample_time_series(
+                series, "queue_length", ["stream"], max_points=100, method=method
+            )
+            points = downsampled.groupby("stream").size()
+            self.assertListEqual(points.index.tolist(), [7, 8])
+            self.assertTrue(((points > 50) & (points <= 100)).all(), method)
+
+    @patch.object(hta.common.trace.Trace, "write_raw_trace_items")
+    def test_generate_trace_with_downsampled_counters(self, mock_write_trace):
+        analyzer_t = TraceAnalysis(
+            trace_dir=os.path.join(
+                self.base_data_dir, "negative_queue_length_values_check"
+            )
+        )
+        max_points = 50
+        analyzer_t.generate_trace_with_counters(max_points=max_points)
+        _, trace_items = mock_write_trace.call_args.args
+        trace_json = self._decode_trace_items(trace_items)
+        counter_events = [
+            ev for ev in trace_json["traceEvents"] if ev["ph"] == PHASE_COUNTER
+        ]
+        queue_length_events = pd.DataFrame(
+            [ev for ev in counter_events if ev["name"] == "Queue Length"]
+        )
+        self.assertGreater(len(queue_length_events), 0)
+        self.assertLessEqual(queue_length_events.groupby("id").size().max(), max_points)
+        # The peak queue length of every stream is preserved by the max method.
+        queue_len_ts = analyzer_t.get_queue_length_time_series()[0]
+        self.assertDictEqual(
+            queue_length_events.groupby("id")["args"]
+            .apply(lambda args: max(arg["Queue Length"] for arg in args))
+            .to_dict(),
+            queue_len_ts.groupby("stream")["queue_length"].max().to_dict(),
+        )
+
+    def test_convert_time_series_to_json_events(self):
+        series = pd.DataFrame(
+            {
+                "pid": [1, 1, 2],
+                "ts": [10, 20, 30],
+                "id": [7, 7, 20],
+                "memory_bw_gbps": [0.5, float("nan"), 0.0],
+                "name": ["Memcpy DtoH", 'Memcpy "DtoD"', "Memset"],
+            }
+        )
+        events = self.rank_non_gpu_t.t.convert_time_series_to_events(
+            series, "Memcpy BW", "memory_bw_gbps"
+        )
+        json_events = self.rank_non_gpu_t.t.convert_time_series_to_json_events(
+            series, "Memcpy BW", "memory_bw_gbps"
+        )
+        self.assertTrue(all(isinstance(ev, JSONFragment) for ev in json_events))
+        self.assertEqual(
+            ",".join(json_events), json.dumps(events, separators=(",", ":"))[1:-1]
+        )
+        self.assertListEqual(
+            self.rank_non_gpu_t.t.convert_time_series_to_json_events(
+                series.drop(columns=["ts"]), "Memcpy BW", "memory_bw_gbps"
+            ),
+            [],
+        )
+
+    def test_convert_time_series_to_json_events_nullable(self):
+        series = pd.DataFrame(
+            {
+                "pid": pd.array([1, 1, 2], dtype="Int64"),
+                "ts": [10, 20, 30],
+                "queue_length": pd.array([1, None, 3], dtype="Int64"),
+                "name": pd.array(["a", None, "b"], dtype="string"),
+                "id": pd.array([True, None, False], dtype="boolean"),
+            }
+        )
+        json_events = self.rank_non_gpu_t.t.convert_time_series_to_json_events(
+            series, "Queue Length", "queue_length"
+        )
+        events = [json.loads(ev) for ev in json_events]
+        self.assertListEqual([ev["pid"] for ev in events], [1, 1, 2])
+        self.assertListEqual(
+            [ev["args"]["Queue Length"] for ev in events], [1, None, 3]
+        )
+        self.assertListEqual([ev["name"] for ev in events], ["a", None, "b"])
+        self.assertListEqual([ev["id"] for ev in events], [True, None, False])
+        self.assertIn('"args":{"Queue Length":1}', json_events[0])
+
+    def test_generate_trace_with_counters_multiple_ranks(self):
+        with TemporaryDirectory() as tmpdir:
+            for filename in os.listdir(self.multi_rank_trace_dir):
+                shutil.copy(os.path.join(self.multi_rank_trace_dir, filename), tmpdir)
+            analyzer_t = TraceAnalysis(trace_dir=tmpdir)
+            analyzer_t.generate_trace_with_counters(
+                ranks=[0, 1], compresslevel=1, use_multiprocessing=True
+            )
+            queue_len_ts = analyzer_t.get_queue_length_time_series(ranks=[0, 1])
+            for rank in [0, 1]:
+                raw_trace = analyzer_t.t.get_raw_trace_for_one_rank(rank)
+                output_file = analyzer_t.t.trace_files[rank].replace(
+                    ".json", "_with_counters.json"
+                )
+                with gzip.open(output_file, "rt") as fp:
+                    trace_json = json.load(fp)
+                self.assertEqual(trace_json.keys(), raw_trace.keys())
+                num_events = len(raw_trace["traceEvents"])
+                self.assertListEqual(
+                    trace_json["traceEvents"][:num_events], raw_trace["traceEvents"]
+                )
+                queue_length_events = [
+                    ev
+                    for ev in trace_json["traceEvents"][num_events:]
+                    if ev["name"] == "Queue Length"
+                ]
+                self.assertEqual(len(queue_length_events), len(queue_len_ts[rank]))
+
     def test_get_idle_time_breakdown(self):
         (
             idle_time_df,
@@ -570,6 +880,35 @@ class TraceAnalysisTestCase(unittest.TestCase):
                 msg=f"Stream 7 idle stats mismatch key={key}",
             )
 
+    def test_get_idle_time_breakdown_multiple_ranks(self):
+        analyzer = self.multi_rank_t
+        ranks = analyzer.t.get_ranks()
+        idle_time_df, idle_interval_df = analyzer.get_idle_time_breakdown(
+            ranks=ranks, visualize=False, show_idle_interval_stats=True
+        )
+        self.assertListEqual(idle_time_df["rank"].unique().tolist(), ranks)
+
+        # Same results as analyzing each rank separately
+        for rank in ranks:
+            rank_idle_time_df, rank_idle_interval_df = analyzer.get_idle_time_breakdown(
+                ranks=[rank], visualize=False, show_idle_interval_stats=True
+            )
+            pd.testing.assert_frame_equal(
+                idle_time_df[idle_time_df["rank"] == rank].reset_index(drop=True),
+                rank_idle_time_df,
+            )
+            pd.testing.assert_frame_equal(
+                idle_interval_df[idle_interval_df["rank"] == rank],
+                rank_idle_interval_df,
+            )
+
+        # Ratios sum up to 1.0 on every stream with some idle time
+        stream_df = idle_time_df.groupby(["rank", "stream"])[
+            ["idle_time", "idle_time_ratio"]
+        ].sum()
+        for ratio in stream_df[stream_df.idle_time > 0].idle_time_ratio:
+            self.assertAlmostEqual(ratio, 1.0, delta=0.02)
+
     def test_get_mtia_idle_time_breakdown(self):
         (
             idle_time_df,
@@ -1,12 +1,16 @@
 # (c) Meta Platforms, Inc. and affiliates. Confidential and proprietary.
+import os
+import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 import pandas as pd
 from hta.common.trace import Trace
-from hta.common.trace_call_graph import CallGraph
+from hta.common.trace_call_graph import CallGraph, STACK_CACHE_FILE_SUFFIX
 
 from hta.common.trace_call_stack import CallStackGraph, CallStackIdentity
+from hta.utils.utils import map_ranks
 
 
 class TraceCallGraphTestCase(unittest.TestCase):
@@ -117,6 +121,90 @@ class TraceCallGraphTestCase(unittest.TestCase):
         cg: CallGraph = CallGraph(t)
         self.assertListEqual(cg.mapping.groupby("rank").size().unique().tolist(), [2])
 
+    def test_parallel_call_graph_construction(self) -> None:
+        def _make_trace() -> Trace:
+            t: Trace = Trace(
+                trace_files={i: self.test_trace_backward_threads for i in range(4)}
+            )
+            t.parse_traces(use_multiprocessing=False)
+            for rank, df in t.get_all_traces().items():
+                df["pid"] = rank + 1
+            return t
+
+        t_serial, t_parallel = _make_trace(), _make_trace()
+        cg_serial = CallGraph(t_serial, use_multiprocessing=False)
+        with patch(
+            "hta.common.trace_call_graph.map_ranks", wraps=map_ranks
+        ) as mock_map_ranks:
+            cg_parallel = CallGraph(t_parallel, use_multiprocessing=True)
+        self.assertTrue(mock_map_ranks.call_args.kwargs["use_multiprocessing"])
+
+        for rank in range(4):
+            pd.testing.assert_frame_equal(
+                t_serial.get_trace(rank)[CallGraph.stack_columns],
+                t_parallel.get_trace(rank)[CallGraph.stack_columns],
+            )
+        pd.testing.assert_frame_equal(
+            cg_serial.mapping, cg_parallel.mapping, check_dtype=False
+        )
+
+        # The call stacks are rebuilt lazily from the stack columns.
+        for rank in range(4):
+            nodes_serial = cg_serial.rank_to_nodes[rank]
+            nodes_parallel = cg_parallel.rank_to_nodes[rank]
+            self.assertListEqual(list(nodes_serial), list(nodes_parallel))
+            for idx in nodes_serial:
+                self.assertEqual(nodes_serial[idx].parent, nodes_parallel[idx].parent)
+                self.assertEqual(nodes_serial[idx].height, nodes_parallel[idx].height)
+        for csg_serial, csg_parallel in zip(
+            cg_serial.call_stacks, cg_parallel.call_stacks
+        ):
+            self.assertEqual(csg_serial.identity, csg_parallel.identity)
+            self.assertEqual(csg_serial.root_index, csg_parallel.root_index)
+
+        stack = cg_parallel.get_stack_of_node(5, rank=2)
+        self.assertListEqual(stack["parent"].tolist(), [-3914, 0, 1, 2, 3, 4, 6])
+
+    def test_stack_cache(self) -> None:
+        def _make_trace() -> Trace:
+            t: Trace = Trace(trace_files={0: self.test_trace_backward_threads})
+            t.parse_traces(use_multiprocessing=False)
+            t.decode_symbol_ids(use_shorten_name=False)
+            return t
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            t_built = _make_trace()
+            cg_built = CallGraph(t_built, cache_stack_columns=True, cache_dir=cache_dir)
+            cache_files = os.listdir(cache_dir)
+            self.assertEqual(len(cache_files), 1)
+            self.assertTrue(cache_files[0].endswith(STACK_CACHE_FILE_SUFFIX))
+
+            t_loaded = _make_trace()
+            cg_loaded = CallGraph(
+                t_loaded, cache_stack_columns=True, cache_dir=cache_dir
+            )
+            # The call stacks are rebuilt lazily from the cached stack columns.
+            self.assertSetEqual(cg_loaded._pending_ranks, {0})
+            pd.testing.assert_frame_equal(
+                t_built.get_trace(0)[CallGraph.stack_columns],
+                t_loaded.get_trace(0)[CallGraph.stack_columns],
+            )
+            pd.testing.assert_frame_equal(
+                cg_built.mapping, cg_loaded.mapping, check_dtype=False
+            )
+            self.assertListEqual(
+                list(cg_built.rank_to_nodes[0]), list(cg_loaded.rank_to_nodes[0])
+            )
+
+            # The cache is ignored when the trace events are different.
+            t_filtered = _make_trace()
+            df = t_filtered.get_trace(0)
+            df.drop(df.loc[df["s_name"].eq("## backward ##")].index, inplace=True)
+            cg_filtered = CallGraph(
+                t_filtered, cache_stack_columns=True, cache_dir=cache_dir
+            )
+            self.assertSetEqual(cg_filtered._pending_ranks, set())
+
     def test_get_call_stacks(self) -> None:
         cg: CallGraph = self.cg_backward_threads
 
@@ -167,6 +255,24 @@ class TraceCallGraphTestCase(unittest.TestCase):
         self.assertEqual(len(stack), 7)
         self.assertListEqual(stack["parent"].tolist(), [-3914, 0, 1, 2, 3, 4, 6])
 
+    def test_euler_tour_columns(self) -> None:
+        cg: CallGraph = self.cg_backward_threads
+        df: pd.DataFrame = self.df_backward_threads
+
+        # The subtree of each node is a contiguous range of the tour.
+        for index, enter, exit_ in df[["index", "dfs_enter", "dfs_exit"]].itertuples(
+            index=False
+        ):
+            descendants = cg.get_descendants(index)
+            self.assertEqual(len(descendants), exit_ - enter + 1)
+            self.assertEqual(descendants[0], index)
+
+        self.assertListEqual(cg.get_descendants(4), [4, 6, 5])
+        self.assertListEqual(cg.get_ancestors(5), [5, 6, 4, 3, 2, 1, 0])
+        self.assertTrue(cg.is_ancestor(1, 5))
+        self.assertTrue(cg.is_ancestor(5, 5))
+        self.assertFalse(cg.is_ancestor(5, 1))
+
     def test_call_graph_from_dataframe(self) -> None:
         df = self.df_backward_threads
         symbol_table = self.t_backward_threads.symbol_table
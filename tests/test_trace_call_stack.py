@@ -10,12 +10,14 @@ import pandas as pd
 
 from hta.common.trace_call_stack import (
     _less_than,
+    CallStackArrays,
     CallStackGraph,
     CallStackIdentity,
     CallStackNode,
     sort_events,
 )
 from hta.common.trace_symbol_table import TraceSymbolTable
+from hta.common.types import DeviceType
 
 
 class CallStackTestCase(unittest.TestCase):
@@ -125,7 +127,7 @@ class CallStackTestCase(unittest.TestCase):
         )
 
     def test_call_stack_graph_with_consolidated_nodes(self) -> None:
-        nodes: Dict[int, CallStackNode] = {}
+        nodes = CallStackArrays()
         csg1 = CallStackGraph(
             self.df_1, self.csi_1, self.correlations, self.df, self.s_table, nodes
         )
@@ -145,10 +147,10 @@ class CallStackTestCase(unittest.TestCase):
             self.assertIn(i, nodes_1, f"node {i} not in the node map.")
         csg1_nodes = {i: nodes_1[i] for i in self.df_1["index"].to_list()}
         csg1_nodes[csg1.root_index] = self.nodes_1[self.root_index_1]
-        self.assertDictEqual(nodes, csg1.get_nodes())
+        self.assertDictEqual(dict(nodes), csg1.get_nodes())
 
     def test_update_root(self) -> None:
-        nodes: Dict[int, CallStackNode] = {}
+        nodes = CallStackArrays()
         csg1 = CallStackGraph(
             self.df_1, self.csi_1, self.correlations, self.df, self.s_table, nodes
         )
@@ -406,3 +408,83 @@ class CallStackTestCase(unittest.TestCase):
                 continue
             got = stack.get_root(idx)
             self.assertEqual(got, self.root_index_1, f"{stack}\n node={idx} root={got}")
+
+    def test_call_stack_arrays(self) -> None:
+        nodes = CallStackArrays()
+        nodes.add_nodes([-1], -1, DeviceType.CPU)
+        added = nodes.add_nodes([5, 2, 7, 3, 2], [-1, -1, 2, 2, -1], DeviceType.CPU)
+        self.assertListEqual(added.tolist(), [True, True, True, True, False])
+        self.assertListEqual(nodes.ids.tolist(), [-1, 2, 3, 5, 7])
+        self.assertListEqual(nodes.get_children(-1).tolist(), [5, 2])
+        self.assertListEqual(nodes.get_children(2).tolist(), [7, 3])
+        self.assertListEqual(nodes.positions([3, 4, 7]).tolist(), [2, -1, 4])
+        self.assertIn(5, nodes)
+        self.assertNotIn(4, nodes)
+        self.assertEqual(
+            nodes[2], CallStackNode(parent=-1, depth=-1, height=-1, children=[7, 3])
+        )
+
+        # re-attached nodes are placed after the existing children of the new parent
+        nodes.set_parent([5], 2)
+        self.assertListEqual(nodes.get_children(2).tolist(), [7, 3, 5])
+        self.assertListEqual(nodes.get_children(-1).tolist(), [2])
+
+        nodes.remove_nodes([7, 8])
+        self.assertEqual(len(nodes), 4)
+        self.assertListEqual(nodes.get_children(2).tolist(), [3, 5])
+
+    def test_euler_tour(self) -> None:
+        nodes = CallStackArrays()
+        nodes.add_nodes([-1], -1, DeviceType.CPU)
+        nodes.add_nodes([5, 2, 7, 3], [-1, -1, 2, 2], DeviceType.CPU)
+        nodes.add_nodes([9], 3, DeviceType.GPU)
+
+        # pre-order: -1, 5, 2, 7, 3, 9
+        enter, exit_, tour = nodes.get_euler_tour()
+        self.assertListEqual(nodes.ids[tour].tolist(), [-1, 5, 2, 7, 3, 9])
+        self.assertListEqual(nodes.get_subtree(2).tolist(), [2, 7, 3, 9])
+        self.assertListEqual(nodes.get_subtree(9).tolist(), [9])
+        self.assertTrue(nodes.is_ancestor(2, 9))
+        self.assertTrue(nodes.is_ancestor(3, 3))
+        self.assertFalse(nodes.is_ancestor(5, 9))
+        self.assertFalse(nodes.is_ancestor(9, 2))
+
+        # the tour is renumbered after the graph changes
+        nodes.set_parent([5], 3)
+        self.assertListEqual(nodes.get_subtree(3).tolist(), [3, 9, 5])
+        self.assertTrue(nodes.is_ancestor(2, 5))
+
+    def test_get_descendants(self) -> None:
+        csg = CallStackGraph(
+            self.df_1, self.csi_1, self.correlations, self.df_1, self.s_table
+        )
+        self.assertListEqual(csg.get_descendants(0), [0, 1, 2, 3, 4, 5])
+        self.assertListEqual(csg.get_descendants(4), [4, 5])
+        self.assertTrue(csg.is_ancestor(0, 3))
+        self.assertFalse(csg.is_ancestor(4, 3))
+
+    def test_deep_call_stack(self) -> None:
+        # A chain of nested events deeper than the default recursion limit.
+        n = 3000
+        df = pd.DataFrame(
+            {
+                "index": np.arange(n),
+                "ts": np.arange(n),
+                "dur": 2 * (n - np.arange(n)),
+                "pid": 1,
+                "tid": 2,
+                "stream": -1,
+                "index_correlation": -1,
+            }
+        )
+        csg = CallStackGraph(df, self.csi_1, self.correlations, df, self.s_table)
+        nodes = csg.nodes
+        self.assertListEqual(
+            nodes.depth[nodes.positions([0, n - 1])].tolist(), [0, n - 1]
+        )
+        self.assertListEqual(nodes.height[nodes.positions([0, n - 1])].tolist(), [n, 1])
+
+        visited: List[int] = []
+        csg.dfs_traverse(lambda i, _: visited.append(i), lambda i, _: visited.append(i))
+        expected = [self.root_index_1] + list(range(n))
+        self.assertListEqual(visited, expected + expected[::-1])
@@ -4,13 +4,16 @@
 
 import math
 import os
+import sys
 import unittest
+import unittest.mock as mock
+from collections.abc import Iterator
+from tempfile import TemporaryDirectory
 
 from typing import Any, Dict, Set
 
-# import unittest.mock as mock
-
 import pandas as pd
+from hta.common import trace_parser
 from hta.common.trace import parse_trace_dict, Trace
 from hta.common.trace_parser import (
     _auto_detect_parser_backend,
@@ -18,6 +21,7 @@ from hta.common.trace_parser import (
     get_default_trace_parsing_backend,
     parse_metadata_ijson,
     parse_trace_dataframe,
+    parse_trace_dict_items,
     ParserBackend,
     set_default_trace_parsing_backend,
 )
@@ -342,6 +346,85 @@ class TraceParseIjsonOthersTestCase(unittest.TestCase):
     #     self.assertEqual(_auto_detect_parser_backend(), "ijson_batch_and_compress")
 
 
+class TraceParseDictItemsTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cpu_only_trace_path: str = (
+            "tests/data/cpu_only/rank-34.Jul_15_10_52_41.1074.pt.trace.json.gz"
+        )
+
+    def _test_parse_trace_dict_items(self, trace_file_path: str) -> None:
+        trace_record = parse_trace_dict(trace_file_path)
+
+        items = [
+            (key, list(value) if key == "traceEvents" else value)
+            for key, value in parse_trace_dict_items(trace_file_path)
+        ]
+        self.assertEqual([key for key, _ in items], list(trace_record.keys()))
+        self.assertEqual(dict(items), trace_record)
+
+        # Unconsumed events are skipped
+        keys = [key for key, _ in parse_trace_dict_items(trace_file_path)]
+        self.assertEqual(keys, list(trace_record.keys()))
+
+        # Write the items back incrementally
+        with TemporaryDirectory() as tmpdir:
+            output_file = os.path.join(tmpdir, "trace.json.gz")
+            Trace.write_raw_trace_items(
+                output_file,
+                (
+                    (key, iter(value) if key == "traceEvents" else value)
+                    for key, value in parse_trace_dict_items(trace_file_path)
+                ),
+            )
+            self.assertEqual(parse_trace_dict(output_file), trace_record)
+
+    @unittest.skipIf(
+        _auto_detect_parser_backend() == ParserBackend.JSON,
+        "Skipping ijson based trace load tests",
+    )
+    def test_parse_trace_dict_items_ijson(self):
+        self._test_parse_trace_dict_items(self.cpu_only_trace_path)
+
+    def test_parse_trace_dict_items_json(self):
+        # Small chunks split the values across reads, the whole trace is never loaded
+        with mock.patch.dict(sys.modules, {"ijson": None}), mock.patch.object(
+            trace_parser, "_JSON_STREAM_CHUNK_SIZE", 7
+        ), mock.patch.object(
+            trace_parser, "parse_trace_dict", side_effect=AssertionError
+        ):
+            for trace_file_path in [
+                self.cpu_only_trace_path,
+                "tests/data/call_stack/backward_thread.json",
+            ]:
+                with self.subTest(trace_file_path=trace_file_path):
+                    self._test_parse_trace_dict_items(trace_file_path)
+
+    def test_parse_trace_dict_items_json_errors(self):
+        with TemporaryDirectory() as tmpdir, mock.patch.dict(
+            sys.modules, {"ijson": None}
+        ):
+            trace_file_path = os.path.join(tmpdir, "trace.json")
+            for content, expected in [
+                ('{"traceEvents": [], "a": 12}', [("traceEvents", []), ("a", 12)]),
+                ("{}", []),
+                ('{"traceEvents": {"a": 1}}', [("traceEvents", {"a": 1})]),
+            ]:
+                with open(trace_file_path, "w") as f:
+                    f.write(content)
+                items = [
+                    (key, list(value) if isinstance(value, Iterator) else value)
+                    for key, value in parse_trace_dict_items(trace_file_path)
+                ]
+                self.assertEqual(items, expected)
+            for content in ['{"traceEvents": [{"a": 1}', '["traceEvents"]']:
+                with open(trace_file_path, "w") as f:
+                    f.write(content)
+                with self.assertRaises(ValueError):
+                    for _, value in parse_trace_dict_items(trace_file_path):
+                        if isinstance(value, Iterator):
+                            list(value)
+
+
 class TraceParseConfigTestCase(unittest.TestCase):
     def setUp(self) -> None:
         # Parse all nccl fields in the test
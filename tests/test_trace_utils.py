@@ -2,11 +2,27 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import os
 import unittest
 from collections import namedtuple
-from typing import List
+from typing import Any, List
+from unittest.mock import patch
 
-from hta.utils.utils import shorten_name
+import hta.utils.utils
+from hta.utils.utils import (
+    can_fork_workers,
+    map_ranks,
+    MAP_RANKS_MIN_PARALLEL_RANKS,
+    shorten_name,
+)
+
+
+def _scale_rank(t: Any, rank: int, factor: int) -> int:
+    return t["offset"] + rank * factor
+
+
+def _get_pid(t: Any, rank: int) -> int:
+    return os.getpid()
 
 
 class TestTracUtils(unittest.TestCase):
@@ -26,3 +42,30 @@ class TestTracUtils(unittest.TestCase):
 
         for tc in test_cases:
             self.assertEqual(shorten_name(tc.input), tc.expect_result)
+
+    def test_map_ranks(self) -> None:
+        trace = {"offset": 1}
+        expected = [1, 4, 7]
+        self.assertEqual(map_ranks(trace, _scale_rank, [0, 1, 2], (3,)), expected)
+        self.assertEqual(
+            map_ranks(trace, _scale_rank, [0, 1, 2], (3,), use_multiprocessing=False),
+            expected,
+        )
+        with patch("hta.utils.utils.can_fork_workers", return_value=False):
+            self.assertEqual(map_ranks(trace, _scale_rank, [0, 1, 2], (3,)), expected)
+
+    def test_map_ranks_default_is_serial(self) -> None:
+        pid = os.getpid()
+        few_ranks = list(range(MAP_RANKS_MIN_PARALLEL_RANKS - 1))
+        many_ranks = list(range(MAP_RANKS_MIN_PARALLEL_RANKS))
+        self.assertEqual(set(map_ranks({}, _get_pid, few_ranks)), {pid})
+        # The process has other threads, e.g. in a Jupyter kernel
+        with patch("threading.active_count", return_value=2):
+            self.assertEqual(set(map_ranks({}, _get_pid, many_ranks)), {pid})
+        if not can_fork_workers():
+            return
+
+        with patch("threading.active_count", return_value=1):
+            self.assertNotIn(pid, map_ranks({}, _get_pid, many_ranks))
+        self.assertNotIn(pid, map_ranks({}, _get_pid, few_ranks, (), True))
+        self.assertIsNone(hta.utils.utils._map_ranks_state)